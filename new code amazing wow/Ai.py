@@ -1,15 +1,31 @@
 # filename: facevault_app.py
 
 import cv2
-import face_recognition
 import tkinter as tk
 from tkinter import ttk, messagebox
 from PIL import Image, ImageTk, ImageFont, ImageDraw
-import pickle, os, datetime, threading
-from playsound import playsound
+import os, datetime, threading, time, logging
+from gallery import FaceGallery
+from settings import load_settings, build_gallery
+from ann_index import index_path_for
+from encoding_store import open_encoding_store
+from recognizer import make_recognizer
+from pipeline import CameraPipeline
+from multicam import parse_source
+from capture import CaptureSource
+from metrics import METRICS, draw_overlay, start_exporter
+from render import TkFrameRenderer
+from warmup import Startup, startup_steps
+from tuner import runtime_tuner
+from recognition_server import RecognitionClient, server_token
+from thumbnails import PhotoWriter, ThumbnailCache
+from roster import RosterView
+
+log = logging.getLogger("facevault")
 
 class FaceVault:
     def __init__(self, root):
+        self.startup = Startup()
         self.root = root
         self.root.title("FaceVault 2025")
         self.root.geometry("960x640")
@@ -21,30 +37,70 @@ class FaceVault:
         self.admin_credentials = {"admin": "admin123"}
 
         os.makedirs(self.data_dir, exist_ok=True)
-        self.known_faces = {}
-        self.student_data = {}
-        self.load_data()
+        self.settings = load_settings(self.data_dir)
+        self.metrics_exporter = start_exporter(self.settings)
+        self.photo_writer = PhotoWriter(self.data_dir)
+        self.thumbnails = ThumbnailCache(self.data_dir, self.settings["thumbnail_cache_size"],
+                                         self.photo_writer)
+        self.encoding_store = None
+        self.gallery = FaceGallery()
+        # With a recognition server, it owns the store and gallery and this stays empty
+        self.server = None
+        if self.settings["recognition_server"]:
+            self.server = RecognitionClient(self.settings["recognition_server"],
+                                            token=server_token(self.data_dir))
 
         self.current_user = None
         self.is_admin = False
-        self.cap = None
+        self.pipeline = None
+        self.tuner = None
         self.camera_active = False
 
         self.setup_ui()
+        # Encodings and the dlib models load behind the already-visible window
+        self.status_var.set("⏳ Warming up face models...")
+        self.root.after_idle(lambda: self.startup.mark("ui"))
+        self.startup.run(startup_steps(self.settings, self.load_data, self.data_dir))
+        self.check_ready()
+
+    def check_ready(self):
+        if not self.startup.ready.is_set():
+            self.root.after(100, self.check_ready)
+            return
+        if self.startup.error is not None:
+            self.status_var.set(f"⚠️ Startup failed: {self.startup.error}")
+            return
+        self.status_var.set("🔄 Awaiting action")
+        log.info("%s", self.startup.report())
 
     def load_data(self):
-        if os.path.exists(self.encodings_file):
-            with open(self.encodings_file, "rb") as f:
-                self.known_faces = pickle.load(f)
-        if os.path.exists(self.student_file):
-            with open(self.student_file, "rb") as f:
-                self.student_data = pickle.load(f)
+        # The pickles are only read once, to migrate them into the store
+        self.encoding_store = open_encoding_store(self.encodings_file, self.student_file)
+        self.gallery = build_gallery(self.encoding_store, self.encodings_file, self.settings)
+        self.encoding_store.compact_async()
+
+    def registrations(self):
+        if self.server is not None:
+            return self.server.registrations()
+        return {name: self.encoding_store.meta(name) for name in self.gallery.names}
+
+    def registration(self, name):
+        """(meta for name, number registered) without building the whole roster."""
+        if self.server is not None:
+            registered = self.server.registrations()
+            return registered.get(name, {}), len(registered)
+        return self.encoding_store.meta(name), len(self.gallery)
 
     def save_data(self):
-        with open(self.encodings_file, "wb") as f:
-            pickle.dump(self.known_faces, f)
-        with open(self.student_file, "wb") as f:
-            pickle.dump(self.student_data, f)
+        if self.server is not None:
+            return
+        self.encoding_store.sync()
+
+    def close(self):
+        # The IVF lists only change in memory while running; one write at exit
+        if self.server is None and self.encoding_store is not None and self.gallery.index is not None:
+            self.gallery.index.save(index_path_for(self.encodings_file), self.gallery)
+        self.photo_writer.close()
 
     def setup_ui(self):
         # Background
@@ -88,83 +144,126 @@ class FaceVault:
         ttk.Button(btn_frame, text="🛡️ Admin Login", command=self.admin_login).pack(side=tk.LEFT, padx=10)
         ttk.Button(btn_frame, text="❌ Exit", command=self.root.quit).pack(side=tk.LEFT, padx=10)
 
+    def startup_ok(self):
+        """True once models and encodings are loaded; otherwise says why on the status line."""
+        if not self.startup.ready.is_set():
+            self.status_var.set("⏳ Still warming up, one moment...")
+            return False
+        if self.startup.error is not None:
+            self.status_var.set(f"⚠️ Startup failed: {self.startup.error}")
+            return False
+        return True
+
     def start_camera(self):
+        if not self.startup_ok():
+            return
         if not self.camera_active:
-            self.cap = cv2.VideoCapture(0)
-            if not self.cap.isOpened():
+            recognizer = make_recognizer(self.gallery, self.settings)
+            # Registration is one person at one camera: only the first source is used here
+            source = CaptureSource(parse_source(self.settings["camera_sources"][0]), self.settings)
+            # Keep the analysed frame with its results: registration saves that photo
+            self.pipeline = CameraPipeline(source, lambda rgb: (rgb, recognizer.analyze(rgb)),
+                                           stride=self.settings["analyze_stride"])
+            if not self.pipeline.start():
                 messagebox.showerror("Camera Error", "Could not access camera.")
                 return
+            log.info("%s", source.describe())
+            self.tuner = runtime_tuner(self.settings, self.data_dir, recognizer.detector, self.pipeline)
             self.camera_active = True
+            self.renderer = TkFrameRenderer(self.camera_label, (640, 480))
             self.status_var.set("🎥 Camera On")
             self.update_camera()
 
     def stop_camera(self):
-        if self.cap:
-            self.cap.release()
+        if self.pipeline:
+            self.pipeline.stop()
         self.camera_active = False
         self.camera_label.config(image='')
 
     def update_camera(self):
-        ret, frame = self.cap.read()
-        if ret:
-            frame = cv2.flip(frame, 1)
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            face_locations = face_recognition.face_locations(rgb)
-
-            if face_locations:
-                encodings = face_recognition.face_encodings(rgb, face_locations)
-                self.process_face(encodings[0], frame)
-            img = Image.fromarray(rgb).resize((640, 480))
-            img_tk = ImageTk.PhotoImage(img)
-            self.camera_label.img = img_tk
-            self.camera_label.config(image=img_tk)
-        if self.camera_active:
-            self.root.after(30, self.update_camera)
-
-    def process_face(self, encoding, frame):
+        if not self.camera_active:
+            return
+        if not self.pipeline.running:
+            self.stop_camera()
+            return
+        rgb, analysed = self.pipeline.poll()
+        if analysed is not None:
+            face_rgb, faces = analysed
+            faces = [f for f in faces if f.encoding is not None]
+            if faces:
+                self.process_faces(faces, cv2.cvtColor(face_rgb, cv2.COLOR_RGB2BGR))
+                if not self.camera_active:
+                    return
+        if rgb is not None:
+            start = time.perf_counter()
+            display = self.renderer.begin(rgb)
+            if self.settings["metrics_overlay"]:
+                draw_overlay(display)
+            self.renderer.show()
+            METRICS.since("render", start)
+            METRICS.since("latency", self.pipeline.frame_stamp)
+            METRICS.tick("preview")
+        if self.tuner is not None:
+            self.tuner.check()
+        self.root.after(self.settings["preview_interval_ms"], self.update_camera)
+
+    def process_faces(self, faces, frame):
+        recognized = list(dict.fromkeys(face.name for face in faces if face.name is not None))
+        unknown = [face for face in faces if face.name is None]
         name = self.name_var.get().strip()
-        for known_name, known_enc in self.known_faces.items():
-            if face_recognition.compare_faces([known_enc], encoding)[0]:
-                self.recognize_user(known_name, frame)
-                return
-        if name:
-            self.register_new_face(name, encoding, frame)
-
-    def recognize_user(self, name, frame):
-        self.current_user = name
-        self.status_var.set(f"✅ Recognized: {name}")
+        registered = []
+        if name and unknown and name not in recognized:
+            if len(unknown) == 1:
+                self.register_new_face(name, unknown[0].encoding, frame)
+                registered.append(name)
+            else:
+                # One typed name can't be pinned on one of several strangers
+                self.status_var.set("👥 Several unknown faces: register one person at a time")
+        if not recognized and not registered:
+            return
+        messages = []
+        if recognized:
+            messages.append(f"✅ Recognized: {', '.join(recognized)}")
+        if registered:
+            messages.append(f"🆕 Registered: {registered[0]}")
+        self.status_var.set("   ".join(messages))
+        self.current_user = (recognized + registered)[0]
         self.play_sound("confirmation.wav")
-        self.root.after(2000, lambda: self.show_summary(name))
+        for i, person in enumerate(recognized + registered):
+            self.root.after(2000 + 250 * i, lambda person=person: self.show_summary(person))
         self.stop_camera()
 
     def register_new_face(self, name, encoding, frame):
-        self.known_faces[name] = encoding
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-        self.student_data[name] = {"timestamp": timestamp}
-        cv2.imwrite(os.path.join(self.data_dir, f"{name}.jpg"), frame)
+        if self.server is not None:
+            self.server.enroll(name, encoding, {"timestamp": timestamp})
+        else:
+            self.encoding_store.append(name, encoding, {"timestamp": timestamp})
+            self.gallery.add(name, encoding)
+        self.photo_writer.save(name, frame)
         self.save_data()
-        self.status_var.set(f"🆕 Registered: {name}")
-        self.play_sound("confirmation.wav")
-        self.root.after(2000, lambda: self.show_summary(name))
-        self.stop_camera()
 
     def show_summary(self, name):
         popup = tk.Toplevel(self.root)
         popup.title("🎓 Student Summary")
         popup.geometry("400x500")
-        img_path = os.path.join(self.data_dir, f"{name}.jpg")
+        meta, total = self.registration(name)
         try:
-            img = Image.open(img_path).resize((200, 200))
-            img_tk = ImageTk.PhotoImage(img)
-            tk.Label(popup, image=img_tk).pack(pady=10)
+            img_tk = self.thumbnails.photo(name, 200)
+            label = tk.Label(popup, image=img_tk)
+            label.image = img_tk
+            label.pack(pady=10)
             tk.Label(popup, text=f"Name: {name}", font=("Orbitron", 14)).pack()
-            tk.Label(popup, text=f"Registered: {self.student_data[name]['timestamp']}", font=("Orbitron", 12)).pack()
+            tk.Label(popup, text=f"Registered: {meta['timestamp']}", font=("Orbitron", 12)).pack()
         except:
             tk.Label(popup, text="Image unavailable").pack()
-        tk.Label(popup, text=f"Total Registered: {len(self.known_faces)}", font=("Orbitron", 12)).pack(pady=10)
+        tk.Label(popup, text=f"Total Registered: {total}", font=("Orbitron", 12)).pack(pady=10)
         ttk.Button(popup, text="Close", command=popup.destroy).pack(pady=20)
 
     def admin_login(self):
+        # The panel reads the encoding store, which the startup thread opens
+        if not self.startup_ok():
+            return
         login = tk.Toplevel(self.root)
         login.title("Admin Login")
         login.geometry("300x200")
@@ -188,48 +287,41 @@ class FaceVault:
         ttk.Button(login, text="Login", command=attempt_login).pack(pady=10)
 
     def show_admin_panel(self):
-        admin = tk.Toplevel(self.root)
-        admin.title("🛡️ Admin Panel")
-        admin.geometry("800x500")
-
-        tree = ttk.Treeview(admin, columns=("Name", "Registered"), show="headings")
-        tree.heading("Name", text="Student Name")
-        tree.heading("Registered", text="Registration Date")
-        tree.pack(fill="both", expand=True)
-
-        for name in self.known_faces:
-            timestamp = self.student_data.get(name, {}).get("timestamp", "Unknown")
-            tree.insert("", "end", values=(name, timestamp))
-
-        def view_face():
-            selected = tree.focus()
-            if selected:
-                sel_name = tree.item(selected)["values"][0]
-                self.view_student_details(sel_name)
-
-        ttk.Button(admin, text="View Face", command=view_face).pack(pady=10)
+        if self.server is not None:
+            registered = self.server.registrations()
+            names, meta = list(registered), registered.get
+        else:
+            names, meta = list(self.gallery.names), self.encoding_store.meta
+        RosterView(self.root, names, meta, self.view_student_details, self.settings["roster_page_size"])
 
     def view_student_details(self, name):
         detail = tk.Toplevel(self.root)
         detail.title(f"Details: {name}")
         detail.geometry("400x400")
         try:
-            img = Image.open(os.path.join(self.data_dir, f"{name}.jpg")).resize((300, 300))
-            img_tk = ImageTk.PhotoImage(img)
-            tk.Label(detail, image=img_tk).pack(pady=10)
+            img_tk = self.thumbnails.photo(name, 300)
+            label = tk.Label(detail, image=img_tk)
+            label.image = img_tk
+            label.pack(pady=10)
             tk.Label(detail, text=f"Name: {name}", font=("Orbitron", 14)).pack()
         except:
             tk.Label(detail, text="No image").pack()
 
     def play_sound(self, file):
         if os.path.exists(file):
-            threading.Thread(target=lambda: playsound(file), daemon=True).start()
+            threading.Thread(target=self._play, args=(file,), daemon=True).start()
+
+    def _play(self, file):
+        from playsound import playsound
+        playsound(file)
 
     def run(self):
         self.root.mainloop()
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(name)s: %(message)s")
     root = tk.Tk()
     app = FaceVault(root)
     app.run()
+    app.close()
@@ -0,0 +1,373 @@
+"""Vectorized attendance analytics over logs.csv or the attendance store.
+
+    python analytics.py people
+    python analytics.py week --out face_data/weekly.csv
+    python analytics.py presence --source face_data/attendance.db --out presence.parquet
+
+Rows are read in chunks into NumPy arrays of datetime64[s] timestamps and
+integer name codes. logs.csv is parsed a byte block at a time without a
+Python string per row; only quoted names go through the csv module. Each
+chunk is folded into per-(person, day) first-seen, last-seen and entry-count
+arrays, so memory follows the number of person-days,
+not the length of the log. Every report is derived from those arrays.
+
+Reports are written a slice at a time. The output format follows the
+extension: .csv, .parquet (needs pyarrow), or otherwise a directory with one
+.npy file per column that np.load(..., mmap_mode="r") can open.
+"""
+import argparse
+import csv
+import itertools
+import os
+import threading
+import time
+
+import numpy as np
+
+CHUNK_ROWS = 200_000
+CHUNK_BYTES = 8 << 20
+DAY = 86400
+# Day numbers (days since 1970) take the low bits of a (person, day) key
+DAY_BITS = 20
+DAY_MASK = (1 << DAY_BITS) - 1
+PERIODS = ("day", "week", "month")
+
+
+def parse_timestamps(strings):
+    """datetime64[s] for "YYYY-MM-DD HH:MM:SS" strings; unparseable ones become NaT."""
+    try:
+        return np.array(strings, dtype="datetime64[s]")
+    except ValueError:
+        out = np.empty(len(strings), dtype="datetime64[s]")
+        for i, s in enumerate(strings):
+            try:
+                out[i] = np.datetime64(s.decode() if isinstance(s, bytes) else s, "s")
+            except (ValueError, UnicodeDecodeError):
+                out[i] = np.datetime64("NaT")
+        return out
+
+
+def parse_block(data, names):
+    """(name codes, timestamps) for a bytes block of whole logs.csv lines.
+
+    The common line is `name,YYYY-MM-DD HH:MM:SS`: the timestamp is the last 19
+    bytes, so names and timestamps are cut out with array indexing and only the
+    distinct names of the block are decoded.
+    """
+    a = np.frombuffer(data, np.uint8)
+    ends = np.flatnonzero(a == 10)
+    starts = np.r_[0, ends[:-1] + 1]
+    stops = ends - (a[np.maximum(ends - 1, 0)] == 13)
+    comma = stops - 20
+    simple = (comma > starts) & (a[np.maximum(comma, 0)] == 44) & (a[starts] != 34)
+    codes = np.empty(len(ends), np.int64)
+    stamps = np.empty(len(ends), "datetime64[s]")
+    if simple.any():
+        s, c = starts[simple], comma[simple]
+        width = c - s
+        cols = np.arange(int(width.max()))
+        chars = a[np.minimum(s[:, None] + cols, len(a) - 1)]
+        chars[cols >= width[:, None]] = 0
+        uniq, inverse = np.unique(chars.view(f"S{len(cols)}").ravel(), return_inverse=True)
+        codes[simple] = names.encode([u.decode("utf-8", "replace") for u in uniq])[inverse]
+        stamps[simple] = parse_timestamps(a[(c + 1)[:, None] + np.arange(19)].view("S19").ravel())
+    rest = np.flatnonzero(~simple)
+    if len(rest):
+        # Quoted names, odd spacing or malformed lines
+        rows = [next(csv.reader([data[starts[i]:stops[i]].decode("utf-8", "replace")]), []) for i in rest]
+        codes[rest] = names.encode([row[0] if row else "" for row in rows])
+        stamps[rest] = parse_timestamps([row[1].strip() if len(row) > 1 else "" for row in rows])
+    return codes, stamps
+
+
+def read_csv_chunks(path, names, chunk_bytes=CHUNK_BYTES):
+    """Yield (name codes, timestamps) for each chunk_bytes block of a logs.csv."""
+    with open(path, "rb") as f:
+        tail = b""
+        while True:
+            block = f.read(chunk_bytes)
+            data = tail + block
+            if not block:
+                if data.strip():
+                    yield parse_block(data + b"\n", names)
+                return
+            cut = data.rfind(b"\n") + 1
+            data, tail = data[:cut], data[cut:]
+            if data:
+                yield parse_block(data, names)
+
+
+def read_store_chunks(store, names, after_id=0, chunk_rows=CHUNK_ROWS):
+    """Yield (name codes, timestamps, last id) for store rows with id > after_id."""
+    while True:
+        rows = store.entries_after(after_id, chunk_rows)
+        if not rows:
+            return
+        after_id = rows[-1][0]
+        yield (names.encode([row[1] for row in rows]), parse_timestamps([row[2] for row in rows]),
+               after_id)
+
+
+class NameCodes:
+    """Categorical codes for names, stable across chunks."""
+
+    def __init__(self):
+        self.index = {}
+        self.names = []
+
+    def encode(self, names):
+        index = self.index
+        before = len(index)
+        codes = np.fromiter((index.setdefault(n, len(index)) for n in names), np.int64, len(names))
+        if len(index) > before:
+            self.names.extend(itertools.islice(index, before, None))
+        return codes
+
+    def decode(self, codes):
+        return np.asarray(self.names, dtype=object)[codes]
+
+
+class AttendanceStats:
+    """Per-(person, day) first seen, last seen and entries, folded in chunk by chunk.
+
+    `keys` is sorted, person code in the high bits and day number in the low,
+    so rows of one person are contiguous and in date order.
+    """
+
+    def __init__(self):
+        self.codes = NameCodes()
+        self.keys = np.zeros(0, np.int64)
+        self.first = np.zeros(0, np.int64)
+        self.last = np.zeros(0, np.int64)
+        self.count = np.zeros(0, np.int64)
+        self.rows = 0
+        self.last_id = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_csv(cls, path, chunk_bytes=CHUNK_BYTES):
+        stats = cls()
+        for codes, stamps in read_csv_chunks(path, stats.codes, chunk_bytes):
+            stats.add(codes, stamps)
+        return stats
+
+    @classmethod
+    def from_store(cls, store, chunk_rows=CHUNK_ROWS):
+        return cls().update_from_store(store, chunk_rows)
+
+    def update_from_store(self, store, chunk_rows=CHUNK_ROWS):
+        """Fold in only the store rows added since the last call."""
+        with self.lock:
+            for codes, stamps, last_id in read_store_chunks(store, self.codes, self.last_id, chunk_rows):
+                self.add(codes, stamps)
+                self.last_id = last_id
+        return self
+
+    def add(self, codes, stamps):
+        """Fold in one chunk of (name codes from self.codes, datetime64[s] timestamps)."""
+        valid = ~np.isnat(stamps)
+        codes = codes[valid]
+        secs = stamps[valid].astype(np.int64)
+        keys = (codes << DAY_BITS) | (secs // DAY)
+        self.rows += len(keys)
+        if not len(keys):
+            return
+        # Reduce the chunk on its own, then merge it into the sorted totals
+        order = np.argsort(keys)
+        keys, secs = keys[order], secs[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        keys, first = keys[starts], np.minimum.reduceat(secs, starts)
+        last, count = np.maximum.reduceat(secs, starts), np.diff(np.r_[starts, len(order)])
+        pos = np.searchsorted(self.keys, keys)
+        known = pos < len(self.keys)
+        known[known] = self.keys[pos[known]] == keys[known]
+        at = pos[known]  # unique: the chunk's keys already are
+        self.first[at] = np.minimum(self.first[at], first[known])
+        self.last[at] = np.maximum(self.last[at], last[known])
+        self.count[at] += count[known]
+        new, at = ~known, pos[~known]
+        if new.any():
+            self.keys = np.insert(self.keys, at, keys[new])
+            self.first = np.insert(self.first, at, first[new])
+            self.last = np.insert(self.last, at, last[new])
+            self.count = np.insert(self.count, at, count[new])
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def person(self):
+        return self.keys >> DAY_BITS
+
+    @property
+    def day(self):
+        return self.keys & DAY_MASK
+
+    def presence(self):
+        """One row per person per day present."""
+        return {"name": self.codes.decode(self.person), "date": self.day.astype("datetime64[D]"),
+                "first_seen": self.first.astype("datetime64[s]"),
+                "last_seen": self.last.astype("datetime64[s]"), "entries": self.count}
+
+    def people(self):
+        """One row per person: entries, days present, first and last seen overall."""
+        person = self.person
+        if not len(person):
+            return _empty(("name", "entries", "days_present", "first_seen", "last_seen"))
+        starts = np.flatnonzero(np.r_[True, person[1:] != person[:-1]])
+        return {"name": self.codes.decode(person[starts]),
+                "entries": np.add.reduceat(self.count, starts),
+                "days_present": np.diff(np.r_[starts, len(person)]),
+                "first_seen": np.minimum.reduceat(self.first, starts).astype("datetime64[s]"),
+                "last_seen": np.maximum.reduceat(self.last, starts).astype("datetime64[s]")}
+
+    def summary(self, period="week"):
+        """One row per day, ISO week (Monday) or month: entries, distinct people, days with
+        attendance and the average number of people on those days."""
+        periods, index = np.unique(period_start(self.day, period), return_inverse=True)
+        n = len(periods)
+        person_days = np.bincount(index, minlength=n)
+        entries = np.bincount(index, weights=self.count, minlength=n).astype(np.int64)
+        people = np.bincount(np.unique((index.astype(np.int64) << 32) | self.person) >> 32, minlength=n)
+        active = np.bincount(np.unique((index.astype(np.int64) << 32) | self.day) >> 32, minlength=n)
+        return {"period": periods.astype("datetime64[D]"), "entries": entries, "people": people,
+                "active_days": active, "avg_people_per_day": person_days / np.maximum(active, 1)}
+
+    def person_summary(self, period="week"):
+        """One row per person per period: days present, entries, first and last seen."""
+        keys = (self.person << DAY_BITS) | period_start(self.day, period)
+        if not len(keys):
+            return _empty(("name", "period", "days_present", "entries", "first_seen", "last_seen"))
+        # keys stays sorted: period starts are monotonic in the day within each person
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        grouped = keys[starts]
+        return {"name": self.codes.decode(grouped >> DAY_BITS),
+                "period": (grouped & DAY_MASK).astype("datetime64[D]"),
+                "days_present": np.diff(np.r_[starts, len(keys)]),
+                "entries": np.add.reduceat(self.count, starts),
+                "first_seen": np.minimum.reduceat(self.first, starts).astype("datetime64[s]"),
+                "last_seen": np.maximum.reduceat(self.last, starts).astype("datetime64[s]")}
+
+
+def _empty(columns):
+    return {name: np.zeros(0, dtype=object) for name in columns}
+
+
+def period_start(days, period):
+    """Day number of the first day of each day's period."""
+    if period == "day":
+        return days
+    if period == "week":
+        return days - (days + 3) % 7  # 1970-01-01 was a Thursday
+    if period == "month":
+        return days.astype("datetime64[D]").astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    raise ValueError(f"unknown period {period!r}, expected one of {PERIODS}")
+
+
+REPORTS = {
+    "presence": lambda s: s.presence(),
+    "people": lambda s: s.people(),
+    "daily": lambda s: s.summary("day"),
+    "week": lambda s: s.summary("week"),
+    "month": lambda s: s.summary("month"),
+    "person-week": lambda s: s.person_summary("week"),
+    "person-month": lambda s: s.person_summary("month"),
+}
+
+
+def table_rows(table):
+    return len(next(iter(table.values()))) if table else 0
+
+
+def format_rows(table, start, end):
+    """Row tuples of plain values for table[start:end]; timestamps look like logs.csv."""
+    columns = []
+    for column in table.values():
+        part = column[start:end]
+        if np.issubdtype(part.dtype, np.datetime64):
+            part = np.char.replace(np.datetime_as_string(part), "T", " ")
+        elif part.dtype.kind == "f":
+            part = np.round(part, 2)
+        columns.append(part.tolist())
+    return list(zip(*columns))
+
+
+def write_report(table, path, chunk_rows=100_000):
+    """Stream a report to path, chunk_rows at a time; the format follows the extension."""
+    n = table_rows(table)
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(list(table))
+            for start in range(0, n, chunk_rows):
+                writer.writerows(format_rows(table, start, start + chunk_rows))
+    elif path.endswith(".parquet"):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow; write .csv or a column directory instead")
+        writer = None
+        try:
+            for start in range(0, max(n, 1), chunk_rows):
+                batch = pa.table({k: v[start:start + chunk_rows] for k, v in table.items()})
+                if writer is None:
+                    writer = pq.ParquetWriter(path, batch.schema)
+                writer.write_table(batch)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        os.makedirs(path, exist_ok=True)
+        for name, column in table.items():
+            dtype = column.dtype
+            if dtype == object:
+                dtype = np.dtype(f"U{max((len(v) for v in column), default=1)}")
+            out = np.lib.format.open_memmap(os.path.join(path, f"{name}.npy"), mode="w+",
+                                            dtype=dtype, shape=(n,))
+            for start in range(0, n, chunk_rows):
+                out[start:start + chunk_rows] = column[start:start + chunk_rows]
+            out.flush()
+            del out
+    return n
+
+
+def load(source):
+    """AttendanceStats from a logs.csv or an attendance .db file."""
+    if source.endswith(".db"):
+        from attendance_store import AttendanceStore
+        store = AttendanceStore(source)
+        try:
+            return AttendanceStats.from_store(store)
+        finally:
+            store.close()
+    return AttendanceStats.from_csv(source)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Attendance reports over the whole log")
+    parser.add_argument("report", choices=sorted(REPORTS))
+    parser.add_argument("--source", default=os.path.join("face_data", "logs.csv"),
+                        help="logs.csv or attendance.db")
+    parser.add_argument("--out", help="write the full report (.csv, .parquet or a column directory)")
+    parser.add_argument("--limit", type=int, default=20, help="rows to print without --out")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    stats = load(args.source)
+    table = REPORTS[args.report](stats)
+    print(f"{stats.rows} rows -> {len(stats)} person-days, {len(stats.codes.names)} people "
+          f"in {time.perf_counter() - start:.2f}s")
+    if args.out:
+        n = write_report(table, args.out)
+        print(f"Wrote {n} rows to {args.out}")
+        return
+    print("\t".join(table))
+    for row in format_rows(table, 0, args.limit):
+        print("\t".join(str(v) for v in row))
+    if table_rows(table) > args.limit:
+        print(f"... {table_rows(table) - args.limit} more rows (use --out)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import threading
+import tkinter as tk
+from tkinter import filedialog, ttk
+
+import numpy as np
+
+from analytics import REPORTS, format_rows, table_rows, write_report
+
+
+class AnalyticsView:
+    """Toplevel with one attendance report at a time, a page of rows in the Treeview.
+
+    The stats object is brought up to date from the store on a background
+    thread (only rows added since the last refresh are read); the window
+    polls for it, then builds reports from the arrays.
+    """
+
+    def __init__(self, master, stats, store, page_size=100, report="people"):
+        self.stats = stats
+        self.store = store
+        self.page_size = page_size
+        self.table = {}
+        self.rows = np.zeros(0, np.int64)
+        self.current = 0
+        self._ready = threading.Event()
+
+        self.top = tk.Toplevel(master)
+        self.top.title("Attendance Report")
+        self.top.geometry("760x480")
+
+        bar = tk.Frame(self.top)
+        bar.pack(fill="x")
+        self.report_var = tk.StringVar(value=report)
+        box = ttk.Combobox(bar, textvariable=self.report_var, values=list(REPORTS), state="readonly", width=14)
+        box.pack(side=tk.LEFT)
+        box.bind("<<ComboboxSelected>>", lambda e: self.build())
+        tk.Label(bar, text="Name:").pack(side=tk.LEFT)
+        self.name_var = tk.StringVar()
+        entry = ttk.Entry(bar, textvariable=self.name_var, width=16)
+        entry.pack(side=tk.LEFT)
+        entry.bind("<Return>", lambda e: self.apply_filter())
+        ttk.Button(bar, text="Filter", command=self.apply_filter).pack(side=tk.LEFT)
+        ttk.Button(bar, text="Export…", command=self.export).pack(side=tk.RIGHT)
+
+        self.tree = ttk.Treeview(self.top, show="headings")
+        self.tree.pack(expand=True, fill="both")
+
+        nav = tk.Frame(self.top)
+        nav.pack(fill="x")
+        ttk.Button(nav, text="◀", command=lambda: self.show(self.current - 1)).pack(side=tk.LEFT)
+        ttk.Button(nav, text="▶", command=lambda: self.show(self.current + 1)).pack(side=tk.LEFT)
+        self.status_var = tk.StringVar(value="Crunching attendance…")
+        tk.Label(nav, textvariable=self.status_var).pack(side=tk.LEFT, padx=10)
+
+        threading.Thread(target=self._refresh, name="facevault-analytics", daemon=True).start()
+        self._poll()
+
+    def _refresh(self):
+        self.stats.update_from_store(self.store)
+        self._ready.set()
+
+    def _poll(self):
+        if not self.top.winfo_exists():
+            return
+        if not self._ready.is_set():
+            self.top.after(100, self._poll)
+            return
+        self.build()
+
+    def build(self):
+        with self.stats.lock:
+            self.table = REPORTS[self.report_var.get()](self.stats)
+        columns = list(self.table)
+        self.tree.configure(columns=columns)
+        for column in columns:
+            self.tree.heading(column, text=column.replace("_", " ").title())
+            self.tree.column(column, width=110, anchor="w")
+        self.apply_filter()
+
+    def apply_filter(self):
+        text = self.name_var.get().strip().lower()
+        names = self.table.get("name")
+        if text and names is not None:
+            self.rows = np.flatnonzero([text in n.lower() for n in names])
+        else:
+            self.rows = np.arange(table_rows(self.table))
+        self.show(0)
+
+    def pages(self):
+        return max(1, -(-len(self.rows) // self.page_size))
+
+    def show(self, index):
+        self.current = max(0, min(index, self.pages() - 1))
+        start = self.current * self.page_size
+        page = self.rows[start:start + self.page_size]
+        view = {k: v[page] for k, v in self.table.items()}
+        self.tree.delete(*self.tree.get_children())
+        for row in format_rows(view, 0, len(page)):
+            self.tree.insert("", "end", values=row)
+        self.status_var.set(f"Page {self.current + 1}/{self.pages()} · {len(self.rows)} rows · "
+                            f"{self.stats.rows} log entries")
+
+    def export(self):
+        if not self.table:
+            return
+        path = filedialog.asksaveasfilename(parent=self.top, defaultextension=".csv",
+                                            initialfile=f"{self.report_var.get()}.csv",
+                                            filetypes=[("CSV", "*.csv"), ("Parquet", "*.parquet")])
+        if not path:
+            return
+        table, done = self.table, []
+        self.status_var.set(f"Exporting to {path}…")
+
+        def work():
+            try:
+                done.append(f"Exported {write_report(table, path)} rows to {path}")
+            except Exception as e:
+                done.append(f"Export failed: {e}")
+
+        def poll():
+            if not self.top.winfo_exists():
+                return
+            if done:
+                self.status_var.set(done[0])
+            else:
+                self.top.after(200, poll)
+        threading.Thread(target=work, name="facevault-export", daemon=True).start()
+        poll()
@@ -0,0 +1,93 @@
+import numpy as np
+
+PARTICLE_COLORS = ("#00f0ff", "#0055ff")
+
+
+class ParticleField:
+    """Background particle positions, stepped as arrays; knows nothing about the toolkit."""
+
+    def __init__(self, count=40, width=1180, height=760, speed=1, colors=PARTICLE_COLORS, seed=None):
+        self.width = width
+        self.height = height
+        self.speed = speed
+        self.rng = np.random.default_rng(seed)
+        self.x = self.rng.integers(0, width + 1, count)
+        self.y = self.rng.integers(0, height + 1, count)
+        self.colors = [colors[i] for i in self.rng.integers(0, len(colors), count)]
+
+    def __len__(self):
+        return len(self.x)
+
+    def step(self, respawn_x=False):
+        """Advance one frame; returns the indices that wrapped back to the top."""
+        self.y += self.speed
+        wrapped = np.flatnonzero(self.y > self.height)
+        if len(wrapped):
+            self.y[wrapped] = 0
+            if respawn_x:
+                self.x[wrapped] = self.rng.integers(0, self.width + 1, len(wrapped))
+        return wrapped
+
+
+class TkParticleAnimator:
+    """The single after() loop animating a window's particle canvas.
+
+    Ovals are created once per canvas and moved in place: one canvas.move()
+    per tick for the whole field, plus coords() for the few that wrapped.
+    attach() and start() are idempotent, so rebuilding the UI re-targets the
+    same loop instead of stacking another. While busy() is true or the window
+    is hidden the loop only polls, at `idle_interval`.
+    """
+
+    TAG = "particle"
+
+    def __init__(self, root, field=None, interval=50, idle_interval=250, busy=None):
+        self.root = root
+        self.field = field or ParticleField()
+        self.interval = interval
+        self.idle_interval = idle_interval
+        self.busy = busy or (lambda: False)
+        self.canvas = None
+        self.items = []
+        self.ticks = 0
+        self._job = None
+
+    def attach(self, canvas):
+        if canvas is self.canvas:
+            return
+        self.canvas = canvas
+        f = self.field
+        self.items = [canvas.create_oval(x, y, x + 2, y + 2, fill=c, outline=c, tags=self.TAG)
+                      for x, y, c in zip(f.x.tolist(), f.y.tolist(), f.colors)]
+        self.start()
+
+    def start(self):
+        if self._job is None:
+            self._job = self.root.after(self.interval, self._tick)
+
+    def stop(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+
+    def paused(self):
+        return (self.busy() or self.root.state() in ("iconic", "withdrawn")
+                or not self.canvas.winfo_viewable())
+
+    def _tick(self):
+        self._job = None
+        if self.canvas is None or not self.canvas.winfo_exists():
+            # The UI was torn down; attach() restarts the loop on the next canvas
+            self.canvas = None
+            return
+        if self.paused():
+            self._job = self.root.after(self.idle_interval, self._tick)
+            return
+        f = self.field
+        wrapped = f.step()
+        self.canvas.move(self.TAG, 0, f.speed)
+        for i in wrapped.tolist():
+            x, y = int(f.x[i]), int(f.y[i])
+            self.canvas.coords(self.items[i], x, y, x + 2, y + 2)
+        self.ticks += 1
+        self._job = self.root.after(self.interval, self._tick)
@@ -0,0 +1,200 @@
+import os
+import numpy as np
+
+from gallery import top_k_rows
+
+
+def assign_to_centroids(data, centroids, chunk=65536):
+    # argmin |x - c|^2 == argmin |c|^2 - 2 x.c, done in chunks to bound memory
+    c_sq = np.einsum("ij,ij->i", centroids, centroids)
+    labels = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), chunk):
+        block = data[start:start + chunk]
+        labels[start:start + chunk] = (c_sq[None, :] - 2.0 * block @ centroids.T).argmin(axis=1)
+    return labels
+
+
+def kmeans(data, k, iters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    data = np.asarray(data, dtype=np.float64)
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iters):
+        labels = assign_to_centroids(data, centroids)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=k)
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+        sums = np.add.reduceat(data[order], starts, axis=0)
+        centroids[filled] = sums / counts[filled, None]
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file index: k-means coarse centroids, each owning a list of gallery rows.
+
+    nlist and nprobe are the recall/latency knobs. Every candidate from the probed
+    lists is re-ranked with the exact distance against the gallery matrix, so a match
+    found here gets the same tolerance decision compare_faces would give it.
+    """
+
+    def __init__(self, nlist=0, nprobe=8, min_candidates=256, min_size=5000,
+                 train_iters=10, train_sample=32):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_candidates = min_candidates
+        self.min_size = min_size
+        self.train_iters = train_iters
+        self.train_sample = train_sample
+        self.centroids = None
+        self._lists = []
+        self._counts = None
+        self._assign = np.empty(0, dtype=np.int64)
+
+    def ready(self, gallery):
+        return self.centroids is not None and gallery.size >= self.min_size
+
+    def train(self, vectors, seed=0):
+        n = len(vectors)
+        nlist = self.nlist or max(1, int(4 * np.sqrt(n)))
+        nlist = min(nlist, n)
+        sample = min(n, nlist * self.train_sample)
+        rng = np.random.default_rng(seed)
+        picked = vectors[np.sort(rng.choice(n, sample, replace=False))] if sample < n else vectors
+        self.centroids = kmeans(picked, nlist, self.train_iters, seed)
+        self.nlist = nlist
+
+    def build(self, gallery):
+        if self.centroids is None:
+            self.train(gallery.encodings)
+        self._fill(assign_to_centroids(gallery.encodings, self.centroids))
+
+    def _fill(self, labels):
+        nlist = len(self.centroids)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=nlist)
+        bounds = np.concatenate(([0], np.cumsum(counts)))
+        self._lists = []
+        for i in range(nlist):
+            members = order[bounds[i]:bounds[i + 1]]
+            buf = np.empty(max(8, 2 * len(members)), dtype=np.int64)
+            buf[:len(members)] = members
+            self._lists.append(buf)
+        self._counts = counts.astype(np.int64)
+        self._assign = np.asarray(labels, dtype=np.int64).copy()
+
+    # Incremental maintenance, driven by FaceGallery.add/remove
+
+    def add(self, row, encoding):
+        if self.centroids is None:
+            return
+        label = int(assign_to_centroids(encoding[None, :], self.centroids)[0])
+        if row >= len(self._assign):
+            grown = np.full(max(64, 2 * len(self._assign), row + 1), -1, dtype=np.int64)
+            grown[:len(self._assign)] = self._assign
+            self._assign = grown
+        self._assign[row] = label
+        self._push(label, row)
+
+    def update(self, row, encoding):
+        if self.centroids is None:
+            return
+        self._drop(int(self._assign[row]), row)
+        self.add(row, encoding)
+
+    def remove(self, row, last):
+        if self.centroids is None:
+            return
+        self._drop(int(self._assign[row]), row)
+        if row != last:
+            # The gallery moves its last row into the hole; follow it
+            label = int(self._assign[last])
+            members = self._lists[label][:self._counts[label]]
+            members[members == last] = row
+            self._assign[row] = label
+        self._assign[last] = -1
+
+    def _push(self, label, row):
+        buf = self._lists[label]
+        n = self._counts[label]
+        if n == len(buf):
+            grown = np.empty(2 * len(buf), dtype=np.int64)
+            grown[:n] = buf
+            self._lists[label] = buf = grown
+        buf[n] = row
+        self._counts[label] = n + 1
+
+    def _drop(self, label, row):
+        buf = self._lists[label]
+        n = self._counts[label]
+        pos = np.flatnonzero(buf[:n] == row)
+        if len(pos):
+            buf[pos[0]] = buf[n - 1]
+            self._counts[label] = n - 1
+
+    def nearest(self, gallery, probes, k=1):
+        nlist = len(self.centroids)
+        nprobe = min(self.nprobe, nlist)
+        c_sq = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        coarse = c_sq[None, :] - 2.0 * probes @ self.centroids.T
+        ranked = np.argsort(coarse, axis=1)
+        out_rows = np.full((len(probes), k), -1, dtype=np.int64)
+        out_dists = np.full((len(probes), k), np.inf)
+        matrix = gallery.encodings
+        for i, probe in enumerate(probes):
+            # Probe at least nprobe lists, more if they are too sparse to fill the shortlist
+            taken, total = [], 0
+            for label in ranked[i]:
+                if len(taken) >= nprobe and total >= self.min_candidates:
+                    break
+                n = self._counts[label]
+                if n:
+                    taken.append(self._lists[label][:n])
+                    total += n
+            if not taken:
+                continue
+            cands = np.concatenate(taken)
+            diff = matrix[cands] - probe
+            dists = np.sqrt(np.einsum("ij,ij->i", diff, diff))[None, :]
+            rows, d = top_k_rows(dists, cands, k)
+            out_rows[i], out_dists[i] = rows[0], d[0]
+        return out_rows, out_dists
+
+    # Persistence beside the encoding store
+
+    def save(self, path, gallery):
+        np.savez(path, centroids=self.centroids, assign=self._assign[:gallery.size],
+                 names=np.asarray(gallery.names, dtype=str),
+                 params=np.array([self.nprobe, self.min_candidates, self.min_size]))
+
+    def load(self, path, gallery):
+        with np.load(path, allow_pickle=False) as data:
+            self.centroids = data["centroids"]
+            self.nlist = len(self.centroids)
+            names = data["names"]
+            if len(names) == gallery.size and np.array_equal(names, np.asarray(gallery.names, dtype=str)):
+                self._fill(data["assign"])
+            else:
+                # Gallery changed since the index was saved: keep the centroids, reassign rows
+                self.build(gallery)
+
+
+def index_path_for(encodings_file):
+    return encodings_file + ".ivf.npz"
+
+
+def attach_ivf(gallery, encodings_file, nlist=0, nprobe=8, min_candidates=256, min_size=5000):
+    """Load the persisted IVF index for this store, or build and save one."""
+    index = IVFIndex(nlist=nlist, nprobe=nprobe, min_candidates=min_candidates, min_size=min_size)
+    path = index_path_for(encodings_file)
+    if os.path.exists(path):
+        index.load(path, gallery)
+    elif gallery.size >= min_size:
+        index.build(gallery)
+        index.save(path, gallery)
+    else:
+        return None
+    gallery.attach_index(index)
+    return index
@@ -0,0 +1,86 @@
+import csv
+import datetime
+import os
+import threading
+import time
+
+from metrics import METRICS
+
+
+class AttendanceWriter:
+    """Debounced, buffered writer for face_data/logs.csv.
+
+    A name is only logged again once cooldown seconds have passed since its last
+    row. Rows collect in memory and a background thread appends them in one go
+    when flush_rows are waiting or every flush_interval seconds. With a store
+    (attendance_store.AttendanceStore) each batch is mirrored there as well.
+    """
+
+    def __init__(self, path, cooldown=300, flush_rows=50, flush_interval=10.0, store=None):
+        self.path = path
+        self.store = store
+        self.cooldown = cooldown
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self.writes = 0
+        self._last_seen = {}
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="facevault-attendance", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_settings(cls, path, settings, store=None):
+        return cls(path, cooldown=settings["attendance_cooldown_s"],
+                   flush_rows=settings["attendance_flush_rows"],
+                   flush_interval=settings["attendance_flush_s"], store=store)
+
+    def log(self, name, when=None):
+        """Queue a row for name; returns False if it falls inside the cooldown window."""
+        when = when or datetime.datetime.now()
+        with self._lock:
+            last = self._last_seen.get(name)
+            if last is not None and (when - last).total_seconds() < self.cooldown:
+                return False
+            self._last_seen[name] = when
+            self._buffer.append([name, when.strftime("%Y-%m-%d %H:%M:%S")])
+            full = len(self._buffer) >= self.flush_rows
+        if full:
+            self._wake.set()
+        return True
+
+    def flush(self, sync=False):
+        with self._io_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return 0
+            start = time.perf_counter()
+            with open(self.path, "a", newline="") as f:
+                csv.writer(f).writerows(rows)
+                if sync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            if self.store is not None:
+                self.store.append_many(rows)
+            METRICS.since("log_io", start)
+            self.rows_written += len(rows)
+            self.writes += 1
+            return len(rows)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._buffer:
+                self.flush()
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._thread.join(2.0)
+        self.flush(sync=True)
@@ -0,0 +1,227 @@
+import csv
+import datetime
+import os
+import sqlite3
+import sys
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_name_ts ON entries (name, ts);
+CREATE INDEX IF NOT EXISTS entries_date ON entries (date);
+CREATE INDEX IF NOT EXISTS entries_ts ON entries (ts);
+CREATE TABLE IF NOT EXISTS daily_counts (
+    date TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS person_counts (
+    name TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    first_ts TEXT NOT NULL,
+    last_ts TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS imports (
+    source TEXT PRIMARY KEY,
+    rows INTEGER NOT NULL
+);
+"""
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_row(name, ts):
+    """(name, ts, date) with ts normalised, or None when ts is not a logs.csv timestamp."""
+    try:
+        when = datetime.datetime.strptime(ts.strip(), TS_FORMAT)
+    except (ValueError, AttributeError):
+        return None
+    return name, when.strftime(TS_FORMAT), when.strftime("%Y-%m-%d")
+
+
+class AttendanceStore:
+    """SQLite attendance store with per-day and per-person counters kept up to date on append.
+
+    Rows use the logs.csv shape: (name, "YYYY-MM-DD HH:MM:SS"). Rows whose
+    timestamp does not parse are skipped and counted in `rejected`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self.rejected = 0
+
+    def _parse(self, rows):
+        parsed = [parse_row(name, ts) for name, ts in rows]
+        rows = [row for row in parsed if row is not None]
+        self.rejected += len(parsed) - len(rows)
+        return rows
+
+    def _insert(self, rows):
+        # Caller holds the lock and the transaction
+        self._db.executemany("INSERT INTO entries (name, ts, date) VALUES (?, ?, ?)", rows)
+        self._db.executemany(
+            "INSERT INTO daily_counts (date, count) VALUES (?, 1) "
+            "ON CONFLICT(date) DO UPDATE SET count = count + 1",
+            [(date,) for _, _, date in rows])
+        self._db.executemany(
+            "INSERT INTO person_counts (name, count, first_ts, last_ts) VALUES (?, 1, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET count = count + 1, "
+            "first_ts = min(first_ts, excluded.first_ts), last_ts = max(last_ts, excluded.last_ts)",
+            [(name, ts, ts) for name, ts, _ in rows])
+        return len(rows)
+
+    def append_many(self, rows):
+        rows = self._parse(rows)
+        if not rows:
+            return 0
+        with self._lock, self._db:
+            return self._insert(rows)
+
+    def append(self, name, ts):
+        return self.append_many([(name, ts)])
+
+    def _query(self, sql, args=()):
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    def daily_counts(self):
+        return self._query("SELECT date, count FROM daily_counts ORDER BY date")
+
+    def person_counts(self):
+        return self._query("SELECT name, count, first_ts, last_ts FROM person_counts ORDER BY name")
+
+    def person(self, name):
+        rows = self._query("SELECT count, first_ts, last_ts FROM person_counts WHERE name = ?", (name,))
+        return rows[0] if rows else None
+
+    def total(self):
+        return self._query("SELECT coalesce(sum(count), 0) FROM daily_counts")[0][0]
+
+    @staticmethod
+    def _where(name=None, date=None, before_date=None):
+        clauses, args = [], []
+        if name:
+            clauses.append("name = ?")
+            args.append(name)
+        if date:
+            clauses.append("date = ?")
+            args.append(date)
+        if before_date:
+            clauses.append("date < ?")
+            args.append(before_date)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def count(self, name=None, date=None, before_date=None):
+        # Answer from the counters where possible; fall back to the indexes
+        if not date and not before_date:
+            if name:
+                row = self.person(name)
+                return row[0] if row else 0
+            return self.total()
+        if not name and before_date and not date:
+            return self._query("SELECT coalesce(sum(count), 0) FROM daily_counts WHERE date < ?",
+                               (before_date,))[0][0]
+        if not name and date and not before_date:
+            rows = self._query("SELECT count FROM daily_counts WHERE date = ?", (date,))
+            return rows[0][0] if rows else 0
+        where, args = self._where(name, date, before_date)
+        return self._query("SELECT count(*) FROM entries" + where, args)[0][0]
+
+    def entries(self, name=None, date=None, offset=0, limit=100):
+        """Rows in (ts, id) order, the order count(before_date=...) positions pages by."""
+        where, args = self._where(name, date)
+        return self._query("SELECT id, name, ts FROM entries" + where + " ORDER BY ts, id LIMIT ? OFFSET ?",
+                           args + [limit, offset])
+
+    def entries_after(self, after_id, limit=100):
+        """Rows with id > after_id in insertion order, for readers that follow new appends."""
+        return self._query("SELECT id, name, ts FROM entries WHERE id > ? ORDER BY id LIMIT ?",
+                           (after_id, limit))
+
+    def import_csv(self, csv_path, batch=10000):
+        """One-shot import of logs.csv; a file already imported is skipped.
+
+        A missing file is marked as imported too: from then on the store mirrors
+        it (AttendanceWriter writes both), so its rows must never be read back in.
+        The rows and the marker go in one transaction, so an interrupted import
+        leaves nothing behind and simply runs again.
+        """
+        source = os.path.abspath(csv_path)
+        if self._query("SELECT 1 FROM imports WHERE source = ?", (source,)):
+            return 0
+        total = 0
+        with self._lock, self._db:
+            if os.path.exists(csv_path):
+                with open(csv_path, "r", newline="") as f:
+                    pending = []
+                    for row in csv.reader(f):
+                        if len(row) < 2:
+                            continue
+                        pending.append((row[0], row[1]))
+                        if len(pending) >= batch:
+                            total += self._insert(self._parse(pending))
+                            pending = []
+                    rows = self._parse(pending)
+                    if rows:
+                        total += self._insert(rows)
+            self._db.execute("INSERT INTO imports (source, rows) VALUES (?, ?)", (source, total))
+        return total
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class LogPager:
+    """Page-at-a-time view over the attendance store, shared by the Tk and Qt dashboards."""
+
+    def __init__(self, store, page_size=100):
+        self.store = store
+        self.page_size = page_size
+        self.name = None
+        self.date = None
+
+    def set_filter(self, name=None, date=None):
+        self.name = name or None
+        self.date = date or None
+
+    def count(self):
+        return self.store.count(self.name, self.date)
+
+    def pages(self):
+        return max(1, -(-self.count() // self.page_size))
+
+    def page(self, index):
+        index = max(0, min(index, self.pages() - 1))
+        return index, self.store.entries(self.name, self.date, index * self.page_size, self.page_size)
+
+    def page_for_date(self, date):
+        return self.store.count(self.name, before_date=date) // self.page_size
+
+    @staticmethod
+    def format(rows):
+        return "".join(f"{name},{ts}\n" for _, name, ts in rows)
+
+
+def open_store(data_dir, log_file):
+    """Open face_data/attendance.db, importing log_file the first time it is seen."""
+    store = AttendanceStore(os.path.join(data_dir, "attendance.db"))
+    store.import_csv(log_file)
+    return store
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "import":
+        print("usage: python attendance_store.py import <logs.csv>")
+        sys.exit(1)
+    store = AttendanceStore(os.path.join(os.path.dirname(sys.argv[2]) or ".", "attendance.db"))
+    print(f"Imported {store.import_csv(sys.argv[2])} rows, skipped {store.rejected} with a bad timestamp")
@@ -0,0 +1,172 @@
+"""Offline recognition over recorded video or a folder of images.
+
+    python batch_recognize.py entrance.mp4 --out audit.csv --stride 5 --workers 4
+    python batch_recognize.py snapshots/ --out audit.csv
+
+Runs the same detect -> encode -> match step as the live apps and writes
+attendance rows in the logs.csv format (name,YYYY-MM-DD HH:MM:SS). A video is
+split into frame ranges that pool workers decode on their own, one frame at a
+time, so memory stays flat whatever the file size.
+"""
+import argparse
+import datetime
+import multiprocessing
+import os
+import sys
+import time
+
+import cv2
+
+from attendance import AttendanceWriter
+from enroll import IMAGE_EXTS
+from settings import load_settings
+
+_recognizer = None
+
+
+def _init_worker(store_path, data_dir):
+    # Each worker memory-maps the store once and keeps its own recognizer. No tracker or
+    # motion gate: both assume a live camera and a wall clock, not a file read at full speed
+    global _recognizer
+    from detector import FaceDetector
+    from encoding_store import EncodingStore
+    from recognizer import Recognizer
+    settings = load_settings(data_dir)
+    gallery = EncodingStore(store_path, readonly=True).to_gallery()
+    _recognizer = Recognizer(gallery, settings["tolerance"], detector=FaceDetector.from_settings(settings))
+
+
+def _names(rgb):
+    return [face.name for face in _recognizer.analyze(rgb) if face.name is not None]
+
+
+def video_chunks(path, chunk_frames):
+    cap = cv2.VideoCapture(path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+    if total <= 0:
+        # Unknown length (some containers/streams): one sequential chunk
+        yield path, 0, None, fps
+        return
+    for start in range(0, total, chunk_frames):
+        yield path, start, min(total, start + chunk_frames), fps
+
+
+def process_video_chunk(job):
+    path, start, end, fps, stride = job
+    _recognizer.reset()
+    cap = cv2.VideoCapture(path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    hits, frames = [], 0
+    idx = start
+    while end is None or idx < end:
+        # grab() skips decoding for frames the stride drops
+        if not cap.grab():
+            break
+        if idx % stride == 0:
+            ret, frame = cap.retrieve()
+            if ret:
+                frames += 1
+                names = _names(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                if names:
+                    hits.append((idx / fps, names))
+        idx += 1
+    cap.release()
+    return hits, frames
+
+
+def image_chunks(root, chunk_files):
+    paths = []
+    for dirpath, _, files in os.walk(root):
+        for fname in sorted(files):
+            if os.path.splitext(fname)[1].lower() in IMAGE_EXTS:
+                paths.append(os.path.join(dirpath, fname))
+    paths.sort(key=os.path.getmtime)
+    for start in range(0, len(paths), chunk_files):
+        yield paths[start:start + chunk_files]
+
+
+def process_image_chunk(paths):
+    hits, frames = [], 0
+    for path in paths:
+        frame = cv2.imread(path)
+        if frame is None:
+            continue
+        # Unrelated photos: the detector must not search around the previous one's faces
+        _recognizer.reset()
+        frames += 1
+        names = _names(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if names:
+            hits.append((os.path.getmtime(path), names))
+    return hits, frames
+
+
+def run(source, out_path, store_path, data_dir="face_data", workers=None, stride=1,
+        chunk=300, start_time=None, cooldown=300, report=sys.stdout):
+    from encoding_store import EncodingStore
+    # A mistyped --store must fail here, not produce a report full of unknown faces
+    EncodingStore(store_path, readonly=True).close()
+    writer = AttendanceWriter(out_path, cooldown=cooldown, flush_rows=1000, flush_interval=30.0)
+    workers = workers or os.cpu_count() or 1
+    if os.path.isdir(source):
+        jobs = image_chunks(source, max(1, chunk // 10))
+        worker_fn = process_image_chunk
+        to_time = datetime.datetime.fromtimestamp
+    else:
+        if start_time is None:
+            # A recording's mtime is roughly when it ended
+            cap = cv2.VideoCapture(source)
+            frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            cap.release()
+            start_time = (datetime.datetime.fromtimestamp(os.path.getmtime(source))
+                          - datetime.timedelta(seconds=max(frames, 0) / fps))
+        jobs = ((p, s, e, fps, stride) for p, s, e, fps in video_chunks(source, chunk))
+        worker_fn = process_video_chunk
+        to_time = lambda offset: start_time + datetime.timedelta(seconds=offset)
+
+    processed = rows = 0
+    began = time.perf_counter()
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(store_path, data_dir)) as pool:
+        # imap keeps chunk order, so the cooldown sees hits in time order
+        for hits, frames in pool.imap(worker_fn, jobs):
+            processed += frames
+            for when, names in hits:
+                for name in names:
+                    rows += writer.log(name, to_time(when))
+            elapsed = time.perf_counter() - began
+            print(f"  {processed} frames  {processed / max(elapsed, 1e-9):.1f} frames/s  "
+                  f"{rows} rows", file=report)
+    writer.close()
+    elapsed = time.perf_counter() - began
+    fps = processed / max(elapsed, 1e-9)
+    print(f"Processed {processed} frames in {elapsed:.1f}s ({fps:.1f} frames/s), "
+          f"wrote {rows} attendance rows to {out_path}", file=report)
+    return {"frames": processed, "seconds": elapsed, "fps": fps, "rows": rows}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recognize faces in a video file or image folder")
+    parser.add_argument("source", help="video file or directory of images")
+    parser.add_argument("--out", default="batch_logs.csv", help="attendance CSV to append to")
+    parser.add_argument("--store", default=os.path.join("face_data", "encodings.dat.store"))
+    parser.add_argument("--data-dir", default="face_data", help="where settings.json lives")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--stride", type=int, default=1, help="analyse every Nth video frame")
+    parser.add_argument("--chunk", type=int, default=300, help="video frames per worker task")
+    parser.add_argument("--start", default=None, help="recording start, YYYY-MM-DD HH:MM:SS")
+    parser.add_argument("--cooldown", type=float, default=300,
+                        help="seconds before the same name is logged again")
+    args = parser.parse_args(argv)
+    start = datetime.datetime.strptime(args.start, "%Y-%m-%d %H:%M:%S") if args.start else None
+    try:
+        run(args.source, args.out, args.store, args.data_dir, args.workers, max(1, args.stride),
+            args.chunk, start, args.cooldown)
+    except FileNotFoundError as e:
+        raise SystemExit(str(e))
+
+
+if __name__ == "__main__":
+    main()
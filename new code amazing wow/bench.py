@@ -0,0 +1,214 @@
+"""Headless benchmarks for the recognition hot path.
+
+    python bench.py --out results.json
+    python bench.py --quick --baseline results.json
+
+Synthetic frames are tiled from the bundled face_data/meow.jpg and trash.jpg
+faces at several frame sizes and faces-per-frame. Every stage of the live loop
+is timed separately, and matching is swept over generated registries of 10 to
+1M encodings. Results are JSON; --baseline prints the ratio against a saved run.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+import face_recognition
+from PIL import Image
+
+from encoder import encode_frames
+from gallery import FaceGallery
+from render import FrameRenderer, TkFrameRenderer
+
+SAMPLES = [os.path.join("face_data", "meow.jpg"), os.path.join("face_data", "trash.jpg")]
+FRAME_SIZES = [(640, 480), (1280, 720), (1920, 1080)]
+FACE_COUNTS = [1, 2, 4]
+REGISTRY_SIZES = [10, 100, 1000, 10000, 100000, 1000000]
+
+
+def timed(fn, repeat=5, warmup=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    samples.sort()
+    return {"median_ms": samples[len(samples) // 2], "min_ms": samples[0],
+            "p95_ms": samples[min(len(samples) - 1, int(0.95 * len(samples)))]}
+
+
+def face_crops(paths=SAMPLES):
+    crops = []
+    for path in paths:
+        rgb = face_recognition.load_image_file(path)
+        boxes = face_recognition.face_locations(rgb)
+        if not boxes:
+            crops.append(rgb)
+            continue
+        top, right, bottom, left = boxes[0]
+        pad = (bottom - top) // 2
+        crops.append(rgb[max(0, top - pad):bottom + pad, max(0, left - pad):right + pad])
+    return crops
+
+
+def synthetic_frame(crops, size, faces):
+    """BGR frame of the given (w, h) with `faces` crops tiled on a grey background."""
+    w, h = size
+    frame = np.full((h, w, 3), 90, dtype=np.uint8)
+    cols = int(np.ceil(np.sqrt(faces)))
+    rows = int(np.ceil(faces / cols))
+    cell = min(w // cols, h // rows)
+    for i in range(faces):
+        crop = cv2.resize(crops[i % len(crops)], (cell, cell))
+        y, x = (i // cols) * cell, (i % cols) * cell
+        frame[y:y + cell, x:x + cell] = cv2.cvtColor(crop, cv2.COLOR_RGB2BGR)
+    return frame
+
+
+def legacy_match(known_faces, encoding):
+    # The per-identity loop the apps used before FaceGallery
+    for name, known_enc in known_faces.items():
+        if face_recognition.compare_faces([known_enc], encoding)[0]:
+            return name
+    return None
+
+
+def bench_stages(crops, sizes, counts, repeat):
+    try:
+        import tkinter
+        from PIL import ImageTk
+        tk_root = tkinter.Tk()
+        tk_root.withdraw()
+    except Exception:
+        tk_root = None  # no display: PhotoImage is skipped
+
+    known = {f"p{i}": np.random.default_rng(i).normal(0, 0.1, 128) for i in range(100)}
+    gallery = FaceGallery.from_dict(known)
+    renderer = FrameRenderer((860, 480))
+    if tk_root is not None:
+        tk_renderer = TkFrameRenderer(tkinter.Label(tk_root), (860, 480))
+    results = []
+    for size in sizes:
+        for faces in counts:
+            frame = synthetic_frame(crops, size, faces)
+            rgb = cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB)
+            boxes = face_recognition.face_locations(rgb)
+            encodings = face_recognition.face_encodings(rgb, boxes)
+            stages = {
+                "flip_cvtcolor": timed(lambda: cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB), repeat),
+                "face_locations": timed(lambda: face_recognition.face_locations(rgb), repeat),
+                "face_encodings_per_box": timed(
+                    lambda: [face_recognition.face_encodings(rgb, [b]) for b in boxes], repeat),
+                "face_encodings_batched": timed(lambda: face_recognition.face_encodings(rgb, boxes), repeat),
+                "encode_frames_dlib_batch": timed(lambda: encode_frames([rgb], [boxes]), repeat),
+                "match_legacy_loop": timed(lambda: [legacy_match(known, e) for e in encodings], repeat),
+                "match_gallery": timed(lambda: gallery.match(encodings) if encodings else None, repeat),
+                "overlay": timed(lambda: _draw(rgb.copy(), boxes), repeat),
+                "pil_resize": timed(lambda: Image.fromarray(rgb).resize((860, 480)), repeat),
+                "render_buffer": timed(lambda: renderer.begin(rgb), repeat),
+            }
+            if tk_root is not None:
+                stages["pil_photoimage"] = timed(
+                    lambda: ImageTk.PhotoImage(Image.fromarray(rgb).resize((860, 480))), repeat)
+                stages["render_paste"] = timed(lambda: (tk_renderer.begin(rgb), tk_renderer.show()), repeat)
+            results.append({"frame": f"{size[0]}x{size[1]}", "faces": faces,
+                            "detected": len(boxes), "stages": stages})
+            print(f"  {size[0]}x{size[1]} faces={faces} detected={len(boxes)} "
+                  f"locate={stages['face_locations']['median_ms']:.1f}ms")
+    if tk_root is not None:
+        tk_root.destroy()
+    return results
+
+
+def _draw(rgb, boxes):
+    for top, right, bottom, left in boxes:
+        cv2.rectangle(rgb, (left, top), (right, bottom), (0, 255, 0), 2)
+        cv2.putText(rgb, "Unknown", (left, top - 10), cv2.FONT_HERSHEY_DUPLEX, 0.7, (0, 255, 0), 2)
+    cv2.line(rgb, (0, 100), (rgb.shape[1], 100), (0, 255, 0), 2)
+
+
+def bench_registry(sizes, repeat, probes=4, legacy_limit=10000, seed=0):
+    rng = np.random.default_rng(seed)
+    results = []
+    for n in sizes:
+        matrix = rng.standard_normal((n, 128), dtype=np.float32) * np.float32(0.1)
+        names = [f"id{i}" for i in range(n)]
+        start = time.perf_counter()
+        gallery = FaceGallery.from_arrays(names, matrix)
+        build_ms = (time.perf_counter() - start) * 1000.0
+        noise = rng.standard_normal((probes, 128), dtype=np.float32) * np.float32(0.01)
+        queries = matrix[rng.integers(0, n, probes)] + noise
+        entry = {"registry": n, "build_ms": build_ms,
+                 "match_batch": timed(lambda: gallery.match(queries), repeat),
+                 "match_one": timed(lambda: gallery.match_one(queries[0]), repeat)}
+        if n <= legacy_limit:
+            known = dict(zip(names, matrix.astype(np.float64)))
+            entry["legacy_loop_one"] = timed(lambda: legacy_match(known, queries[0]), max(1, repeat // 2))
+        results.append(entry)
+        print(f"  registry={n} match_one={entry['match_one']['median_ms']:.3f}ms")
+    return results
+
+
+def compare(current, baseline, threshold=1.10):
+    """Print median ratios current/baseline; returns the metrics slower than threshold."""
+    def flatten(run):
+        out = {}
+        for s in run.get("stages", []):
+            for stage, t in s["stages"].items():
+                out[f"stage {s['frame']} x{s['faces']} {stage}"] = t["median_ms"]
+        for r in run.get("registry", []):
+            for key, t in r.items():
+                if isinstance(t, dict):
+                    out[f"registry {r['registry']} {key}"] = t["median_ms"]
+        return out
+    cur, base = flatten(current), flatten(baseline)
+    regressions = []
+    for key in sorted(cur):
+        if key not in base or base[key] <= 0:
+            continue
+        ratio = cur[key] / base[key]
+        flag = "  SLOWER" if ratio > threshold else ("  faster" if ratio < 1 / threshold else "")
+        print(f"{key:60s} {base[key]:10.3f} -> {cur[key]:10.3f} ms  x{ratio:.2f}{flag}")
+        if ratio > threshold:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the FaceVault recognition hot path")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", default=None, help="earlier results JSON to compare against")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="one frame size, registries up to 100k")
+    parser.add_argument("--skip-stages", action="store_true")
+    parser.add_argument("--skip-registry", action="store_true")
+    args = parser.parse_args(argv)
+
+    sizes = FRAME_SIZES[:1] if args.quick else FRAME_SIZES
+    registry = [n for n in REGISTRY_SIZES if not args.quick or n <= 100000]
+    run = {"host": {"python": sys.version.split()[0], "platform": platform.platform(),
+                    "cpus": os.cpu_count(), "numpy": np.__version__, "opencv": cv2.__version__},
+           "time": time.strftime("%Y-%m-%d %H:%M:%S")}
+    if not args.skip_stages:
+        print("Per-stage timings")
+        run["stages"] = bench_stages(face_crops(), sizes, FACE_COUNTS, args.repeat)
+    if not args.skip_registry:
+        print("Registry sweep")
+        run["registry"] = bench_registry(registry, args.repeat)
+    with open(args.out, "w") as f:
+        json.dump(run, f, indent=2)
+    print(f"Wrote {args.out}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(run, json.load(f))
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
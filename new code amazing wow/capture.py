@@ -0,0 +1,253 @@
+"""Camera capture configuration, negotiation report and a synthetic test source.
+
+    python capture.py 0 --width 640 --height 480 --fps 30 --fourcc MJPG --buffer 1
+    python capture.py synthetic:1280x720@30 --seconds 5 --detect
+
+Devices are asked for a resolution, frame rate, FOURCC and driver buffer size
+through the chosen backend. Afterwards the values the driver actually accepted
+are read back, because most drivers silently fall back to the nearest mode
+they support. The probe prints that report, the delivered FPS, the time per
+read() and the share of frames with a detected face. Run it over a few modes
+to find the cheapest stream that still recognizes reliably.
+"""
+import argparse
+import json
+import re
+import time
+
+import cv2
+import numpy as np
+
+BACKENDS = {"": "CAP_ANY", "any": "CAP_ANY", "v4l2": "CAP_V4L2", "dshow": "CAP_DSHOW",
+            "msmf": "CAP_MSMF", "avfoundation": "CAP_AVFOUNDATION",
+            "gstreamer": "CAP_GSTREAMER", "ffmpeg": "CAP_FFMPEG"}
+
+SYNTHETIC = re.compile(r"^synthetic(?::(\d+)x(\d+))?(?:@(\d+(?:\.\d+)?))?$")
+
+
+def fourcc_code(text):
+    return cv2.VideoWriter_fourcc(*text) if text else 0
+
+
+def fourcc_text(code):
+    code = int(code)
+    if code <= 0:
+        return ""
+    return "".join(chr((code >> 8 * i) & 0xFF) for i in range(4)).strip("\0")
+
+
+def requested(settings):
+    return {"width": settings["capture_width"], "height": settings["capture_height"],
+            "fps": settings["capture_fps"], "fourcc": settings["capture_fourcc"],
+            "buffer_size": settings["capture_buffer_size"]}
+
+
+def negotiate(cap, want):
+    """Read back what the driver accepted; `mismatches` names every request it did not honour."""
+    try:
+        backend = cap.getBackendName()
+    except (AttributeError, cv2.error):
+        backend = "unknown"
+    got = {"width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+           "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+           "fps": round(float(cap.get(cv2.CAP_PROP_FPS)), 2),
+           "fourcc": fourcc_text(cap.get(cv2.CAP_PROP_FOURCC)),
+           "buffer_size": int(cap.get(cv2.CAP_PROP_BUFFERSIZE))}
+    mismatches = [key for key, value in want.items()
+                  if value and got[key] and (abs(got[key] - value) > 0.5 if key == "fps" else got[key] != value)]
+    return {"backend": backend, "requested": want, "actual": got, "mismatches": mismatches}
+
+
+class SyntheticCapture:
+    """VideoCapture stand-in producing frames on a fixed clock, for tests without a camera.
+
+    Frame k is "exposed" at start + k / fps. Like a driver queue, up to
+    buffer_size frames wait for read(); a slow reader gets the oldest one still
+    queued, so the buffer's added lag shows up in last_timestamp. An optional
+    BGR image (e.g. a face photo) drifts across a moving gradient background.
+    """
+
+    def __init__(self, width=640, height=480, fps=30.0, buffer_size=1, image=None):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.buffer_size = buffer_size
+        self.image = image
+        self.last_timestamp = None
+        self._opened = True
+        self._start = time.perf_counter()
+        self._next = 0
+        ramp = np.linspace(0, 160, width, dtype=np.float32)
+        self._background = np.repeat(ramp[None, :, None], height, axis=0).repeat(3, axis=2)
+
+    def isOpened(self):
+        return self._opened
+
+    def release(self):
+        self._opened = False
+
+    def getBackendName(self):
+        return "SYNTHETIC"
+
+    def get(self, prop):
+        return {cv2.CAP_PROP_FRAME_WIDTH: self.width, cv2.CAP_PROP_FRAME_HEIGHT: self.height,
+                cv2.CAP_PROP_FPS: self.fps, cv2.CAP_PROP_BUFFERSIZE: self.buffer_size,
+                cv2.CAP_PROP_FOURCC: fourcc_code("BGR3")}.get(prop, 0.0)
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_BUFFERSIZE:
+            self.buffer_size = max(1, int(value))
+        elif prop == cv2.CAP_PROP_FPS and value > 0:
+            self.fps = float(value)
+        else:
+            # Like a camera without mode switching: resolution and codec stay as they are
+            return False
+        return True
+
+    def read(self):
+        if not self._opened:
+            return False, None
+        produced = int((time.perf_counter() - self._start) * self.fps)
+        # Frames older than the queue depth were dropped by the "driver"
+        k = max(self._next, produced - self.buffer_size + 1)
+        exposed = self._start + k / self.fps
+        wait = exposed - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        self._next = k + 1
+        self.last_timestamp = exposed
+        return True, self._render(k)
+
+    def _render(self, k):
+        frame = np.roll(self._background, (k * 4) % self.width, axis=1).astype(np.uint8)
+        if self.image is not None:
+            h, w = self.image.shape[:2]
+            span_x, span_y = max(1, self.width - w), max(1, self.height - h)
+            x = (k * 3) % (2 * span_x)
+            x = min(x, 2 * span_x - x)
+            y = span_y // 2
+            frame[y:y + h, x:x + w] = self.image[:self.height - y, :self.width - x]
+        return frame
+
+
+class CaptureSource:
+    """Callable for CameraPipeline: opens and configures the source, keeping the negotiation report.
+
+    Device indices get every requested property, with FOURCC set before the size
+    because V4L2 picks the mode from the codec. Files and URLs are opened as they
+    are and only reported. "synthetic[:WxH][@FPS]" opens a SyntheticCapture.
+    """
+
+    def __init__(self, source, settings, image=None):
+        self.source = source
+        self.settings = settings
+        self.image = image
+        self.report = None
+
+    def __call__(self):
+        want = requested(self.settings)
+        match = SYNTHETIC.match(self.source) if isinstance(self.source, str) else None
+        if match:
+            width, height, fps = match.groups()
+            cap = SyntheticCapture(int(width or want["width"] or 640), int(height or want["height"] or 480),
+                                   float(fps or want["fps"] or 30), image=self.image)
+        else:
+            backend = getattr(cv2, BACKENDS.get(self.settings["capture_backend"], "CAP_ANY"), cv2.CAP_ANY)
+            cap = cv2.VideoCapture(self.source, backend)
+        if not cap.isOpened():
+            return cap
+        if isinstance(self.source, int) or match:
+            if want["fourcc"]:
+                cap.set(cv2.CAP_PROP_FOURCC, fourcc_code(want["fourcc"]))
+            if want["width"] and want["height"]:
+                cap.set(cv2.CAP_PROP_FRAME_WIDTH, want["width"])
+                cap.set(cv2.CAP_PROP_FRAME_HEIGHT, want["height"])
+            if want["fps"]:
+                cap.set(cv2.CAP_PROP_FPS, want["fps"])
+            if want["buffer_size"]:
+                cap.set(cv2.CAP_PROP_BUFFERSIZE, want["buffer_size"])
+        else:
+            want = {key: 0 for key in want}
+        self.report = negotiate(cap, want)
+        return cap
+
+    def describe(self):
+        if self.report is None:
+            return f"capture {self.source!r}: not opened"
+        a = self.report["actual"]
+        text = (f"capture {self.source!r} via {self.report['backend']}: {a['width']}x{a['height']} "
+                f"@ {a['fps']:g} fps {a['fourcc'] or '?'} buffer {a['buffer_size']}")
+        if self.report["mismatches"]:
+            text += f" (not honoured: {', '.join(self.report['mismatches'])})"
+        return text
+
+
+def probe(source, settings, seconds=3.0, detect=False, image=None):
+    """Open source with settings, read for `seconds` and measure what it delivers."""
+    capture = CaptureSource(source, settings, image)
+    cap = capture()
+    if not cap.isOpened():
+        return None
+    detector = None
+    if detect:
+        from detector import FaceDetector
+        detector = FaceDetector.from_settings(settings)
+    reads, ages, frames, with_faces = [], [], 0, 0
+    start = time.perf_counter()
+    try:
+        while time.perf_counter() - start < seconds:
+            t = time.perf_counter()
+            ok, frame = cap.read()
+            if not ok:
+                break
+            reads.append((time.perf_counter() - t) * 1000.0)
+            stamp = getattr(cap, "last_timestamp", None)
+            if stamp is not None:
+                ages.append((time.perf_counter() - stamp) * 1000.0)
+            frames += 1
+            if detector is not None and detector.detect(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)):
+                with_faces += 1
+    finally:
+        cap.release()
+    elapsed = time.perf_counter() - start
+    result = dict(capture.report, fps_measured=frames / max(elapsed, 1e-9),
+                  read_ms_p50=float(np.median(reads)) if reads else 0.0)
+    if ages:
+        result["frame_age_ms_p50"] = float(np.median(ages))
+    if detector is not None:
+        result["face_rate"] = with_faces / max(1, frames)
+    return result
+
+
+def main(argv=None):
+    from multicam import parse_source
+    from settings import load_settings
+
+    parser = argparse.ArgumentParser(description="Negotiate a capture mode and measure what it delivers")
+    parser.add_argument("source", nargs="?", default="0", help="device index, file, URL or synthetic[:WxH][@FPS]")
+    parser.add_argument("--data-dir", default="face_data", help="where settings.json lives")
+    parser.add_argument("--width", type=int)
+    parser.add_argument("--height", type=int)
+    parser.add_argument("--fps", type=float)
+    parser.add_argument("--fourcc")
+    parser.add_argument("--buffer", type=int, dest="buffer_size")
+    parser.add_argument("--backend", choices=sorted(b for b in BACKENDS if b))
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--detect", action="store_true", help="also report the share of frames with a face")
+    parser.add_argument("--face", help="image drawn into synthetic frames")
+    args = parser.parse_args(argv)
+
+    settings = load_settings(args.data_dir)
+    for key in ("width", "height", "fps", "fourcc", "buffer_size", "backend"):
+        value = getattr(args, key)
+        if value is not None:
+            settings[f"capture_{key}"] = value
+    image = cv2.imread(args.face) if args.face else None
+    result = probe(parse_source(args.source), settings, args.seconds, args.detect, image)
+    if result is None:
+        raise SystemExit(f"could not open {args.source!r}")
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
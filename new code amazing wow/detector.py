@@ -0,0 +1,98 @@
+import time
+import cv2
+import numpy as np
+
+from tracker import iou_matrix
+from metrics import METRICS
+
+
+class FaceDetector:
+    """face_locations with downscaling, optional ROI search and per-frame cost reporting.
+
+    Boxes are always returned in full-resolution (top, right, bottom, left) so they
+    can go straight to face_encodings on the original frame.
+    """
+
+    def __init__(self, scale=0.5, model="hog", upsample=1, roi=False, roi_margin=0.5,
+                 full_sweep_interval=10):
+        self.scale = scale
+        self.model = model
+        self.upsample = upsample
+        self.roi = roi
+        self.roi_margin = roi_margin
+        self.full_sweep_interval = full_sweep_interval
+        self.frame = 0
+        self.last_ms = 0.0
+        self.avg_ms = 0.0
+        self.total_ms = 0.0
+        self.last_mode = None
+        self.full_sweeps = 0
+        self.roi_sweeps = 0
+        self._previous = []
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(scale=settings["detect_scale"], model=settings["detect_model"],
+                   upsample=settings["detect_upsample"], roi=settings["detect_roi"],
+                   roi_margin=settings["detect_roi_margin"],
+                   full_sweep_interval=settings["detect_full_sweep_frames"])
+
+    def _locate(self, rgb, top=0, left=0):
+        h, w = rgb.shape[:2]
+        small = rgb
+        if self.scale != 1.0:
+            small = cv2.resize(rgb, (max(1, int(w * self.scale)), max(1, int(h * self.scale))),
+                               interpolation=cv2.INTER_AREA)
+        boxes = self._find(np.ascontiguousarray(small))
+        inv = 1.0 / self.scale
+        return [(top + max(0, int(t * inv)), left + min(w, int(r * inv)),
+                 top + min(h, int(b * inv)), left + max(0, int(l * inv)))
+                for t, r, b, l in boxes]
+
+    def _find(self, small):
+        import face_recognition  # first import loads the dlib models; warmup.py does it early
+        return face_recognition.face_locations(small, number_of_times_to_upsample=self.upsample,
+                                               model=self.model)
+
+    def _rois(self, shape):
+        h, w = shape[:2]
+        for t, r, b, l in self._previous:
+            pad = int(self.roi_margin * max(r - l, b - t))
+            yield max(0, t - pad), min(w, r + pad), min(h, b + pad), max(0, l - pad)
+
+    def detect(self, rgb):
+        start = time.perf_counter()
+        self.frame += 1
+        full = (not self.roi or not self._previous
+                or self.frame % self.full_sweep_interval == 0)
+        boxes = []
+        if not full:
+            for t, r, b, l in self._rois(rgb.shape):
+                boxes.extend(self._locate(rgb[t:b, l:r], t, l))
+            if len(boxes) > 1:
+                # Neighbouring ROIs overlap; keep one box per face
+                ious = iou_matrix(boxes, boxes)
+                keep = [i for i in range(len(boxes)) if not (ious[i, :i] > 0.5).any()]
+                boxes = [boxes[i] for i in keep]
+            if not boxes:
+                # Everyone left their ROI; look at the whole frame straight away
+                full = True
+        if full:
+            boxes = self._locate(rgb)
+            self.full_sweeps += 1
+        else:
+            self.roi_sweeps += 1
+        self._previous = boxes
+        self.last_mode = "full" if full else "roi"
+        self.last_ms = METRICS.since("detect", start)
+        self.avg_ms = self.last_ms if self.frame == 1 else 0.9 * self.avg_ms + 0.1 * self.last_ms
+        self.total_ms += self.last_ms
+        return boxes
+
+    def reset(self):
+        self.frame = 0
+        self._previous = []
+
+    def report(self):
+        return {"last_ms": self.last_ms, "avg_ms": self.avg_ms, "mode": self.last_mode,
+                "full_sweeps": self.full_sweeps, "roi_sweeps": self.roi_sweeps}
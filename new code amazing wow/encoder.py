@@ -0,0 +1,29 @@
+import numpy as np
+
+
+def encode_frames(frames, boxes_per_frame):
+    """128-d encodings for every box of every frame, in order.
+
+    Same landmarks and network as face_recognition.face_encodings (5-point model,
+    no jitter), but all faces go through the dlib ResNet as one batch instead of
+    one compute_face_descriptor call per face.
+    """
+    import dlib
+    from face_recognition import api
+    images, shapes = [], []
+    for rgb, boxes in zip(frames, boxes_per_frame):
+        if not len(boxes):
+            continue
+        dets = dlib.full_object_detections()
+        for top, right, bottom, left in boxes:
+            dets.append(api.pose_predictor_5_point(rgb, dlib.rectangle(left, top, right, bottom)))
+        images.append(rgb)
+        shapes.append(dets)
+    if not images:
+        return []
+    try:
+        batches = api.face_encoder.compute_face_descriptor(images, shapes)
+    except TypeError:
+        # dlib builds without the multi-image overload still batch within a frame
+        batches = [api.face_encoder.compute_face_descriptor(rgb, dets) for rgb, dets in zip(images, shapes)]
+    return [np.array(d) for batch in batches for d in batch]
@@ -0,0 +1,409 @@
+import json
+import os
+import pickle
+import sys
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+from gallery import FaceGallery
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _lock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            pass  # LK_LOCK gives up after ~10 s; keep waiting
+
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class EncodingStore:
+    """Append-only, memory-mapped store for face encodings.
+
+    A store is a directory holding one generation of files at a time:
+
+        CURRENT                 "<gen> <dim> <dtype>", swapped atomically
+        vectors.<gen>.bin       fixed-width rows, memory-mapped on load
+        names.<gen>.npy         names of the compacted rows (all alive)
+        meta.<gen>.json         metadata of the compacted rows
+        journal.<gen>.log       appends/deletes since the last compaction
+        LOCK                    advisory lock shared by every process writing
+
+    Registering writes one vector row and one journal line. Deleting writes a
+    tombstone line. compact() rewrites the live rows into the next generation.
+
+    Several processes may hold the store open (a kiosk app and enroll.py, say).
+    Loading, every write and a whole compaction run under an exclusive lock on
+    LOCK, and a writer that finds files changed by another process reloads
+    before it appends, so row numbers never collide.
+
+    readonly=True opens an existing store for matching only: no lock, no
+    repair of torn files, and FileNotFoundError if there is no store at path.
+    """
+
+    def __init__(self, path, dim=128, dtype="float32", readonly=False):
+        self.path = path
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.readonly = readonly
+        self._lock = threading.RLock()
+        self._recording = None
+        self._compactor = None
+        if readonly:
+            if not os.path.exists(self._file("CURRENT")):
+                raise FileNotFoundError(f"no encoding store at {path}")
+            self._lock_f = None
+            self._load()
+            return
+        os.makedirs(path, exist_ok=True)
+        self._lock_f = open(self._file("LOCK"), "a+b")
+        self._held = 0
+        self._held_lock = threading.Lock()
+        with self._exclusive():
+            if not os.path.exists(self._file("CURRENT")):
+                self._write_current(0)
+            self._load()
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold the inter-process lock; reentrant across this store's threads."""
+        with self._held_lock:
+            if not self._held:
+                _lock_file(self._lock_f)
+            self._held += 1
+        try:
+            yield
+        finally:
+            with self._held_lock:
+                self._held -= 1
+                if not self._held:
+                    _unlock_file(self._lock_f)
+
+    def _catch_up(self):
+        # Called with the lock held: reload if another process appended or compacted
+        with open(self._file("CURRENT")) as f:
+            gen = int(f.read().split()[0])
+        if gen == self.gen and os.fstat(self._journal_f.fileno()).st_size == self._journal_size:
+            return
+        self._vec_f.close()
+        self._journal_f.close()
+        self._mm = None
+        self._load()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _gen_file(self, kind, gen=None):
+        ext = {"vectors": "bin", "names": "npy", "meta": "json", "journal": "log"}[kind]
+        return self._file(f"{kind}.{self.gen if gen is None else gen}.{ext}")
+
+    def _write_current(self, gen):
+        tmp = self._file("CURRENT.tmp")
+        with open(tmp, "w") as f:
+            f.write(f"{gen} {self.dim} {self.dtype.name}")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._file("CURRENT"))
+
+    def _load(self):
+        with open(self._file("CURRENT")) as f:
+            gen, dim, dtype = f.read().split()
+        self.gen, self.dim, self.dtype = int(gen), int(dim), np.dtype(dtype)
+
+        names_file = self._gen_file("names")
+        self._names = np.load(names_file).tolist() if os.path.exists(names_file) else []
+        meta_file = self._gen_file("meta")
+        self._meta = []
+        if os.path.exists(meta_file):
+            with open(meta_file) as f:
+                self._meta = json.load(f)
+        self._alive = [True] * len(self._names)
+        self._rows = {name: row for row, name in enumerate(self._names)}
+
+        row_bytes = self.dim * self.dtype.itemsize
+        vectors = self._gen_file("vectors")
+        on_disk = os.path.getsize(vectors) // row_bytes if os.path.exists(vectors) else 0
+        journal = self._gen_file("journal")
+        good = 0
+        if os.path.exists(journal):
+            with open(journal, "rb") as f:
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        break  # torn last line from a crash
+                    op, row, name, meta = (raw.decode("utf-8").rstrip("\n").split("\t") + [""])[:4]
+                    if op == "+":
+                        if int(row) != len(self._names) or int(row) >= on_disk:
+                            break  # its vector never reached the disk
+                        self._set_row(name, json.loads(meta) if meta else {})
+                    elif op == "-" and self._rows.get(name) == int(row):
+                        self._alive[int(row)] = False
+                        del self._rows[name]
+                    good += len(raw)
+            # Appends must start on a fresh line, or the next record is glued to the torn one
+            if not self.readonly and os.path.getsize(journal) > good:
+                with open(journal, "r+b") as f:
+                    f.truncate(good)
+
+        self._mm = None
+        if self.readonly:
+            self._vec_f = self._journal_f = None
+            return
+        # Drop vector bytes that never got a journal line
+        if on_disk > len(self._names) or (os.path.exists(vectors)
+                                          and os.path.getsize(vectors) % row_bytes):
+            with open(vectors, "r+b") as f:
+                f.truncate(len(self._names) * row_bytes)
+        self._vec_f = open(vectors, "ab")
+        self._journal_f = open(journal, "a", encoding="utf-8")
+        self._journal_size = os.fstat(self._journal_f.fileno()).st_size
+
+    def _set_row(self, name, meta):
+        old = self._rows.get(name)
+        if old is not None:
+            self._alive[old] = False
+        self._rows[name] = len(self._names)
+        self._names.append(name)
+        self._meta.append(meta)
+        self._alive.append(True)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, name):
+        return name in self._rows
+
+    @property
+    def dead_rows(self):
+        return len(self._names) - len(self._rows)
+
+    def vectors(self):
+        """Memory-mapped view of every row written so far, dead rows included."""
+        with self._lock:
+            if self._mm is None or len(self._mm) != len(self._names):
+                if not self._names:
+                    return np.empty((0, self.dim), dtype=self.dtype)
+                if self._vec_f is not None:
+                    self._vec_f.flush()
+                self._mm = np.memmap(self._gen_file("vectors"), dtype=self.dtype, mode="c",
+                                     shape=(len(self._names), self.dim))
+            return self._mm
+
+    def live(self):
+        """Return (names, matrix) for live rows; zero-copy when there are no tombstones."""
+        with self._lock:
+            mm = self.vectors()
+            if not self.dead_rows:
+                return list(self._names), mm
+            rows = sorted(self._rows.values())
+            return [self._names[r] for r in rows], mm[rows]
+
+    def get(self, name):
+        row = self._rows.get(name)
+        return None if row is None else np.array(self.vectors()[row])
+
+    def meta(self, name):
+        row = self._rows.get(name)
+        return {} if row is None else self._meta[row]
+
+    def names(self):
+        return list(self._rows)
+
+    def append(self, name, encoding, meta=None, sync=False):
+        encoding = np.asarray(encoding, dtype=self.dtype).reshape(self.dim)
+        meta = meta or {}
+        self._check_writable()
+        with self._lock, self._exclusive():
+            self._catch_up()
+            row = len(self._names)
+            self._vec_f.write(encoding.tobytes())
+            self._vec_f.flush()
+            self._journal_f.write(f"+\t{row}\t{name}\t{json.dumps(meta)}\n")
+            self._journal_f.flush()
+            self._journal_size = os.fstat(self._journal_f.fileno()).st_size
+            if sync:
+                os.fsync(self._vec_f.fileno())
+                os.fsync(self._journal_f.fileno())
+            self._set_row(name, meta)
+            if self._recording is not None:
+                self._recording.append(("+", name, encoding, meta))
+            return row
+
+    def delete(self, name, sync=False):
+        self._check_writable()
+        with self._lock, self._exclusive():
+            self._catch_up()
+            row = self._rows.pop(name, None)
+            if row is None:
+                return False
+            self._alive[row] = False
+            self._journal_f.write(f"-\t{row}\t{name}\n")
+            self._journal_f.flush()
+            self._journal_size = os.fstat(self._journal_f.fileno()).st_size
+            if sync:
+                os.fsync(self._journal_f.fileno())
+            if self._recording is not None:
+                self._recording.append(("-", name, None, None))
+            return True
+
+    def _check_writable(self):
+        if self.readonly:
+            raise PermissionError(f"encoding store {self.path} is open read-only")
+
+    def sync(self):
+        if self.readonly:
+            return
+        with self._lock:
+            self._vec_f.flush()
+            os.fsync(self._vec_f.fileno())
+            self._journal_f.flush()
+            os.fsync(self._journal_f.fileno())
+
+    def compact(self, chunk=65536):
+        """Rewrite the live rows into a new generation; this process's appends may continue meanwhile."""
+        self._check_writable()
+        with self._exclusive():
+            self._compact(chunk)
+
+    def _compact(self, chunk):
+        with self._lock:
+            self._catch_up()
+            rows = sorted(self._rows.values())
+            names = [self._names[r] for r in rows]
+            metas = [self._meta[r] for r in rows]
+            source = self.vectors()
+            self._recording = []
+            new_gen = self.gen + 1
+
+        with open(self._gen_file("vectors", new_gen), "wb") as f:
+            for start in range(0, len(rows), chunk):
+                f.write(np.ascontiguousarray(source[rows[start:start + chunk]]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        np.save(self._gen_file("names", new_gen), np.array(names, dtype=str))
+        with open(self._gen_file("meta", new_gen), "w") as f:
+            json.dump(metas, f)
+
+        with self._lock:
+            # Replay whatever was registered or deleted while the copy ran
+            recorded, self._recording = self._recording, None
+            with open(self._gen_file("vectors", new_gen), "ab") as vf, \
+                 open(self._gen_file("journal", new_gen), "w", encoding="utf-8") as jf:
+                live = {name: row for row, name in enumerate(names)}
+                row = len(names)
+                for op, name, encoding, meta in recorded:
+                    if op == "+":
+                        vf.write(encoding.tobytes())
+                        jf.write(f"+\t{row}\t{name}\t{json.dumps(meta)}\n")
+                        live[name] = row
+                        row += 1
+                    elif name in live:
+                        jf.write(f"-\t{live.pop(name)}\t{name}\n")
+                vf.flush()
+                os.fsync(vf.fileno())
+                jf.flush()
+                os.fsync(jf.fileno())
+            old_gen = self.gen
+            self._vec_f.close()
+            self._journal_f.close()
+            self._mm = None
+            self._write_current(new_gen)
+            self._load()
+            for kind in ("vectors", "names", "meta", "journal"):
+                old = self._gen_file(kind, old_gen)
+                if os.path.exists(old):
+                    os.remove(old)
+
+    def compact_async(self, min_dead_ratio=0.2):
+        """Compact on a background thread once enough rows are tombstones."""
+        if not self._names or self.dead_rows / len(self._names) < min_dead_ratio:
+            return None
+        if self._compactor is not None and self._compactor.is_alive():
+            return self._compactor
+        self._compactor = threading.Thread(target=self.compact, name="facevault-compact", daemon=True)
+        self._compactor.start()
+        return self._compactor
+
+    def to_gallery(self):
+        names, matrix = self.live()
+        return FaceGallery.from_arrays(names, matrix)
+
+    def migrate_pickle(self, encodings_pkl, students_pkl=None, skip_existing=False):
+        """Import a legacy {name: encoding} pickle (plus optional students.pkl metadata)."""
+        with open(encodings_pkl, "rb") as f:
+            known_faces = pickle.load(f)
+        students = {}
+        if students_pkl and os.path.exists(students_pkl):
+            with open(students_pkl, "rb") as f:
+                students = pickle.load(f)
+        migrated = 0
+        for name, encoding in known_faces.items():
+            if skip_existing and name in self:
+                continue
+            self.append(name, encoding, students.get(name, {}))
+            migrated += 1
+        self.sync()
+        return migrated
+
+    def close(self):
+        with self._lock:
+            for f in (self._vec_f, self._journal_f, self._lock_f):
+                if f is not None:
+                    f.close()
+            self._mm = None
+
+
+def store_path_for(encodings_file):
+    return encodings_file + ".store"
+
+
+def open_encoding_store(encodings_file, students_file=None):
+    """Open the store that replaces encodings_file, migrating the pickle on first use.
+
+    A MIGRATING marker is written before the store exists and removed once every
+    identity is in, so a run that dies midway is finished by the next one.
+    """
+    path = store_path_for(encodings_file)
+    marker = os.path.join(path, "MIGRATING")
+    if os.path.exists(encodings_file) and not os.path.exists(os.path.join(path, "CURRENT")):
+        os.makedirs(path, exist_ok=True)
+        open(marker, "w").close()
+    store = EncodingStore(path)
+    if os.path.exists(marker):
+        store.migrate_pickle(encodings_file, students_file, skip_existing=True)
+        os.remove(marker)
+    return store
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4 or sys.argv[1] != "migrate":
+        print("usage: python encoding_store.py migrate <store_dir> <encodings.pkl|.dat>... [--students students.pkl]")
+        sys.exit(1)
+    args = sys.argv[3:]
+    students = None
+    if "--students" in args:
+        i = args.index("--students")
+        students = args[i + 1]
+        args = args[:i] + args[i + 2:]
+    store = EncodingStore(sys.argv[2])
+    for source in args:
+        print(f"{source}: {store.migrate_pickle(source, students)} encodings")
+    print(f"{len(store)} identities in {sys.argv[2]}")
@@ -0,0 +1,181 @@
+"""Headless bulk enrollment from folders of ID photos.
+
+    python enroll.py photos/ --store face_data/encodings.pkl.store --workers 8
+
+A photo at photos/<name>.jpg enrolls <name>; with --name-from folder, the
+photos under photos/<name>/ do. The store keeps one encoding per name, so only
+the first photo of a name (in path order) is used in a run and the rest are
+reported and skipped. Finished files go into a manifest next to the store, so
+an interrupted run resumes where it stopped and enrolled files are skipped on
+the next run unless they changed; failed ones are tried again. The store is locked per write, so this can run while
+a kiosk app has the same store open; the app sees the new people on restart.
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+
+from encoding_store import EncodingStore
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def find_images(root, name_from="stem"):
+    for dirpath, _, files in os.walk(root):
+        for fname in sorted(files):
+            stem, ext = os.path.splitext(fname)
+            if ext.lower() not in IMAGE_EXTS:
+                continue
+            path = os.path.join(dirpath, fname)
+            if name_from == "folder" and os.path.abspath(dirpath) != os.path.abspath(root):
+                name = os.path.basename(dirpath)
+            else:
+                name = stem
+            yield path, name
+
+
+def encode_photo(job):
+    # Runs in a pool worker: heavy imports stay out of the parent
+    path, name, model = job
+    import face_recognition
+    try:
+        image = face_recognition.load_image_file(path)
+        boxes = face_recognition.face_locations(image, model=model)
+        if not boxes:
+            return path, name, None, "no face found"
+        # ID photos: take the largest face
+        box = max(boxes, key=lambda b: (b[1] - b[3]) * (b[2] - b[0]))
+        encodings = face_recognition.face_encodings(image, [box])
+        if not encodings:
+            return path, name, None, "could not encode face"
+        return path, name, encodings[0], None
+    except Exception as e:
+        return path, name, None, repr(e)
+
+
+class Manifest:
+    """Append-only record of processed files: path -> size, mtime, sha1."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn line from an interrupted run
+                    self.entries[entry["path"]] = entry
+        self._f = open(path, "a", encoding="utf-8")
+
+    def unchanged(self, path):
+        """(already enrolled from this exact file, sha1 if it had to be computed)."""
+        entry = self.entries.get(path)
+        if entry is None or entry.get("status") != "enrolled":
+            return False, None
+        st = os.stat(path)
+        if entry["size"] == st.st_size and entry["mtime"] == st.st_mtime:
+            return True, entry["sha1"]
+        sha1 = file_sha1(path)
+        return sha1 == entry["sha1"], sha1
+
+    def record(self, path, sha1, status):
+        st = os.stat(path)
+        entry = {"path": path, "size": st.st_size, "mtime": st.st_mtime, "sha1": sha1, "status": status}
+        self.entries[path] = entry
+        self._f.write(json.dumps(entry) + "\n")
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+def enroll(root, store_path, workers=None, model="hog", name_from="stem", photo_dir=None,
+           chunksize=4, report_every=1.0, out=sys.stdout):
+    store = EncodingStore(store_path)
+    manifest = Manifest(os.path.join(store_path, "enroll_manifest.jsonl"))
+    jobs, hashes, skipped, taken = [], {}, 0, {}
+    for path, name in sorted(find_images(root, name_from)):
+        path = os.path.abspath(path)
+        if name in taken:
+            print(f"  skip {path}: {name} already comes from {taken[name]}", file=out)
+            skipped += 1
+            continue
+        taken[name] = path
+        same, sha1 = manifest.unchanged(path)
+        if same:
+            skipped += 1
+            continue
+        hashes[path] = sha1
+        jobs.append((path, name, model))
+    if photo_dir:
+        os.makedirs(photo_dir, exist_ok=True)
+
+    total = len(jobs)
+    print(f"{total} photos to process, {skipped} unchanged and skipped", file=out)
+    done = enrolled = failed = 0
+    start = last_report = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    ctx = multiprocessing.get_context("spawn")
+    try:
+        with ctx.Pool(workers) as pool:
+            for path, name, encoding, error in pool.imap_unordered(encode_photo, jobs, chunksize):
+                done += 1
+                sha1 = hashes[path] or file_sha1(path)
+                if encoding is None:
+                    failed += 1
+                    print(f"  skip {path}: {error}", file=out)
+                    manifest.record(path, sha1, "failed")
+                else:
+                    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+                    store.append(name, encoding, {"timestamp": timestamp, "source": path})
+                    if photo_dir:
+                        shutil.copyfile(path, os.path.join(photo_dir, f"{name}.jpg"))
+                    manifest.record(path, sha1, "enrolled")
+                    enrolled += 1
+                now = time.perf_counter()
+                if now - last_report >= report_every or done == total:
+                    rate = done / max(now - start, 1e-9)
+                    eta = (total - done) / rate if rate else 0
+                    print(f"  {done}/{total}  {rate:.1f} photos/s  eta {eta:.0f}s", file=out)
+                    last_report = now
+    finally:
+        store.sync()
+        manifest.close()
+        store.close()
+    elapsed = time.perf_counter() - start
+    print(f"Enrolled {enrolled}, failed {failed}, skipped {skipped} in {elapsed:.1f}s "
+          f"({done / max(elapsed, 1e-9):.1f} photos/s)", file=out)
+    return enrolled, failed, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enroll faces from a directory of photos")
+    parser.add_argument("root", help="directory tree of photos")
+    parser.add_argument("--store", default=os.path.join("face_data", "encodings.pkl.store"),
+                        help="encoding store to write into (default: the one Ai.py loads)")
+    parser.add_argument("--workers", type=int, default=None, help="pool size (default: all cores)")
+    parser.add_argument("--model", choices=["hog", "cnn"], default="hog")
+    parser.add_argument("--name-from", choices=["stem", "folder"], default="stem")
+    parser.add_argument("--photos", default=None,
+                        help="also copy each photo to <dir>/<name>.jpg for the summary views")
+    args = parser.parse_args(argv)
+    enroll(args.root, args.store, args.workers, args.model, args.name_from, args.photos)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,32 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-import matplotlib.pyplot as plt
-from PIL import Image, ImageTk, ImageFilter
-import datetime
-import csv
+from tkinter import ttk, messagebox
 import os
+import logging
 import cv2
-import face_recognition
-import threading
-import pickle
-import random
+import time
+from gallery import FaceGallery
+from settings import load_settings, build_gallery
+from recognizer import make_recognizer
+from pipeline import CameraPipeline
+from capture import CaptureSource
+from multicam import MultiCameraPipeline, TileScheduler, parse_source, tile_layout
+from attendance import AttendanceWriter
+from attendance_store import open_store
+from log_viewer import LogViewer
+from analytics import AttendanceStats
+from analytics_view import AnalyticsView
+from encoding_store import open_encoding_store
+from metrics import METRICS, draw_overlay, start_exporter
+from render import TkFrameRenderer
+from animation import TkParticleAnimator
+from warmup import Startup, startup_steps
+from tuner import runtime_tuner
+
+log = logging.getLogger("facevault")
 
 class FaceVaultUltra:
     def __init__(self, root):
+        self.startup = Startup()
         self.root = root
         self.root.title("FaceVault Ultra")
         self.root.geometry("1180x760")
@@ -23,19 +37,42 @@ class FaceVaultUltra:
         self.encodings_file = os.path.join(self.data_dir, "encodings.dat")
 
         os.makedirs(self.data_dir, exist_ok=True)
-        self.known_faces = {}
+        self.settings = load_settings(self.data_dir)
+        self.metrics_exporter = start_exporter(self.settings)
+        self.store = open_store(self.data_dir, self.log_file)
+        self.attendance = AttendanceWriter.from_settings(self.log_file, self.settings, self.store)
+        # Folded incrementally from the store each time a report opens
+        self.analytics = AttendanceStats()
+        self.encoding_store = None
+        self.gallery = FaceGallery()
         self.admin_face_encoding = None
         self.current_user = None
 
         self.theme = "dark"
-        self.particles = []
-        self.setup_styles()
-        self.load_encodings()
-        self.setup_main_ui()
-
-        self.cap = None
+        self.pipeline = None
+        self.tuner = None
         self.camera_active = False
+        self.faces = []
+        self.tile_labels = []
         self.scan_line_y = 0
+        # The preview owns the GUI thread while the camera runs
+        self.animator = TkParticleAnimator(self.root, busy=lambda: self.camera_active)
+        self.setup_styles()
+        self.setup_main_ui()
+        # Encodings and the dlib models load behind the already-visible window
+        self.root.after_idle(lambda: self.startup.mark("ui"))
+        self.startup.run(startup_steps(self.settings, self.load_encodings, self.data_dir))
+        self.check_ready()
+
+    def check_ready(self):
+        if not self.startup.ready.is_set():
+            self.root.after(100, self.check_ready)
+            return
+        if self.startup.error is not None:
+            self.status_var.set(f"⚠️ Startup failed: {self.startup.error}")
+            return
+        self.status_var.set("🔎 Awaiting scan...")
+        log.info("%s", self.startup.report())
 
     def setup_styles(self):
         self.style = ttk.Style()
@@ -54,7 +91,7 @@ class FaceVaultUltra:
 
         self.canvas_bg = tk.Canvas(self.root, width=1180, height=760, bg="#0e0e1f", highlightthickness=0)
         self.canvas_bg.place(x=0, y=0)
-        self.animate_particles()
+        self.animator.attach(self.canvas_bg)
 
         sidebar = tk.Frame(self.root, width=220, bg="#1f1f2e")
         sidebar.place(x=0, y=0, height=760)
@@ -80,27 +117,13 @@ class FaceVaultUltra:
         self.name_var = tk.StringVar()
         ttk.Entry(glass_frame, textvariable=self.name_var, width=40).place(x=300, y=490)
 
-        self.status_var = tk.StringVar(value="🔎 Awaiting scan...")
+        self.status_var = tk.StringVar(value="🔎 Awaiting scan..." if self.startup.ready.is_set()
+                                       else "⏳ Warming up face models...")
         tk.Label(glass_frame, textvariable=self.status_var, font=("Segoe UI", 12), fg="#00f0ff", bg="#1a1a2b").place(x=300, y=530)
 
         ttk.Button(glass_frame, text="▶ Start Camera", command=self.start_camera).place(x=300, y=570)
         ttk.Button(glass_frame, text="⏹ Stop Camera", command=self.stop_camera).place(x=440, y=570)
 
-    def animate_particles(self):
-        self.particles = [(random.randint(0, 1180), random.randint(0, 760), random.choice(["#00f0ff", "#0055ff"])) for _ in range(40)]
-        def move():
-            self.canvas_bg.delete("particle")
-            new_particles = []
-            for x, y, color in self.particles:
-                y += 1
-                if y > 760:
-                    y = 0
-                self.canvas_bg.create_oval(x, y, x+2, y+2, fill=color, outline=color, tags="particle")
-                new_particles.append((x, y, color))
-            self.particles = new_particles
-            self.root.after(50, move)
-        move()
-
     def toggle_theme(self):
         self.theme = "light" if self.theme == "dark" else "dark"
         self.setup_styles()
@@ -111,61 +134,149 @@ class FaceVaultUltra:
             widget.destroy()
 
     def load_encodings(self):
-        if os.path.exists(self.encodings_file):
-            with open(self.encodings_file, "rb") as f:
-                self.known_faces = pickle.load(f)
-                if "admin" in self.known_faces:
-                    self.admin_face_encoding = self.known_faces["admin"]
+        self.encoding_store = open_encoding_store(self.encodings_file)
+        self.gallery = build_gallery(self.encoding_store, self.encodings_file, self.settings)
+        self.encoding_store.compact_async()
+        if "admin" in self.gallery:
+            self.admin_face_encoding = self.gallery.get("admin")
+
+    def startup_ok(self):
+        """True once models and encodings are loaded; otherwise says why on the status line."""
+        if not self.startup.ready.is_set():
+            self.status_var.set("⏳ Still warming up, one moment...")
+            return False
+        if self.startup.error is not None:
+            self.status_var.set(f"⚠️ Startup failed: {self.startup.error}")
+            return False
+        return True
 
     def start_camera(self):
-        self.cap = cv2.VideoCapture(0)
+        if self.camera_active:
+            return
+        if not self.startup_ok():
+            return
+        sources = self.settings["camera_sources"]
+        if len(sources) > 1:
+            self.start_tiles(sources)
+            return
+        recognizer = make_recognizer(self.gallery, self.settings)
+        source = CaptureSource(parse_source(sources[0]), self.settings)
+        self.pipeline = CameraPipeline(source, recognizer.analyze, stride=self.settings["analyze_stride"])
+        if not self.pipeline.start():
+            messagebox.showerror("Camera Error", "Could not access camera.")
+            return
+        log.info("%s", source.describe())
+        self.tuner = runtime_tuner(self.settings, self.data_dir, recognizer.detector, self.pipeline)
         self.camera_active = True
+        self.renderer = TkFrameRenderer(self.camera_label, (860, 480))
+        self.faces = []
         self.scan_line_y = 0
         self.update_camera()
 
+    def start_tiles(self, sources):
+        tile, positions = tile_layout(len(sources), (860, 480))
+        self.pipeline = MultiCameraPipeline(sources, self.gallery, self.settings, tile)
+        self.pipeline.start()
+        self.camera_active = True
+        self.tile_scheduler = TileScheduler(len(sources), self.settings["tile_background_fps"])
+        self.tile_faces = [[] for _ in sources]
+        self.tiles = []
+        for i, (x, y) in enumerate(positions):
+            label = tk.Label(self.camera_label.master, bg="black")
+            label.place(x=x, y=y, width=tile[0], height=tile[1])
+            label.bind("<Button-1>", lambda e, i=i: setattr(self.tile_scheduler, "focus", i))
+            self.tile_labels.append(label)
+            self.tiles.append(TkFrameRenderer(label, tile))
+        self.update_tiles()
+
+    def update_tiles(self):
+        if not self.camera_active:
+            return
+        if not self.pipeline.running:
+            self.stop_camera()
+            return
+        frames, results = self.pipeline.poll()
+        for i, faces in results:
+            self.tile_faces[i] = faces
+            for face in faces:
+                if face.name is not None and face.fresh:
+                    # All doors share one writer, whose cooldown also dedupes across cameras
+                    self.status_var.set(f"✅ Recognized: {face.name} (camera {i + 1})")
+                    self.log_entry(face.name)
+                    self.tile_scheduler.focus = i
+        start = time.perf_counter()
+        drawn = 0
+        for i, frame in frames.items():
+            if not self.tile_scheduler.due(i, start):
+                continue
+            renderer = self.tiles[i]
+            self.draw_faces(renderer, renderer.begin(frame), self.tile_faces[i])
+            renderer.show()
+            drawn += 1
+        if drawn:
+            METRICS.since("render", start)
+            METRICS.tick("preview")
+        self.root.after(self.settings["preview_interval_ms"], self.update_tiles)
+
+    def draw_faces(self, renderer, rgb, faces):
+        for face in faces:
+            top, right, bottom, left = renderer.scale_box(face.box)
+            match_found = face.name is not None
+            label = face.name if match_found else "Unknown"
+            color = (0, 255, 0) if match_found else (255, 0, 0)
+            cv2.rectangle(rgb, (left, top), (right, bottom), color, 2)
+            cv2.putText(rgb, label, (left, top - 10), cv2.FONT_HERSHEY_DUPLEX, 0.7, color, 2)
+
     def stop_camera(self):
-        if self.cap:
-            self.cap.release()
+        if self.pipeline:
+            self.pipeline.stop()
         self.camera_active = False
         self.camera_label.config(image='')
+        for label in self.tile_labels:
+            label.destroy()
+        self.tile_labels = []
+        self.attendance.flush(sync=True)
 
     def update_camera(self):
-        ret, frame = self.cap.read()
-        if not ret:
+        # GUI side only: the pipeline threads do capture and recognition
+        if not self.camera_active:
+            return
+        if not self.pipeline.running:
+            self.stop_camera()
             return
 
-        frame = cv2.flip(frame, 1)
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        face_locations = face_recognition.face_locations(rgb)
-
-        for (top, right, bottom, left) in face_locations:
-            match_found = False
-            label = "Unknown"
-            encodings = face_recognition.face_encodings(rgb, [ (top, right, bottom, left) ])
-            if encodings:
-                encoding = encodings[0]
-                for known_name, known_enc in self.known_faces.items():
-                    if face_recognition.compare_faces([known_enc], encoding)[0]:
-                        label = known_name
-                        match_found = True
-                        self.recognize_user(label)
-                        break
-            color = (0, 255, 0) if match_found else (255, 0, 0)
-            cv2.rectangle(rgb, (left, top), (right, bottom), color, 2)
-            cv2.putText(rgb, label, (left, top - 10), cv2.FONT_HERSHEY_DUPLEX, 0.7, color, 2)
+        frame, results = self.pipeline.poll()
+        if results is not None:
+            self.faces = results
+            named = list(dict.fromkeys(face.name for face in results if face.name is not None))
+            if named:
+                # Everyone in the group gets a row; the dashboard opens for the first
+                for name in named[1:]:
+                    self.log_entry(name)
+                self.recognize_user(named[0])
+                return
+        if self.tuner is not None:
+            self.tuner.check()
+        if frame is None:
+            self.root.after(self.settings["preview_interval_ms"], self.update_camera)
+            return
+
+        start = time.perf_counter()
+        rgb = self.renderer.begin(frame)
+        self.draw_faces(self.renderer, rgb, self.faces)
 
         height = rgb.shape[0]
         self.scan_line_y = (self.scan_line_y + 12) % height
         cv2.line(rgb, (0, self.scan_line_y), (rgb.shape[1], self.scan_line_y), (0, 255, 0), 2)
+        if self.settings["metrics_overlay"]:
+            draw_overlay(rgb)
 
-        img = Image.fromarray(rgb)
-        img = img.resize((860, 480))
-        img_tk = ImageTk.PhotoImage(img)
-        self.camera_label.config(image=img_tk)
-        self.camera_label.image = img_tk
+        self.renderer.show()
+        METRICS.since("render", start)
+        METRICS.since("latency", self.pipeline.frame_stamp)
+        METRICS.tick("preview")
 
-        if self.camera_active:
-            self.root.after(30, self.update_camera)
+        self.root.after(self.settings["preview_interval_ms"], self.update_camera)
 
     def recognize_user(self, name):
         self.current_user = name
@@ -175,10 +286,7 @@ class FaceVaultUltra:
         self.stop_camera()
 
     def log_entry(self, name):
-        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open(self.log_file, "a", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow([name, now])
+        return self.attendance.log(name)
 
     def show_dashboard(self):
         self.clear_window()
@@ -186,39 +294,31 @@ class FaceVaultUltra:
 
         ttk.Button(self.root, text="📋 Show Logs", command=self.show_logs).pack(pady=10)
         ttk.Button(self.root, text="📈 Attendance Graph", command=self.show_graph).pack(pady=10)
+        ttk.Button(self.root, text="📊 Attendance Report", command=self.show_report).pack(pady=10)
         ttk.Button(self.root, text="⬅ Back", command=self.setup_main_ui).pack(pady=20)
 
     def show_logs(self):
-        if not os.path.exists(self.log_file):
+        self.attendance.flush()
+        if not self.store.total():
             messagebox.showinfo("Logs", "No logs available yet.")
             return
 
-        top = tk.Toplevel(self.root)
-        top.title("Attendance Logs")
-        top.geometry("500x400")
-
-        with open(self.log_file, "r") as f:
-            lines = f.readlines()
+        LogViewer(self.root, self.store)
 
-        text = tk.Text(top, wrap="none", font=("Consolas", 10))
-        text.pack(expand=True, fill="both")
-        for line in lines:
-            text.insert("end", line)
+    def show_report(self):
+        self.attendance.flush()
+        AnalyticsView(self.root, self.analytics, self.store)
 
     def show_graph(self):
-        if not os.path.exists(self.log_file):
+        self.attendance.flush()
+        dates = self.store.daily_counts()
+        if not dates:
             messagebox.showinfo("No data", "No log data to plot.")
             return
 
-        dates = {}
-        with open(self.log_file, "r") as f:
-            reader = csv.reader(f)
-            for row in reader:
-                date = row[1].split(" ")[0]
-                dates[date] = dates.get(date, 0) + 1
-
-        x = list(dates.keys())
-        y = list(dates.values())
+        import matplotlib.pyplot as plt
+        x = [date for date, _ in dates]
+        y = [count for _, count in dates]
 
         plt.figure(figsize=(6, 4))
         plt.bar(x, y, color="#00f0ff")
@@ -236,6 +336,8 @@ class FaceVaultUltra:
             messagebox.showinfo("Admin", "Access denied. Only admin user can access this.")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(name)s: %(message)s")
     root = tk.Tk()
     app = FaceVaultUltra(root)
     root.mainloop()
+    app.attendance.close()
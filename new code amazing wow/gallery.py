@@ -0,0 +1,179 @@
+import threading
+import numpy as np
+from collections import namedtuple
+
+# Same cut-off face_recognition.compare_faces uses by default
+DEFAULT_TOLERANCE = 0.6
+
+Match = namedtuple("Match", ["name", "distance"])
+
+
+class FaceGallery:
+    """All enrolled encodings in one contiguous (N, dim) matrix plus a names array."""
+
+    def __init__(self, dim=128, capacity=64, dtype=np.float64):
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self._matrix = np.zeros((capacity, dim), dtype=self.dtype)
+        self._sq_norms = np.zeros(capacity, dtype=self.dtype)
+        self._names = np.empty(capacity, dtype=object)
+        self._rows = {}
+        self.size = 0
+        self.index = None
+        # add/remove may come from the GUI thread while a worker is matching
+        self.lock = threading.RLock()
+
+    @classmethod
+    def from_dict(cls, known_faces, dim=128):
+        gallery = cls(dim=dim, capacity=max(64, len(known_faces)))
+        for name, encoding in known_faces.items():
+            gallery.add(name, encoding)
+        return gallery
+
+    @classmethod
+    def from_arrays(cls, names, matrix):
+        """Adopt an existing (N, dim) matrix, e.g. a copy-on-write memmap, without copying it."""
+        matrix = np.asarray(matrix) if not isinstance(matrix, np.ndarray) else matrix
+        gallery = cls(dim=matrix.shape[1], capacity=1, dtype=matrix.dtype)
+        if len(names):
+            gallery._matrix = matrix
+            gallery._sq_norms = np.einsum("ij,ij->i", matrix, matrix)
+            gallery._names = np.empty(len(names), dtype=object)
+            gallery._names[:] = names
+            gallery._rows = {name: row for row, name in enumerate(names)}
+            gallery.size = len(names)
+        return gallery
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, name):
+        return name in self._rows
+
+    @property
+    def encodings(self):
+        return self._matrix[:self.size]
+
+    @property
+    def names(self):
+        return self._names[:self.size]
+
+    def get(self, name):
+        row = self._rows.get(name)
+        return None if row is None else self._matrix[row]
+
+    def attach_index(self, index):
+        # Any object with add/update/remove/nearest (see ann_index.IVFIndex)
+        self.index = index
+
+    def _grow(self, needed):
+        capacity = len(self._matrix)
+        while capacity < needed:
+            capacity *= 2
+        matrix = np.zeros((capacity, self.dim), dtype=self.dtype)
+        matrix[:self.size] = self._matrix[:self.size]
+        sq_norms = np.zeros(capacity, dtype=self.dtype)
+        sq_norms[:self.size] = self._sq_norms[:self.size]
+        names = np.empty(capacity, dtype=object)
+        names[:self.size] = self._names[:self.size]
+        self._matrix, self._sq_norms, self._names = matrix, sq_norms, names
+
+    def add(self, name, encoding):
+        with self.lock:
+            return self._add(name, encoding)
+
+    def _add(self, name, encoding):
+        encoding = np.asarray(encoding, dtype=self.dtype).reshape(self.dim)
+        row = self._rows.get(name)
+        is_new = row is None
+        if is_new:
+            if self.size == len(self._matrix):
+                self._grow(self.size + 1)
+            row = self.size
+            self.size += 1
+            self._rows[name] = row
+            self._names[row] = name
+        self._matrix[row] = encoding
+        self._sq_norms[row] = encoding @ encoding
+        if self.index is not None:
+            if is_new:
+                self.index.add(row, encoding)
+            else:
+                self.index.update(row, encoding)
+        return row
+
+    def remove(self, name):
+        with self.lock:
+            return self._remove(name)
+
+    def _remove(self, name):
+        # Swap the last row into the hole so the live rows stay contiguous
+        row = self._rows.pop(name, None)
+        if row is None:
+            return False
+        last = self.size - 1
+        if self.index is not None:
+            self.index.remove(row, last)
+        if row != last:
+            moved = self._names[last]
+            self._matrix[row] = self._matrix[last]
+            self._sq_norms[row] = self._sq_norms[last]
+            self._names[row] = moved
+            self._rows[moved] = row
+        self._names[last] = None
+        self.size = last
+        return True
+
+    def distances(self, probes):
+        probes = np.atleast_2d(np.asarray(probes, dtype=self.dtype))
+        if self.size == 0:
+            return np.empty((len(probes), 0), dtype=self.dtype)
+        # |p - g|^2 = |p|^2 + |g|^2 - 2 p.g, one GEMM for the whole batch
+        sq = (np.einsum("ij,ij->i", probes, probes)[:, None]
+              + self._sq_norms[:self.size][None, :]
+              - 2.0 * probes @ self._matrix[:self.size].T)
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq, out=sq)
+
+    def nearest(self, probes, k=1):
+        """Return (rows, dists), each (M, k) and sorted by distance; missing slots are -1/inf."""
+        probes = np.atleast_2d(np.asarray(probes, dtype=self.dtype))
+        with self.lock:
+            if self.index is not None and self.index.ready(self):
+                return self.index.nearest(self, probes, k)
+            dists = self.distances(probes)
+            return top_k_rows(dists, np.arange(self.size), k)
+
+    def match(self, probes, tolerance=DEFAULT_TOLERANCE):
+        with self.lock:
+            rows, dists = self.nearest(probes, 1)
+            return [Match(self._names[r] if r >= 0 and d <= tolerance else None, float(d))
+                    for r, d in zip(rows[:, 0], dists[:, 0])]
+
+    def match_one(self, encoding, tolerance=DEFAULT_TOLERANCE):
+        return self.match([encoding], tolerance)[0]
+
+    def topk(self, probes, k=5):
+        with self.lock:
+            rows, dists = self.nearest(probes, k)
+            return [[Match(self._names[r], float(d)) for r, d in zip(rs, ds) if r >= 0]
+                    for rs, ds in zip(rows, dists)]
+
+    def to_dict(self):
+        return {self._names[i]: self._matrix[i].copy() for i in range(self.size)}
+
+
+def top_k_rows(dists, rows, k):
+    """Pick the k smallest columns of an (M, C) distance block, mapped through rows."""
+    m, c = dists.shape
+    out_rows = np.full((m, k), -1, dtype=np.int64)
+    out_dists = np.full((m, k), np.inf)
+    kk = min(k, c)
+    if kk == 0:
+        return out_rows, out_dists
+    part = np.argpartition(dists, kk - 1, axis=1)[:, :kk]
+    part_dists = np.take_along_axis(dists, part, axis=1)
+    order = np.argsort(part_dists, axis=1)
+    out_rows[:, :kk] = rows[np.take_along_axis(part, order, axis=1)]
+    out_dists[:, :kk] = np.take_along_axis(part_dists, order, axis=1)
+    return out_rows, out_dists
@@ -0,0 +1,93 @@
+import tkinter as tk
+from tkinter import ttk
+
+from attendance_store import LogPager
+
+
+class LogViewer:
+    """Toplevel that only ever holds one page of log rows in its Text widget."""
+
+    def __init__(self, master, store, page_size=100, refresh_ms=2000):
+        self.pager = LogPager(store, page_size)
+        self.refresh_ms = refresh_ms
+        self.current = 0
+        self.known_count = 0
+
+        self.top = tk.Toplevel(master)
+        self.top.title("Attendance Logs")
+        self.top.geometry("500x440")
+
+        bar = tk.Frame(self.top)
+        bar.pack(fill="x")
+        tk.Label(bar, text="Name:").pack(side=tk.LEFT)
+        self.name_var = tk.StringVar()
+        ttk.Entry(bar, textvariable=self.name_var, width=14).pack(side=tk.LEFT)
+        tk.Label(bar, text="Date:").pack(side=tk.LEFT)
+        self.date_var = tk.StringVar()
+        ttk.Entry(bar, textvariable=self.date_var, width=11).pack(side=tk.LEFT)
+        ttk.Button(bar, text="Filter", command=self.apply_filter).pack(side=tk.LEFT)
+        ttk.Button(bar, text="Jump", command=self.jump_to_date).pack(side=tk.LEFT)
+
+        body = tk.Frame(self.top)
+        body.pack(expand=True, fill="both")
+        self.text = tk.Text(body, wrap="none", font=("Consolas", 10))
+        self.text.pack(side=tk.LEFT, expand=True, fill="both")
+        # The scale stands in for a scrollbar over the whole log, one step per page
+        self.scale = ttk.Scale(body, orient="vertical", from_=0, to=0, command=self._on_scale)
+        self.scale.pack(side=tk.RIGHT, fill="y")
+        self.text.bind("<MouseWheel>", self._on_wheel)
+        self.text.bind("<Button-4>", lambda e: self._step(-1))
+        self.text.bind("<Button-5>", lambda e: self._step(1))
+
+        nav = tk.Frame(self.top)
+        nav.pack(fill="x")
+        ttk.Button(nav, text="◀", command=lambda: self._step(-1)).pack(side=tk.LEFT)
+        ttk.Button(nav, text="▶", command=lambda: self._step(1)).pack(side=tk.LEFT)
+        self.page_var = tk.StringVar()
+        tk.Label(nav, textvariable=self.page_var).pack(side=tk.LEFT, padx=10)
+
+        self.show(0)
+        self.top.after(self.refresh_ms, self._refresh)
+
+    def show(self, index):
+        self.current, rows = self.pager.page(index)
+        pages = self.pager.pages()
+        self.known_count = self.pager.count()
+        self.text.delete("1.0", "end")
+        self.text.insert("end", self.pager.format(rows))
+        self.scale.configure(to=pages - 1)
+        self.scale.set(self.current)
+        self.page_var.set(f"Page {self.current + 1}/{pages} · {self.known_count} rows")
+
+    def _step(self, delta):
+        self.show(self.current + delta)
+
+    def _on_wheel(self, event):
+        first, last = self.text.yview()
+        if event.delta > 0 and first <= 0.0:
+            self._step(-1)
+        elif event.delta < 0 and last >= 1.0:
+            self._step(1)
+
+    def _on_scale(self, value):
+        index = int(round(float(value)))
+        if index != self.current:
+            self.show(index)
+
+    def apply_filter(self):
+        self.pager.set_filter(self.name_var.get().strip(), None)
+        self.show(0)
+
+    def jump_to_date(self):
+        date = self.date_var.get().strip()
+        if date:
+            self.show(self.pager.page_for_date(date))
+
+    def _refresh(self):
+        # New rows land in the store as they are flushed; follow them on the last page
+        if not self.top.winfo_exists():
+            return
+        if self.pager.count() != self.known_count:
+            on_last = self.current >= self.pager.pages() - 2
+            self.show(self.pager.pages() - 1 if on_last else self.current)
+        self.top.after(self.refresh_ms, self._refresh)
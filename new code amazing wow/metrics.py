@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+STAGES = ("capture", "detect", "encode", "match", "render", "latency", "log_io")
+
+
+class RollingHistogram:
+    """Last `size` samples in a ring buffer; recording is a single array store."""
+
+    def __init__(self, size=1024):
+        self._samples = np.zeros(size)
+        self.count = 0
+
+    def add(self, value):
+        # Unlocked on purpose: a racing writer can at worst overwrite one sample
+        self._samples[self.count % len(self._samples)] = value
+        self.count += 1
+
+    def values(self):
+        return self._samples[:min(self.count, len(self._samples))].copy()
+
+    def percentiles(self, qs=(50, 95, 99)):
+        values = self.values()
+        if not len(values):
+            return [0.0] * len(qs)
+        return [float(v) for v in np.percentile(values, qs)]
+
+
+class RateCounter:
+    def __init__(self, size=64):
+        self._times = RollingHistogram(size)
+
+    def tick(self):
+        self._times.add(time.perf_counter())
+
+    def rate(self):
+        times = np.sort(self._times.values())
+        if len(times) < 2 or times[-1] <= times[0]:
+            return 0.0
+        if time.perf_counter() - times[-1] > 2.0:
+            return 0.0  # stream has stopped
+        return (len(times) - 1) / (times[-1] - times[0])
+
+
+class Metrics:
+    """Per-stage latency histograms (ms) and event rates for the hot path."""
+
+    def __init__(self, size=1024):
+        self.size = size
+        self.stages = {}
+        self.rates = {}
+        self._lock = threading.Lock()
+
+    def _hist(self, stage):
+        hist = self.stages.get(stage)
+        if hist is None:
+            with self._lock:
+                hist = self.stages.setdefault(stage, RollingHistogram(self.size))
+        return hist
+
+    def record(self, stage, ms):
+        self._hist(stage).add(ms)
+
+    def since(self, stage, start):
+        """Record the time since a time.perf_counter() start; returns that duration in ms."""
+        ms = (time.perf_counter() - start) * 1000.0
+        self._hist(stage).add(ms)
+        return ms
+
+    def tick(self, stream):
+        counter = self.rates.get(stream)
+        if counter is None:
+            with self._lock:
+                counter = self.rates.setdefault(stream, RateCounter())
+        counter.tick()
+
+    def fps(self, stream):
+        counter = self.rates.get(stream)
+        return counter.rate() if counter else 0.0
+
+    def snapshot(self):
+        stages = {}
+        for stage, hist in list(self.stages.items()):
+            p50, p95, p99 = hist.percentiles()
+            stages[stage] = {"p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "count": hist.count}
+        return {"time": time.time(), "stages": stages,
+                "fps": {name: c.rate() for name, c in list(self.rates.items())}}
+
+    def prometheus(self):
+        snap = self.snapshot()
+        lines = ["# TYPE facevault_stage_latency_ms summary"]
+        for stage, s in snap["stages"].items():
+            for q, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+                lines.append(f'facevault_stage_latency_ms{{stage="{stage}",quantile="{q}"}} {s[key]:.3f}')
+            lines.append(f'facevault_stage_latency_ms_count{{stage="{stage}"}} {s["count"]}')
+        lines.append("# TYPE facevault_fps gauge")
+        for stream, rate in snap["fps"].items():
+            lines.append(f'facevault_fps{{stream="{stream}"}} {rate:.2f}')
+        return "\n".join(lines) + "\n"
+
+    def overlay_lines(self):
+        lines = [" ".join(f"{name} {self.fps(name):.0f}fps" for name in ("preview", "inference")
+                          if name in self.rates)]
+        for stage in STAGES:
+            hist = self.stages.get(stage)
+            if hist is not None and hist.count:
+                p50, p95, _ = hist.percentiles((50, 95, 99))
+                lines.append(f"{stage:7s} {p50:6.1f} / {p95:6.1f} ms")
+        return lines
+
+
+# Process-wide registry, like logging's root logger
+METRICS = Metrics()
+
+
+def draw_overlay(rgb, metrics=METRICS, origin=(10, 20)):
+    import cv2
+    x, y = origin
+    for line in metrics.overlay_lines():
+        cv2.putText(rgb, line, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 0), 3)
+        cv2.putText(rgb, line, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 255, 0), 1)
+        y += 16
+
+
+class MetricsExporter:
+    """Periodic JSON snapshot to a file and/or a Prometheus text endpoint on localhost."""
+
+    def __init__(self, metrics=METRICS, path=None, port=0, interval=5.0):
+        self.metrics = metrics
+        self.path = path
+        self.port = port
+        self.interval = interval
+        self._stop = threading.Event()
+        self._server = None
+
+    def start(self):
+        if self.path:
+            threading.Thread(target=self._write_loop, name="facevault-metrics-file", daemon=True).start()
+        if self.port:
+            metrics = self.metrics
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    body = metrics.prometheus().encode()
+                    self.send_response(200 if self.path in ("/", "/metrics") else 404)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+            threading.Thread(target=self._server.serve_forever, name="facevault-metrics-http",
+                             daemon=True).start()
+        return self
+
+    def _write_loop(self):
+        while not self._stop.wait(self.interval):
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.metrics.snapshot(), f)
+            os.replace(tmp, self.path)
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+
+
+def start_exporter(settings):
+    if not settings["metrics_file"] and not settings["metrics_port"]:
+        return None
+    return MetricsExporter(METRICS, settings["metrics_file"] or None,
+                           settings["metrics_port"]).start()
@@ -0,0 +1,67 @@
+import time
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Cheap scene-change check in front of face detection.
+
+    Each frame is shrunk to a tiny grey thumbnail and compared with a running-average
+    background. Detection runs while the score is over `threshold`, for `hold_frames`
+    frames after that, while the last analysis still had faces (someone standing
+    still), and at least every `force_interval` seconds whatever the score.
+    """
+
+    def __init__(self, threshold=4.0, hold_frames=15, force_interval=2.0, learning_rate=0.05,
+                 size=(64, 48)):
+        self.threshold = threshold
+        self.hold_frames = hold_frames
+        self.force_interval = force_interval
+        self.learning_rate = learning_rate
+        self.size = size
+        self.background = None
+        self.score = 0.0
+        self.hold = 0
+        self.last_open = 0.0
+        self.checked = 0
+        self.skipped = 0
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(threshold=settings["motion_threshold"], hold_frames=settings["motion_hold_frames"],
+                   force_interval=settings["motion_force_check_s"],
+                   learning_rate=settings["motion_learning_rate"])
+
+    def update(self, rgb):
+        small = cv2.resize(rgb, self.size, interpolation=cv2.INTER_AREA)
+        gray = small.mean(axis=2, dtype=np.float32)
+        if self.background is None:
+            self.background = gray
+            self.hold = self.hold_frames
+            self.score = 0.0
+        else:
+            diff = gray - self.background
+            self.score = float(np.abs(diff).mean())
+            self.background += self.learning_rate * diff
+        return self.score
+
+    def should_detect(self, rgb, faces_present=False, now=None):
+        now = time.perf_counter() if now is None else now
+        self.checked += 1
+        if self.update(rgb) > self.threshold:
+            self.hold = self.hold_frames
+        elif self.hold > 0:
+            self.hold -= 1
+        if self.hold > 0 or faces_present or now - self.last_open >= self.force_interval:
+            self.last_open = now
+            return True
+        self.skipped += 1
+        return False
+
+    def reset(self):
+        self.background = None
+        self.hold = 0
+
+    def report(self):
+        return {"score": self.score, "checked": self.checked, "skipped": self.skipped,
+                "idle_ratio": self.skipped / max(1, self.checked)}
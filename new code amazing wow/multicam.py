@@ -0,0 +1,235 @@
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from gallery import FaceGallery
+from recognizer import FaceResult
+
+log = logging.getLogger(__name__)
+
+
+def parse_source(source):
+    """Device indices may arrive as strings from settings.json; files and URLs stay strings."""
+    if isinstance(source, str) and source.strip().isdigit():
+        return int(source)
+    return source
+
+
+class SharedGallery:
+    """The gallery matrix copied once into shared memory for the camera processes to map read-only."""
+
+    def __init__(self, gallery):
+        with gallery.lock:
+            if hasattr(gallery, "source"):
+                # Quantized galleries hold codes only; the workers match on the exact rows
+                names, matrix = gallery.source.live()
+            else:
+                names, matrix = gallery.names, gallery.encodings
+            matrix = np.ascontiguousarray(matrix)
+            names = list(names)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, matrix.nbytes))
+        np.ndarray(matrix.shape, matrix.dtype, buffer=self.shm.buf)[:] = matrix
+        self.spec = (self.shm.name, matrix.shape, matrix.dtype.str, names)
+
+    @staticmethod
+    def attach(spec):
+        name, shape, dtype, names = spec
+        # Spawned workers share the parent's resource tracker, so attaching here
+        # never unlinks the block behind the parent's back
+        shm = shared_memory.SharedMemory(name=name)
+        matrix = np.ndarray(shape, np.dtype(dtype), buffer=shm.buf)
+        matrix.flags.writeable = False
+        return FaceGallery.from_arrays(names, matrix), shm
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+class FrameSlot:
+    """Double-buffered display frame in shared memory with one writer.
+
+    The writer fills the slot the last published sequence number is not on and
+    then bumps the sequence, so a reader never sees a half-written frame.
+    """
+
+    HEADER = 64
+
+    def __init__(self, size, name=None):
+        w, h = size
+        self.size = size
+        nbytes = self.HEADER + 2 * h * w * 3
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=nbytes)
+        self.seq = np.ndarray((1,), np.int64, buffer=self.shm.buf)
+        self.frames = np.ndarray((2, h, w, 3), np.uint8, buffer=self.shm.buf, offset=self.HEADER)
+
+    def write(self, rgb):
+        seq = int(self.seq[0]) + 1
+        cv2.resize(rgb, self.size, dst=self.frames[seq % 2], interpolation=cv2.INTER_AREA)
+        self.seq[0] = seq
+
+    def read(self, seen):
+        """(frame view or None, seq); the view stays valid until the writer's next-but-one frame."""
+        seq = int(self.seq[0])
+        if seq == seen:
+            return None, seen
+        return self.frames[seq % 2], seq
+
+    def close(self, unlink=False):
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def camera_worker(index, source, tile_size, gallery_spec, slot_name, settings, core, results, stop):
+    """One camera: its own capture + inference threads, in a process pinned to one core."""
+    from capture import CaptureSource
+    from pipeline import CameraPipeline
+    from recognizer import make_recognizer
+    if core is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {core})
+    gallery, gallery_shm = SharedGallery.attach(gallery_spec)
+    slot = FrameSlot(tile_size, slot_name)
+    recognizer = make_recognizer(gallery, settings)
+    capture = CaptureSource(source, settings)
+    pipeline = CameraPipeline(capture, recognizer.analyze, mirror=isinstance(source, int))
+    if not pipeline.start():
+        results.put((index, "error", f"could not open {source!r}"))
+        return
+    results.put((index, "capture", capture.describe()))
+    sx = sy = None
+    try:
+        while not stop.is_set() and pipeline.running:
+            frame, faces = pipeline.poll()
+            if frame is not None:
+                slot.write(frame)
+                sy, sx = tile_size[1] / frame.shape[0], tile_size[0] / frame.shape[1]
+            if faces is not None and sx is not None:
+                # Boxes go out in tile coordinates; encodings stay in this process
+                results.put((index, "faces", [
+                    ((int(t * sy), int(r * sx), int(b * sy), int(l * sx)), f.name, f.distance,
+                     f.track_id, f.fresh) for f in faces for t, r, b, l in [f.box]]))
+            time.sleep(0.005)
+        if pipeline.error:
+            results.put((index, "error", pipeline.error))
+    finally:
+        pipeline.stop()
+        slot.close()
+        gallery_shm.close()
+
+
+def tile_layout(count, size):
+    """(tile_size, [(x, y), ...]) for `count` tiles filling a (w, h) area, aspect kept at 4:3."""
+    w, h = size
+    cols = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / cols)
+    tw, th = w // cols, h // rows
+    tw, th = min(tw, th * 4 // 3), min(th, tw * 3 // 4)
+    return (tw, th), [((i % cols) * tw, (i // cols) * th) for i in range(count)]
+
+
+class TileScheduler:
+    """Which tiles to redraw this tick: the focused one always, the rest at background_fps."""
+
+    def __init__(self, count, background_fps=5.0):
+        self.focus = 0
+        self.interval = 1.0 / background_fps if background_fps > 0 else 0.0
+        self._last = [0.0] * count
+
+    def due(self, index, now=None):
+        now = time.perf_counter() if now is None else now
+        if index == self.focus or now - self._last[index] >= self.interval:
+            self._last[index] = now
+            return True
+        return False
+
+
+class MultiCameraPipeline:
+    """N camera processes sharing one read-only gallery, merged into one result stream.
+
+    poll() mirrors CameraPipeline.poll: (new frames by camera index, list of
+    (camera index, [FaceResult])). Result boxes are in tile coordinates and
+    carry no encodings. Each camera's capture negotiation report ends up in
+    `captures` by index and is logged in this process.
+    """
+
+    def __init__(self, sources, gallery, settings, tile_size):
+        self.sources = [parse_source(s) for s in sources]
+        self.gallery = gallery
+        self.settings = settings
+        self.tile_size = tile_size
+        self.pin = settings["camera_pin_cores"]
+        self.errors = {}
+        self.captures = {}
+        self._procs = []
+        self._slots = []
+        self._seen = []
+        self._shared = None
+        self._stop = None
+        self._results = None
+
+    def start(self):
+        ctx = multiprocessing.get_context("spawn")
+        self._shared = SharedGallery(self.gallery)
+        self._stop = ctx.Event()
+        self._results = ctx.Queue()
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+        self.errors = {}
+        self.captures = {}
+        for i, source in enumerate(self.sources):
+            slot = FrameSlot(self.tile_size)
+            core = cores[i % len(cores)] if self.pin and cores else None
+            proc = ctx.Process(target=camera_worker, name=f"facevault-camera-{i}", daemon=True,
+                               args=(i, source, self.tile_size, self._shared.spec, slot.shm.name,
+                                     self.settings, core, self._results, self._stop))
+            proc.start()
+            self._slots.append(slot)
+            self._procs.append(proc)
+        self._seen = [0] * len(self.sources)
+        return True
+
+    @property
+    def running(self):
+        return any(p.is_alive() for p in self._procs)
+
+    def poll(self):
+        frames = {}
+        for i, slot in enumerate(self._slots):
+            frame, self._seen[i] = slot.read(self._seen[i])
+            if frame is not None:
+                frames[i] = frame
+        results = []
+        while True:
+            try:
+                index, kind, payload = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "error":
+                self.errors[index] = payload
+            elif kind == "capture":
+                self.captures[index] = payload
+                log.info("camera %d: %s", index + 1, payload)
+            else:
+                results.append((index, [FaceResult(box, name, dist, None, track_id, fresh)
+                                        for box, name, dist, track_id, fresh in payload]))
+        return frames, results
+
+    def stop(self, timeout=2.0):
+        if self._stop is None:
+            return
+        self._stop.set()
+        for proc in self._procs:
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.terminate()
+        for slot in self._slots:
+            slot.close(unlink=True)
+        self._shared.close()
+        self._procs, self._slots, self._stop = [], [], None
@@ -0,0 +1,144 @@
+import threading
+import time
+import cv2
+
+from metrics import METRICS
+
+
+class LatestSlot:
+    """Bounded hand-off of size one: a new item replaces whatever was not picked up yet."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self.seq = 0
+        self.dropped = 0
+        self._taken = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._item is not None and self._taken < self.seq:
+                self.dropped += 1
+            self._item = item
+            self.seq += 1
+            self._cond.notify_all()
+
+    def peek(self):
+        with self._cond:
+            return self._item, self.seq
+
+    def wait_newer(self, seq, timeout=0.1):
+        with self._cond:
+            if self.seq <= seq:
+                self._cond.wait(timeout)
+            if self.seq <= seq:
+                return None, seq
+            self._taken = self.seq
+            return self._item, self.seq
+
+
+class CameraPipeline:
+    """Capture thread -> inference worker -> GUI poll.
+
+    The capture thread only keeps the newest mirrored RGB frame. The worker runs
+    analyze(rgb) on the newest frame it can get and publishes the results. The GUI
+    calls poll() on its own timer and only draws what is already there, so the
+    preview runs at camera FPS whatever the recognition latency is.
+
+    frame_stamp is the perf_counter time the frame last returned by poll() was
+    captured: the source's own exposure time when it has one (last_timestamp),
+    otherwise the moment read() returned. analysis_ms is a running average of
+    capture-to-result time. The worker analyses at most every `stride`-th frame.
+    """
+
+    def __init__(self, source, analyze, mirror=True, stride=1):
+        self.source = source
+        self.analyze = analyze
+        self.mirror = mirror
+        self.stride = stride
+        self.analysis_ms = None
+        self.frames = LatestSlot()
+        self.results = LatestSlot()
+        self.running = False
+        self.error = None
+        self.frame_stamp = None
+        self._cap = None
+        self._threads = []
+        self._shown_frame = 0
+        self._shown_results = 0
+
+    def start(self):
+        if self.running:
+            return True
+        self._cap = self.source() if callable(self.source) else cv2.VideoCapture(self.source)
+        if not self._cap.isOpened():
+            self._cap.release()
+            self._cap = None
+            return False
+        self.running = True
+        self.error = None
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="facevault-capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="facevault-inference", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+        return True
+
+    def stop(self, timeout=1.0):
+        self.running = False
+        current = threading.current_thread()
+        for t in self._threads:
+            if t is not current:
+                t.join(timeout)
+        self._threads = []
+
+    def _capture_loop(self):
+        cap = self._cap
+        try:
+            while self.running:
+                start = time.perf_counter()
+                ret, frame = cap.read()
+                if not ret:
+                    self.error = "capture failed"
+                    break
+                stamp = getattr(cap, "last_timestamp", None) or time.perf_counter()
+                if self.mirror:
+                    frame = cv2.flip(frame, 1)
+                self.frames.put((cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), stamp))
+                METRICS.since("capture", start)
+                METRICS.tick("capture")
+        finally:
+            # Released here so read() and release() never race
+            cap.release()
+            self.running = False
+
+    def _inference_loop(self):
+        seq = 0
+        while self.running:
+            item, new_seq = self.frames.wait_newer(seq + self.stride - 1 if seq else 0)
+            if item is None:
+                continue
+            (rgb, stamp), seq = item, new_seq
+            try:
+                self.results.put((seq, self.analyze(rgb)))
+                ms = (time.perf_counter() - stamp) * 1000.0
+                self.analysis_ms = ms if self.analysis_ms is None else 0.8 * self.analysis_ms + 0.2 * ms
+                METRICS.tick("inference")
+            except Exception as e:
+                self.error = repr(e)
+                self.running = False
+
+    def poll(self):
+        """Return (frame or None, results or None): each is None unless newer than the last poll."""
+        item, frame_seq = self.frames.peek()
+        frame = None
+        if frame_seq != self._shown_frame and item is not None:
+            frame, self.frame_stamp = item
+        self._shown_frame = frame_seq
+        item, res_seq = self.results.peek()
+        results = None
+        if res_seq != self._shown_results and item is not None:
+            results = item[1]
+        self._shown_results = res_seq
+        return frame, results
@@ -0,0 +1,238 @@
+import threading
+import numpy as np
+
+from gallery import DEFAULT_TOLERANCE, Match, top_k_rows
+
+KINDS = ("float16", "int8", "pq")
+
+
+class QuantizedGallery:
+    """Enrolled faces as compact codes in one array, re-ranked at full precision.
+
+    kind "float16" keeps 2 bytes per dimension, "int8" 1 byte with a per-dimension
+    scale, and "pq" pq_m bytes per face (product quantization, 256 centroids per
+    sub-space). Candidates are the `rerank` closest rows by code distance; their
+    exact vectors come from source.get(name), normally the memory-mapped
+    EncodingStore, so only those rows are paged in. The tolerance decision is made
+    on the exact distance, the same one compare_faces would compute.
+    """
+
+    def __init__(self, source, kind="int8", dim=128, rerank=16, pq_m=16, capacity=64):
+        if kind not in KINDS:
+            raise ValueError(f"unknown quantization {kind!r}, expected one of {KINDS}")
+        if kind == "pq" and dim % pq_m:
+            raise ValueError("pq_m must divide the encoding dimension")
+        self.source = source
+        self.kind = kind
+        self.dim = dim
+        self.rerank = rerank
+        self.pq_m = pq_m
+        self.scale = None
+        self.codebooks = None
+        self.index = None
+        self.lock = threading.RLock()
+        width, dtype = {"float16": (dim, np.float16), "int8": (dim, np.int8),
+                        "pq": (pq_m, np.uint8)}[kind]
+        self._codes = np.zeros((capacity, width), dtype=dtype)
+        self._sq_norms = np.zeros(capacity if kind != "pq" else 0, dtype=np.float32)
+        self._names = np.empty(capacity, dtype=object)
+        self._rows = {}
+        self.size = 0
+
+    @classmethod
+    def from_store(cls, store, kind="int8", rerank=16, pq_m=16, train_sample=16384, seed=0):
+        names, matrix = store.live()
+        gallery = cls(store, kind, store.dim, rerank, pq_m, capacity=max(64, len(names)))
+        rng = np.random.default_rng(seed)
+        sample = matrix
+        if len(matrix) > train_sample:
+            sample = matrix[np.sort(rng.choice(len(matrix), train_sample, replace=False))]
+        gallery.train(np.asarray(sample, dtype=np.float32), seed)
+        for start in range(0, len(names), 65536):
+            block = np.asarray(matrix[start:start + 65536], dtype=np.float32)
+            gallery._append_codes(names[start:start + 65536], block)
+        return gallery
+
+    def train(self, vectors, seed=0):
+        if self.kind == "int8":
+            peak = np.abs(vectors).max(axis=0) if len(vectors) else np.full(self.dim, 0.5)
+            # Headroom for faces enrolled later that sit a little outside the range
+            self.scale = (np.maximum(peak, 1e-3) * 1.25 / 127.0).astype(np.float32)
+        elif self.kind == "pq":
+            from ann_index import kmeans
+            dsub = self.dim // self.pq_m
+            ksub = min(256, max(1, len(vectors)))
+            self.codebooks = np.zeros((self.pq_m, ksub, dsub), dtype=np.float32)
+            if len(vectors):
+                for m in range(self.pq_m):
+                    sub = vectors[:, m * dsub:(m + 1) * dsub]
+                    self.codebooks[m] = kmeans(sub, ksub, iters=10, seed=seed + m)
+
+    def encode(self, vectors):
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if self.kind == "float16":
+            return vectors.astype(np.float16)
+        if self.kind == "int8":
+            return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+        dsub = self.dim // self.pq_m
+        codes = np.empty((len(vectors), self.pq_m), dtype=np.uint8)
+        for m in range(self.pq_m):
+            sub = vectors[:, m * dsub:(m + 1) * dsub]
+            book = self.codebooks[m]
+            d = (book * book).sum(axis=1)[None, :] - 2.0 * sub @ book.T
+            codes[:, m] = d.argmin(axis=1)
+        return codes
+
+    def decode(self, codes):
+        if self.kind == "float16":
+            return codes.astype(np.float32)
+        if self.kind == "int8":
+            return codes.astype(np.float32) * self.scale
+        return np.concatenate([self.codebooks[m][codes[:, m]] for m in range(self.pq_m)], axis=1)
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, name):
+        return name in self._rows
+
+    @property
+    def names(self):
+        return self._names[:self.size]
+
+    @property
+    def encodings(self):
+        """Decoded (approximate) float32 rows; for exports, not for decisions."""
+        return self.decode(self._codes[:self.size])
+
+    @property
+    def nbytes(self):
+        return self._codes[:self.size].nbytes + self._sq_norms[:self.size].nbytes
+
+    def get(self, name):
+        if name not in self._rows:
+            return None
+        exact = self.source.get(name)
+        return exact if exact is not None else self.decode(self._codes[[self._rows[name]]])[0]
+
+    def attach_index(self, index):
+        self.index = index
+
+    def _grow(self, needed):
+        capacity = len(self._codes)
+        while capacity < needed:
+            capacity *= 2
+        codes = np.zeros((capacity, self._codes.shape[1]), dtype=self._codes.dtype)
+        codes[:self.size] = self._codes[:self.size]
+        names = np.empty(capacity, dtype=object)
+        names[:self.size] = self._names[:self.size]
+        if self.kind != "pq":
+            sq_norms = np.zeros(capacity, dtype=np.float32)
+            sq_norms[:self.size] = self._sq_norms[:self.size]
+            self._sq_norms = sq_norms
+        self._codes, self._names = codes, names
+
+    def _append_codes(self, names, vectors):
+        codes = self.encode(vectors)
+        start = self.size
+        if start + len(names) > len(self._codes):
+            self._grow(start + len(names))
+        self._codes[start:start + len(names)] = codes
+        if self.kind != "pq":
+            decoded = self.decode(codes)
+            self._sq_norms[start:start + len(names)] = np.einsum("ij,ij->i", decoded, decoded)
+        self._names[start:start + len(names)] = names
+        for i, name in enumerate(names):
+            self._rows[name] = start + i
+        self.size += len(names)
+
+    def add(self, name, encoding):
+        """Add or replace; the caller also writes the exact vector to the source store."""
+        with self.lock:
+            row = self._rows.get(name)
+            if row is None:
+                self._append_codes([name], np.asarray(encoding, dtype=np.float32).reshape(1, self.dim))
+                return self.size - 1
+            self._codes[row] = self.encode(encoding)[0]
+            if self.kind != "pq":
+                decoded = self.decode(self._codes[[row]])[0]
+                self._sq_norms[row] = decoded @ decoded
+            return row
+
+    def remove(self, name):
+        with self.lock:
+            row = self._rows.pop(name, None)
+            if row is None:
+                return False
+            last = self.size - 1
+            if row != last:
+                moved = self._names[last]
+                self._codes[row] = self._codes[last]
+                if self.kind != "pq":
+                    self._sq_norms[row] = self._sq_norms[last]
+                self._names[row] = moved
+                self._rows[moved] = row
+            self._names[last] = None
+            self.size = last
+            return True
+
+    def _approx_sq(self, probes, start, end):
+        codes = self._codes[start:end]
+        if self.kind == "pq":
+            dsub = self.dim // self.pq_m
+            sub = probes.reshape(len(probes), self.pq_m, dsub)
+            # (M, pq_m, ksub) table of sub-space distances, then one gather per code
+            table = ((sub[:, :, None, :] - self.codebooks[None]) ** 2).sum(axis=3)
+            return table[:, np.arange(self.pq_m), codes].sum(axis=2)
+        decoded = self.decode(codes)
+        return (np.einsum("ij,ij->i", probes, probes)[:, None] + self._sq_norms[start:end][None, :]
+                - 2.0 * probes @ decoded.T)
+
+    def candidates(self, probes, k, chunk=65536):
+        """(rows, approx squared distances), each (M, k), from the codes alone."""
+        probes = np.atleast_2d(np.asarray(probes, dtype=np.float32))
+        rows, dists = [], []
+        for start in range(0, self.size, chunk):
+            end = min(self.size, start + chunk)
+            r, d = top_k_rows(self._approx_sq(probes, start, end), np.arange(start, end), k)
+            rows.append(r)
+            dists.append(d)
+        rows, dists = np.concatenate(rows, axis=1), np.concatenate(dists, axis=1)
+        cols, best = top_k_rows(dists, np.arange(dists.shape[1]), k)
+        return np.where(cols >= 0, np.take_along_axis(rows, np.maximum(cols, 0), axis=1), -1), best
+
+    def nearest(self, probes, k=1):
+        """Return (rows, dists), each (M, k), by exact distance over the re-ranked candidates."""
+        probes = np.atleast_2d(np.asarray(probes, dtype=np.float64))
+        out_rows = np.full((len(probes), k), -1, dtype=np.int64)
+        out_dists = np.full((len(probes), k), np.inf)
+        with self.lock:
+            if self.size == 0:
+                return out_rows, out_dists
+            cand, _ = self.candidates(probes, max(k, self.rerank))
+            unique = np.unique(cand[cand >= 0])
+            exact = np.stack([np.asarray(self.get(self._names[r]), dtype=np.float64) for r in unique])
+            position = {int(r): i for i, r in enumerate(unique)}
+            for i, rows in enumerate(cand):
+                rows = rows[rows >= 0]
+                vecs = exact[[position[int(r)] for r in rows]]
+                d = np.linalg.norm(vecs - probes[i], axis=1)
+                order = np.argsort(d)[:k]
+                out_rows[i, :len(order)] = rows[order]
+                out_dists[i, :len(order)] = d[order]
+        return out_rows, out_dists
+
+    def match(self, probes, tolerance=DEFAULT_TOLERANCE):
+        with self.lock:
+            rows, dists = self.nearest(probes, 1)
+            return [Match(self._names[r] if r >= 0 and d <= tolerance else None, float(d))
+                    for r, d in zip(rows[:, 0], dists[:, 0])]
+
+    def match_one(self, encoding, tolerance=DEFAULT_TOLERANCE):
+        return self.match([encoding], tolerance)[0]
+
+    def topk(self, probes, k=5):
+        with self.lock:
+            rows, dists = self.nearest(probes, k)
+            return [[Match(self._names[r], float(d)) for r, d in zip(rs, ds) if r >= 0]
+                    for rs, ds in zip(rows, dists)]
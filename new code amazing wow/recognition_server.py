@@ -0,0 +1,452 @@
+"""Local recognition service shared by every kiosk on one machine.
+
+    python recognition_server.py --encodings face_data/encodings.dat --port 8765
+
+The server owns the only copy of the gallery. Detect and encode requests
+from all clients are collected for up to server_batch_window_ms. The batch
+is split into one share per worker process (each holds the dlib models);
+a share runs its detects in turn and all of its face crops through a single
+encode_frames call. Every encoding in the batch is then matched with one
+gallery.match call. A client sends all the crops of one analysis in one
+request.
+
+/enroll changes who the gallery recognizes (including "admin"), so it needs
+the secret in face_data/server_token, created owner-readable on first use.
+Only processes that can read face_data, and so could edit the store anyway,
+can enroll. Apps use
+it when face_data/settings.json has "recognition_server": "127.0.0.1:8765".
+"""
+import argparse
+import hmac
+import http.client
+import io
+import json
+import multiprocessing
+import os
+import queue
+import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from detector import FaceDetector
+from gallery import DEFAULT_TOLERANCE
+from metrics import METRICS
+from recognizer import Recognizer
+
+
+TOKEN_HEADER = "X-FaceVault-Token"
+
+
+def server_token(data_dir):
+    """The enrollment secret kept in data_dir/server_token, created on first use."""
+    path = os.path.join(data_dir, "server_token")
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(path, "r") as f:
+            return f.read().strip()
+    token = secrets.token_hex(32)
+    with os.fdopen(fd, "w") as f:
+        f.write(token)
+    return token
+
+
+def pack(**arrays):
+    buf = io.BytesIO()
+    np.savez(buf, **arrays)
+    return buf.getvalue()
+
+
+def unpack(body):
+    with np.load(io.BytesIO(body), allow_pickle=False) as z:
+        return {key: z[key] for key in z.files}
+
+
+def _init_worker():
+    from warmup import warm_up_models
+    warm_up_models()
+
+
+def _int_boxes(boxes):
+    return [tuple(int(v) for v in b) for b in boxes]
+
+
+def run_job(kind, images, boxes, options):
+    """One detect (images is one frame) or encode (a list of frames and their boxes) call."""
+    if kind == "detect":
+        import face_recognition
+        return face_recognition.face_locations(images, number_of_times_to_upsample=options["upsample"],
+                                               model=options["model"])
+    from encoder import encode_frames
+    return encode_frames(images, [_int_boxes(b) for b in boxes])
+
+
+def run_jobs(jobs):
+    """A worker's share of a batch: (result, error) per (kind, images, boxes, options) job."""
+    from encoder import encode_frames
+    out = [None] * len(jobs)
+    encodes = []
+    for i, job in enumerate(jobs):
+        if job[0] == "encode":
+            encodes.append(i)
+            continue
+        try:
+            out[i] = (run_job(*job), None)
+        except Exception as e:
+            out[i] = (None, e)
+    if not encodes:
+        return out
+    frames = [image for i in encodes for image in jobs[i][1]]
+    boxes = [_int_boxes(b) for i in encodes for b in jobs[i][2]]
+    try:
+        flat = iter(encode_frames(frames, boxes))
+        for i in encodes:
+            out[i] = ([next(flat) for b in jobs[i][2] for _ in b], None)
+    except Exception:
+        # Retry one job at a time so a bad crop fails only its own request
+        for i in encodes:
+            try:
+                out[i] = (run_job(*jobs[i]), None)
+            except Exception as e:
+                out[i] = (None, e)
+    return out
+
+
+class Job:
+    __slots__ = ("kind", "image", "boxes", "options", "result", "error", "done")
+
+    def __init__(self, kind, image, boxes=None, options=None):
+        self.kind = kind
+        # detect: one frame; encode: a list of frames with a list of boxes each
+        self.image = image
+        self.boxes = boxes
+        self.options = options or {}
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class RecognitionServer:
+    """Micro-batching front end over one gallery and a pool of model processes."""
+
+    def __init__(self, gallery, tolerance=DEFAULT_TOLERANCE, port=8765, workers=0,
+                 batch_window_ms=5.0, max_batch=32, store=None, host="127.0.0.1", enroll_token=None):
+        self.gallery = gallery
+        self.tolerance = tolerance
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_batch = max_batch
+        self.store = store
+        # None turns /enroll off
+        self.enroll_token = enroll_token
+        self.jobs = queue.Queue()
+        self.batches = 0
+        self.batched_jobs = 0
+        self.pool = None
+        self._stop = threading.Event()
+        self._server = None
+
+    def start(self):
+        ctx = multiprocessing.get_context("spawn")
+        self.pool = ProcessPoolExecutor(self.workers, mp_context=ctx, initializer=_init_worker)
+        # Spawn and warm every worker now rather than on the first requests
+        for future in [self.pool.submit(int) for _ in range(self.workers)]:
+            future.result()
+        # Two collectors: one gathers the next batch while the other waits on the pool
+        for i in range(2):
+            threading.Thread(target=self._batch_loop, name=f"facevault-batcher-{i}", daemon=True).start()
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="facevault-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+    def submit(self, kind, image, boxes=None, options=None, timeout=30.0):
+        job = Job(kind, image, boxes, options)
+        self.jobs.put(job)
+        if not job.done.wait(timeout):
+            raise TimeoutError(f"{kind} request timed out")
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _collect(self):
+        try:
+            batch = [self.jobs.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.perf_counter() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.jobs.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _batch_loop(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        start = time.perf_counter()
+        shares = [batch[i::self.workers] for i in range(min(self.workers, len(batch)))]
+        futures = [self.pool.submit(run_jobs, [(j.kind, j.image, j.boxes, j.options) for j in share])
+                   for share in shares]
+        for share, future in zip(shares, futures):
+            try:
+                results = future.result()
+            except Exception as e:
+                results = [(None, e)] * len(share)
+            for job, (result, error) in zip(share, results):
+                job.result, job.error = result, error
+        METRICS.since("encode", start)
+
+        # One GEMM matches every encoding from every client in the batch
+        start = time.perf_counter()
+        encoded = [j for j in batch if j.kind == "encode" and j.error is None]
+        probes = [enc for j in encoded for enc in j.result]
+        matches = iter(self.gallery.match(probes, self.tolerance) if probes else [])
+        for job in encoded:
+            job.result = [(m.name, m.distance, enc) for enc, m in zip(job.result, matches)]
+        METRICS.since("match", start)
+
+        self.batches += 1
+        self.batched_jobs += len(batch)
+        for job in batch:
+            job.done.set()
+
+    def enroll(self, name, encoding, meta=None):
+        encoding = np.asarray(encoding, dtype=np.float64)
+        if self.store is not None:
+            self.store.append(name, encoding, meta, sync=True)
+        self.gallery.add(name, encoding)
+
+    def registrations(self):
+        names = self.gallery.names
+        if self.store is None:
+            return {name: {} for name in names}
+        return {name: self.store.meta(name) for name in names}
+
+    def status(self):
+        return {"gallery": len(self.gallery), "workers": self.workers, "batches": self.batches,
+                "avg_batch": self.batched_jobs / max(1, self.batches), "queued": self.jobs.qsize()}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive: one connection per client
+
+            def _reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path == "/status":
+                    self._reply(200, server.status())
+                elif path == "/registrations":
+                    self._reply(200, server.registrations())
+                else:
+                    self._reply(404, {"error": "not found"})
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                try:
+                    if url.path == "/detect":
+                        image = unpack(body)["image"]
+                        options = {"upsample": int(query.get("upsample", 1)),
+                                   "model": query.get("model", "hog")}
+                        boxes = server.submit("detect", image, options=options)
+                        self._reply(200, {"boxes": [list(b) for b in boxes]})
+                    elif url.path == "/recognize":
+                        arrays = unpack(body)
+                        if "image" in arrays:
+                            images, boxes = [arrays["image"]], [arrays["boxes"]]
+                        else:
+                            boxes = [[b] for b in arrays["boxes"]]
+                            images = [arrays[f"crop{i}"] for i in range(len(boxes))]
+                        faces = server.submit("encode", images, boxes)
+                        self._reply(200, {"faces": [{"name": n, "distance": d, "encoding": e.tolist()}
+                                                    for n, d, e in faces]})
+                    elif url.path == "/enroll":
+                        token = self.headers.get(TOKEN_HEADER, "")
+                        if server.enroll_token is None or not hmac.compare_digest(token, server.enroll_token):
+                            self._reply(403, {"error": "enrollment needs the server token"})
+                            return
+                        req = json.loads(body)
+                        server.enroll(req["name"], req["encoding"], req.get("meta"))
+                        self._reply(200, {"ok": True})
+                    else:
+                        self._reply(404, {"error": "not found"})
+                except Exception as e:
+                    self._reply(500, {"error": repr(e)})
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class RecognitionClient:
+    """Blocking client over one keep-alive connection; safe to share between threads."""
+
+    def __init__(self, address, timeout=30.0, token=None):
+        host, _, port = address.rpartition(":")
+        self.host = host or "127.0.0.1"
+        self.port = int(port)
+        self.timeout = timeout
+        self.headers = {TOKEN_HEADER: token} if token else {}
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _request(self, method, path, body=None):
+        with self._lock:
+            for attempt in range(2):
+                if self._conn is None:
+                    self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+                try:
+                    self._conn.request(method, path, body, self.headers)
+                    resp = self._conn.getresponse()
+                    data = resp.read()
+                    break
+                except (OSError, http.client.HTTPException):
+                    # The server drops idle keep-alive connections; reconnect once
+                    self._conn.close()
+                    self._conn = None
+                    if attempt:
+                        raise
+        payload = json.loads(data)
+        if resp.status != 200:
+            raise RuntimeError(f"recognition server {path}: {payload.get('error', resp.status)}")
+        return payload
+
+    def detect(self, rgb, upsample=1, model="hog"):
+        payload = self._request("POST", f"/detect?upsample={upsample}&model={model}", pack(image=rgb))
+        return [tuple(b) for b in payload["boxes"]]
+
+    def recognize(self, rgb, boxes):
+        """[(name or None, distance, encoding)] for each box that could be encoded."""
+        payload = self._request("POST", "/recognize",
+                                pack(image=rgb, boxes=np.asarray(boxes, dtype=np.int32).reshape(-1, 4)))
+        return [(f["name"], f["distance"], np.asarray(f["encoding"])) for f in payload["faces"]]
+
+    def recognize_crops(self, crops, boxes):
+        """Like recognize() for several images with one box each, in one request."""
+        arrays = {f"crop{i}": crop for i, crop in enumerate(crops)}
+        payload = self._request("POST", "/recognize",
+                                pack(boxes=np.asarray(boxes, dtype=np.int32).reshape(-1, 4), **arrays))
+        return [(f["name"], f["distance"], np.asarray(f["encoding"])) for f in payload["faces"]]
+
+    def enroll(self, name, encoding, meta=None):
+        body = json.dumps({"name": name, "encoding": np.asarray(encoding).tolist(), "meta": meta})
+        self._request("POST", "/enroll", body.encode())
+
+    def registrations(self):
+        return self._request("GET", "/registrations")
+
+    def status(self):
+        return self._request("GET", "/status")
+
+
+class RemoteDetector(FaceDetector):
+    """FaceDetector whose face_locations call runs on the server; resizing and ROIs stay local."""
+    client = None
+
+    def _find(self, small):
+        return self.client.detect(small, self.upsample, self.model)
+
+
+class RemoteRecognizer(Recognizer):
+    """Recognizer that sends a padded crop around each box to the server for encode + match."""
+    client = None
+
+    def encode_and_match_batch(self, items):
+        # Every crop of this call goes in one request; the server batches further across clients
+        if not items:
+            return []
+        start = time.perf_counter()
+        crops, boxes = [], []
+        for rgb, box in items:
+            top, right, bottom, left = box
+            pad = (bottom - top) // 4
+            t, l = max(0, top - pad), max(0, left - pad)
+            crops.append(np.ascontiguousarray(rgb[t:bottom + pad, l:right + pad]))
+            boxes.append((top - t, right - l, bottom - t, left - l))
+        faces = self.client.recognize_crops(crops, boxes)
+        METRICS.since("encode", start)
+        self.encoded += len(items)
+        self.batches += 1
+        if len(faces) != len(items):
+            return [(None, float("inf"), None)] * len(items)
+        return faces
+
+
+def connect_recognizer(settings, client=None):
+    client = client or RecognitionClient(settings["recognition_server"])
+    detector = RemoteDetector.from_settings(settings)
+    detector.client = client
+    recognizer = RemoteRecognizer.from_settings(None, settings, detector)
+    recognizer.client = client
+    return recognizer
+
+
+def main(argv=None):
+    from encoding_store import open_encoding_store
+    from settings import build_gallery, load_settings
+
+    parser = argparse.ArgumentParser(description="Shared FaceVault recognition server")
+    parser.add_argument("--encodings", default=os.path.join("face_data", "encodings.dat"),
+                        help="encodings file whose .store the server owns")
+    parser.add_argument("--data-dir", default="face_data", help="where settings.json lives")
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    settings = load_settings(args.data_dir)
+    store = open_encoding_store(args.encodings)
+    gallery = build_gallery(store, args.encodings, settings)
+    server = RecognitionServer(gallery, settings["tolerance"],
+                               port=args.port or settings["server_port"],
+                               workers=args.workers if args.workers is not None else settings["server_workers"],
+                               batch_window_ms=settings["server_batch_window_ms"],
+                               max_batch=settings["server_max_batch"], store=store,
+                               enroll_token=server_token(args.data_dir)).start()
+    print(f"Serving {len(gallery)} identities on http://{server.host}:{server.port} "
+          f"with {server.workers} workers")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
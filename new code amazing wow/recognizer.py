@@ -0,0 +1,124 @@
+import time
+from collections import namedtuple
+
+from gallery import DEFAULT_TOLERANCE
+from tracker import FaceTracker
+from detector import FaceDetector
+from motion import MotionGate
+from encoder import encode_frames
+from metrics import METRICS
+
+# fresh is True on the analysis where a face first gets (or changes) its identity
+FaceResult = namedtuple("FaceResult", ["box", "name", "distance", "encoding", "track_id", "fresh"],
+                        defaults=(None, True))
+
+
+class Recognizer:
+    """detect -> encode -> match on one RGB frame; safe to call from a worker thread."""
+
+    def __init__(self, gallery, tolerance=DEFAULT_TOLERANCE, tracker=None, detector=None, gate=None,
+                 batch_frames=1):
+        self.gallery = gallery
+        self.tolerance = tolerance
+        self.tracker = tracker
+        self.detector = detector or FaceDetector(scale=1.0)
+        self.gate = gate
+        # With a tracker, faces due an encode can wait up to batch_frames frames to share a batch
+        self.batch_frames = batch_frames
+        self.encoded = 0
+        self.batches = 0
+        self._faces_present = False
+        self._pending = []
+        self._pending_frames = 0
+
+    @classmethod
+    def from_settings(cls, gallery, settings, detector=None):
+        tracker = None
+        if settings["track_faces"]:
+            tracker = FaceTracker(iou_threshold=settings["track_iou"],
+                                  max_misses=settings["track_max_misses"],
+                                  refresh_interval=settings["track_refresh_frames"],
+                                  retry_interval=settings["track_retry_frames"],
+                                  confidence_margin=settings["track_confidence_margin"],
+                                  tolerance=settings["tolerance"])
+        gate = MotionGate.from_settings(settings) if settings["motion_gate"] else None
+        return cls(gallery, settings["tolerance"], tracker,
+                   detector or FaceDetector.from_settings(settings), gate,
+                   settings["encode_batch_frames"])
+
+    def reset(self):
+        # Forget per-sequence state, e.g. between unrelated video chunks
+        self.detector.reset()
+        if self.tracker is not None:
+            self.tracker.reset()
+        if self.gate is not None:
+            self.gate.reset()
+        self._faces_present = False
+        self._pending = []
+        self._pending_frames = 0
+
+    def encode_and_match(self, rgb, box):
+        return self.encode_and_match_batch([(rgb, box)])[0]
+
+    def encode_and_match_batch(self, items):
+        """(name, distance, encoding) per (rgb, box): one batched encode, one gallery GEMM."""
+        if not items:
+            return []
+        start = time.perf_counter()
+        frames, boxes = [], []
+        for rgb, box in items:
+            if not frames or frames[-1] is not rgb:
+                frames.append(rgb)
+                boxes.append([])
+            boxes[-1].append(box)
+        encodings = encode_frames(frames, boxes)
+        METRICS.since("encode", start)
+        self.encoded += len(encodings)
+        self.batches += 1
+        start = time.perf_counter()
+        matches = self.gallery.match(encodings, self.tolerance)
+        METRICS.since("match", start)
+        return [(m.name, m.distance, enc) for m, enc in zip(matches, encodings)]
+
+    def analyze(self, rgb):
+        if self.gate is not None and not self.gate.should_detect(rgb, self._faces_present):
+            # Static, empty scene: nothing new to find, skip the detector entirely
+            return []
+        results = self._recognize(rgb)
+        self._faces_present = bool(results)
+        return results
+
+    def _recognize(self, rgb):
+        boxes = self.detector.detect(rgb)
+        if self.tracker is None:
+            matches = self.encode_and_match_batch([(rgb, box) for box in boxes])
+            return [FaceResult(box, *match) for box, match in zip(boxes, matches)]
+
+        tracks = self.tracker.update(boxes)
+        waiting = {id(track) for track, _, _ in self._pending}
+        due = [track for track in tracks if id(track) not in waiting and self.tracker.needs_encoding(track)]
+        if due:
+            self._pending.extend((track, rgb, track.box) for track in due)
+            self._pending_frames += 1
+        fresh = set()
+        # A track never encoded goes straight away; only retries and refreshes wait for company
+        if self._pending and (self._pending_frames >= self.batch_frames
+                              or any(t.last_encoded is None for t, _, _ in self._pending)):
+            pending, self._pending, self._pending_frames = self._pending, [], 0
+            matches = self.encode_and_match_batch([(frame, box) for _, frame, box in pending])
+            for (track, _, _), (name, distance, encoding) in zip(pending, matches):
+                if encoding is None:
+                    # Keep what the track already knows rather than blanking the label
+                    encoding, name, distance = track.encoding, track.name, track.distance
+                if self.tracker.set_identity(track, name, distance, encoding):
+                    fresh.add(id(track))
+        return [FaceResult(track.box, track.name, track.distance, track.encoding, track.id,
+                           id(track) in fresh) for track in tracks]
+
+
+def make_recognizer(gallery, settings):
+    """In-process Recognizer, or a client of the recognition server named in settings."""
+    if settings["recognition_server"]:
+        from recognition_server import connect_recognizer
+        return connect_recognizer(settings)
+    return Recognizer.from_settings(gallery, settings)
@@ -0,0 +1,72 @@
+import cv2
+import numpy as np
+
+
+class FrameRenderer:
+    """Resizes frames straight into one preallocated display-sized buffer.
+
+    Overlays are drawn on the display buffer after the resize, so the camera
+    frame itself is never copied or written to.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        w, h = size
+        self.buffer = np.zeros((h, w, 3), dtype=np.uint8)
+        self.sx = self.sy = 1.0
+
+    def begin(self, rgb):
+        h, w = rgb.shape[:2]
+        dw, dh = self.size
+        self.sx, self.sy = dw / w, dh / h
+        interpolation = cv2.INTER_AREA if dw < w else cv2.INTER_LINEAR
+        cv2.resize(rgb, self.size, dst=self.buffer, interpolation=interpolation)
+        return self.buffer
+
+    def scale_box(self, box):
+        top, right, bottom, left = box
+        return (int(top * self.sy), int(right * self.sx), int(bottom * self.sy), int(left * self.sx))
+
+
+def mapped_rgba(size):
+    """(array, PIL image) sharing one RGBA buffer, so writes to the array show up in the image.
+
+    Pillow only maps the memory for modes such as RGBA and RGBX; an "RGB"
+    frombuffer copies the buffer once and never sees later writes.
+    """
+    from PIL import Image
+    w, h = size
+    array = np.full((h, w, 4), 255, dtype=np.uint8)
+    return array, Image.frombuffer("RGBA", size, array, "raw", "RGBA", 0, 1)
+
+
+class TkFrameRenderer(FrameRenderer):
+    """One persistent PhotoImage per label, refreshed with paste() from a mapped RGBA buffer."""
+
+    def __init__(self, label, size):
+        super().__init__(size)
+        from PIL import ImageTk
+        self.rgba, self._image = mapped_rgba(size)
+        self.photo = ImageTk.PhotoImage("RGBA", size)
+        label.config(image=self.photo)
+        label.image = self.photo
+
+    def show(self):
+        cv2.cvtColor(self.buffer, cv2.COLOR_RGB2RGBA, dst=self.rgba)
+        self.photo.paste(self._image)
+
+
+class QtFrameRenderer(FrameRenderer):
+    """QImage wrapping the buffer for as long as the renderer lives."""
+
+    def __init__(self, label, size):
+        super().__init__(size)
+        from PyQt5.QtGui import QImage, QPixmap
+        self._QPixmap = QPixmap
+        w, h = size
+        self.label = label
+        self.image = QImage(self.buffer.data, w, h, 3 * w, QImage.Format_RGB888)
+
+    def show(self):
+        # fromImage is the one copy, into the pixmap the label keeps
+        self.label.setPixmap(self._QPixmap.fromImage(self.image))
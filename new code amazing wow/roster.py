@@ -0,0 +1,111 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+class RosterPager:
+    """Registered names sorted once, searched by substring and served a page at a time."""
+
+    def __init__(self, names, page_size=100):
+        self.page_size = page_size
+        self.all = sorted(names, key=str.lower)
+        self._keys = [n.lower() for n in self.all]
+        self.names = self.all
+
+    def set_filter(self, text):
+        text = (text or "").strip().lower()
+        self.names = [n for n, k in zip(self.all, self._keys) if text in k] if text else self.all
+
+    def count(self):
+        return len(self.names)
+
+    def pages(self):
+        return max(1, -(-self.count() // self.page_size))
+
+    def page(self, index):
+        index = max(0, min(index, self.pages() - 1))
+        start = index * self.page_size
+        return index, self.names[start:start + self.page_size]
+
+
+class RosterView:
+    """Admin roster that only ever holds one page of students in its Treeview.
+
+    meta(name) is called for the visible rows only, so opening the panel costs
+    the same for fifty students as for fifty thousand.
+    """
+
+    def __init__(self, master, names, meta, on_view, page_size=100):
+        self.pager = RosterPager(names, page_size)
+        self.meta = meta
+        self.on_view = on_view
+        self.current = 0
+
+        self.top = tk.Toplevel(master)
+        self.top.title("🛡️ Admin Panel")
+        self.top.geometry("800x500")
+
+        bar = tk.Frame(self.top)
+        bar.pack(fill="x")
+        tk.Label(bar, text="Search:").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        search = ttk.Entry(bar, textvariable=self.search_var, width=24)
+        search.pack(side=tk.LEFT)
+        search.bind("<Return>", lambda e: self.apply_filter())
+        ttk.Button(bar, text="Find", command=self.apply_filter).pack(side=tk.LEFT)
+
+        body = tk.Frame(self.top)
+        body.pack(expand=True, fill="both")
+        self.tree = ttk.Treeview(body, columns=("Name", "Registered"), show="headings")
+        self.tree.heading("Name", text="Student Name")
+        self.tree.heading("Registered", text="Registration Date")
+        self.tree.pack(side=tk.LEFT, expand=True, fill="both")
+        self.tree.bind("<Double-1>", lambda e: self.view_face())
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self._step(-1))
+        self.tree.bind("<Button-5>", lambda e: self._step(1))
+        self.scale = ttk.Scale(body, orient="vertical", from_=0, to=0, command=self._on_scale)
+        self.scale.pack(side=tk.RIGHT, fill="y")
+
+        nav = tk.Frame(self.top)
+        nav.pack(fill="x")
+        ttk.Button(nav, text="◀", command=lambda: self._step(-1)).pack(side=tk.LEFT)
+        ttk.Button(nav, text="▶", command=lambda: self._step(1)).pack(side=tk.LEFT)
+        self.page_var = tk.StringVar()
+        tk.Label(nav, textvariable=self.page_var).pack(side=tk.LEFT, padx=10)
+        ttk.Button(nav, text="View Face", command=self.view_face).pack(side=tk.RIGHT, padx=10, pady=10)
+
+        self.show(0)
+
+    def show(self, index):
+        self.current, names = self.pager.page(index)
+        pages = self.pager.pages()
+        self.tree.delete(*self.tree.get_children())
+        for name in names:
+            self.tree.insert("", "end", values=(name, self.meta(name).get("timestamp", "Unknown")))
+        self.scale.configure(to=pages - 1)
+        self.scale.set(self.current)
+        self.page_var.set(f"Page {self.current + 1}/{pages} · {self.pager.count()} students")
+
+    def _step(self, delta):
+        self.show(self.current + delta)
+
+    def _on_wheel(self, event):
+        first, last = self.tree.yview()
+        if event.delta > 0 and first <= 0.0:
+            self._step(-1)
+        elif event.delta < 0 and last >= 1.0:
+            self._step(1)
+
+    def _on_scale(self, value):
+        index = int(round(float(value)))
+        if index != self.current:
+            self.show(index)
+
+    def apply_filter(self):
+        self.pager.set_filter(self.search_var.get())
+        self.show(0)
+
+    def view_face(self):
+        selected = self.tree.focus()
+        if selected:
+            self.on_view(str(self.tree.item(selected)["values"][0]))
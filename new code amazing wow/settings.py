@@ -0,0 +1,124 @@
+import json
+import os
+
+# Defaults for every tunable; face_data/settings.json overrides any of them
+DEFAULTS = {
+    "tolerance": 0.6,
+    # "exact" scans the whole gallery, "ivf" uses ann_index.IVFIndex on big registries
+    "match_backend": "exact",
+    "ivf_nlist": 0,
+    "ivf_nprobe": 8,
+    "ivf_min_candidates": 256,
+    "ivf_min_size": 5000,
+    # "float16" / "int8" / "pq" keep the gallery as compact codes and re-rank the best
+    # quant_rerank candidates with exact vectors from the store ("none" = full precision)
+    "gallery_quantization": "none",
+    "quant_rerank": 16,
+    "quant_pq_m": 16,
+    # Track-then-recognize: encode a face when its track is new, weak or due a refresh
+    "track_faces": True,
+    "track_iou": 0.3,
+    "track_max_misses": 5,
+    "track_refresh_frames": 30,
+    "track_retry_frames": 3,
+    "track_confidence_margin": 0.1,
+    # Faces due a re-encode may wait this many frames to be encoded in one batch
+    "encode_batch_frames": 1,
+    # Detection runs on a downscaled copy; "roi" searches around last frame's boxes
+    # with a full-frame sweep every detect_full_sweep_frames
+    "detect_scale": 0.5,
+    "detect_model": "hog",
+    "detect_upsample": 1,
+    "detect_roi": False,
+    "detect_roi_margin": 0.5,
+    "detect_full_sweep_frames": 10,
+    # Motion gate: skip detection while a downscaled frame barely differs from the
+    # running background; forced check every motion_force_check_s regardless
+    "motion_gate": True,
+    "motion_threshold": 4.0,
+    "motion_hold_frames": 15,
+    "motion_force_check_s": 2.0,
+    "motion_learning_rate": 0.05,
+    # Per-machine profile (tuner.py): "once" calibrates when this machine has no
+    # profile yet, "always" on every start, "off" never. The profile may set
+    # detect_model, detect_scale, analyze_stride, preview_interval_ms and
+    # server_workers, except those given explicitly in settings.json
+    "auto_tune": "once",
+    "tune_latency_ms": 250.0,
+    "tune_fps": 15.0,
+    "tune_adapt": True,
+    # Analyse every Nth captured frame; GUI polls the pipeline every preview_interval_ms
+    "analyze_stride": 1,
+    "preview_interval_ms": 15,
+    # Attendance rows: one per person per cooldown, appended in batches
+    "attendance_cooldown_s": 300,
+    "attendance_flush_rows": 50,
+    "attendance_flush_s": 10.0,
+    # Decoded student photos kept for the summary/detail views; admin roster rows per page
+    "thumbnail_cache_size": 256,
+    "roster_page_size": 100,
+    # Hot-path metrics: FPS/latency overlay on the preview, JSON snapshot file,
+    # Prometheus text on http://127.0.0.1:<port>/metrics (0 = off)
+    "metrics_overlay": False,
+    "metrics_file": "",
+    "metrics_port": 0,
+    # One capture + inference process per source (device index, video file or URL);
+    # more than one shows a tiled grid, background tiles redrawn at tile_background_fps
+    "camera_sources": [0],
+    # Requested capture mode for camera devices (0 / "" = driver default). The
+    # negotiated mode is read back and printed when the camera starts
+    "capture_width": 640,
+    "capture_height": 480,
+    "capture_fps": 30,
+    "capture_fourcc": "MJPG",
+    "capture_buffer_size": 1,
+    "capture_backend": "",
+    "camera_pin_cores": True,
+    "tile_background_fps": 5.0,
+    # Shared recognition_server.py as "host:port" ("" = recognize in-process); the
+    # server batches requests arriving within server_batch_window_ms of each other
+    "recognition_server": "",
+    "server_port": 8765,
+    "server_workers": 0,
+    "server_batch_window_ms": 5.0,
+    "server_max_batch": 32,
+}
+
+
+def read_user_settings(data_dir="face_data"):
+    """Only what face_data/settings.json sets explicitly."""
+    path = os.path.join(data_dir, "settings.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def load_settings(data_dir="face_data"):
+    settings = dict(DEFAULTS)
+    settings.update(read_user_settings(data_dir))
+    return settings
+
+
+def attach_match_backend(gallery, encodings_file, settings):
+    if settings["match_backend"] == "ivf":
+        from ann_index import attach_ivf
+        return attach_ivf(gallery, encodings_file,
+                          nlist=settings["ivf_nlist"],
+                          nprobe=settings["ivf_nprobe"],
+                          min_candidates=settings["ivf_min_candidates"],
+                          min_size=settings["ivf_min_size"])
+    return None
+
+
+def build_gallery(store, encodings_file, settings):
+    """The matching gallery for an EncodingStore: full precision plus the configured
+    match backend, or quantized codes when gallery_quantization asks for them."""
+    kind = settings["gallery_quantization"]
+    if kind and kind != "none":
+        from quantized import QuantizedGallery
+        return QuantizedGallery.from_store(store, kind, rerank=settings["quant_rerank"],
+                                           pq_m=settings["quant_pq_m"])
+    gallery = store.to_gallery()
+    attach_match_backend(gallery, encodings_file, settings)
+    return gallery
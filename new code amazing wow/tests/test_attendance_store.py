@@ -0,0 +1,62 @@
+from attendance_store import AttendanceStore
+
+
+def test_rows_with_bad_timestamps_are_skipped(tmp_path):
+    log = tmp_path / "logs.csv"
+    log.write_text("Name,Time\nalice,2026-01-05 09:00:00\nbob,yesterday\ncarol,2026-1-6 9:30:00\n")
+    store = AttendanceStore(str(tmp_path / "attendance.db"))
+    assert store.import_csv(str(log)) == 2
+    assert store.rejected == 2
+    assert store.daily_counts() == [("2026-01-05", 1), ("2026-01-06", 1)]
+    assert store.person("carol") == (1, "2026-01-06 09:30:00", "2026-01-06 09:30:00")
+    store.close()
+
+
+def test_mirrored_log_is_not_imported_again_on_restart(tmp_path):
+    from attendance import AttendanceWriter
+    from attendance_store import open_store
+    log = str(tmp_path / "logs.csv")
+    store = open_store(str(tmp_path), log)
+    writer = AttendanceWriter(log, store=store)
+    writer.log("alice")
+    writer.close()
+    store.close()
+
+    store = open_store(str(tmp_path), log)
+    assert store.total() == 1
+    store.close()
+
+
+def test_interrupted_import_leaves_no_rows(tmp_path):
+    log = tmp_path / "logs.csv"
+    log.write_text("alice,2026-01-05 09:00:00\nbob,2026-01-05 10:00:00\n")
+    store = AttendanceStore(str(tmp_path / "attendance.db"))
+    insert = store._insert
+    calls = []
+
+    def crash(rows):
+        calls.append(insert(rows))
+        raise KeyboardInterrupt
+
+    store._insert = crash
+    try:
+        store.import_csv(str(log), batch=1)
+    except KeyboardInterrupt:
+        pass
+    store._insert = insert
+    assert calls and store.total() == 0
+    assert store.import_csv(str(log)) == 2
+    assert store.total() == 2
+    store.close()
+
+
+def test_jump_to_date_lands_on_the_page_holding_that_date(tmp_path):
+    from attendance_store import LogPager
+    store = AttendanceStore(str(tmp_path / "attendance.db"))
+    # Logged out of order, e.g. from past footage
+    store.append_many([(f"p{i}", f"2026-01-{d:02d} 09:00:00") for i, d in enumerate([5, 3, 4, 1, 2, 6])])
+    pager = LogPager(store, page_size=2)
+    index, rows = pager.page(pager.page_for_date("2026-01-04"))
+    assert [ts[:10] for _, _, ts in rows] == ["2026-01-03", "2026-01-04"]
+    assert [ts[:10] for _, _, ts in pager.page(0)[1]] == ["2026-01-01", "2026-01-02"]
+    store.close()
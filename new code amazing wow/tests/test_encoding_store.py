@@ -0,0 +1,116 @@
+import numpy as np
+
+from encoding_store import EncodingStore
+
+
+def vector(value):
+    return np.full(128, value, dtype=np.float32)
+
+
+def test_append_after_torn_journal_survives_reload(tmp_path):
+    store = EncodingStore(str(tmp_path))
+    store.append("alice", vector(1.0))
+    store.append("bob", vector(2.0))
+    journal = store._gen_file("journal")
+    store.close()
+    # Crash halfway through bob's journal line
+    with open(journal, "rb") as f:
+        data = f.read()
+    with open(journal, "wb") as f:
+        f.write(data[:-5])
+
+    store = EncodingStore(str(tmp_path))
+    assert store.names() == ["alice"]
+    store.append("carol", vector(3.0))
+    store.close()
+
+    store = EncodingStore(str(tmp_path))
+    assert store.names() == ["alice", "carol"]
+    assert store.get("carol")[0] == 3.0
+    store.close()
+
+
+def test_journal_line_without_vector_is_dropped(tmp_path):
+    store = EncodingStore(str(tmp_path))
+    store.append("alice", vector(1.0))
+    store.append("bob", vector(2.0))
+    vectors = store._gen_file("vectors")
+    store.close()
+    with open(vectors, "r+b") as f:
+        f.truncate(128 * 4)
+
+    store = EncodingStore(str(tmp_path))
+    store.append("carol", vector(3.0))
+    store.close()
+
+    store = EncodingStore(str(tmp_path))
+    assert store.names() == ["alice", "carol"]
+    assert store.get("carol")[0] == 3.0
+    store.close()
+
+
+def test_two_writers_on_one_store_keep_every_record(tmp_path):
+    # e.g. a running kiosk and enroll.py
+    app = EncodingStore(str(tmp_path))
+    cli = EncodingStore(str(tmp_path))
+    app.append("alice", vector(1.0))
+    cli.append("bob", vector(2.0))
+    app.append("carol", vector(3.0))
+    cli.delete("alice")
+    cli.compact()
+    app.append("dave", vector(4.0))
+    app.close()
+    cli.close()
+
+    store = EncodingStore(str(tmp_path))
+    assert sorted(store.names()) == ["bob", "carol", "dave"]
+    assert [store.get(n)[0] for n in ("bob", "carol", "dave")] == [2.0, 3.0, 4.0]
+    store.close()
+
+
+def test_readonly_open_neither_creates_nor_repairs(tmp_path):
+    import pytest
+    with pytest.raises(FileNotFoundError):
+        EncodingStore(str(tmp_path / "missing"), readonly=True)
+    assert not (tmp_path / "missing").exists()
+
+    store = EncodingStore(str(tmp_path))
+    store.append("alice", vector(1.0))
+    journal = store._gen_file("journal")
+    store.close()
+    with open(journal, "a") as f:
+        f.write("+\t1\tbo")
+    size = (tmp_path / journal).stat().st_size
+
+    reader = EncodingStore(str(tmp_path), readonly=True)
+    assert reader.names() == ["alice"] and reader.get("alice")[0] == 1.0
+    with pytest.raises(PermissionError):
+        reader.append("bob", vector(2.0))
+    reader.close()
+    assert (tmp_path / journal).stat().st_size == size
+
+
+def test_interrupted_migration_is_finished_on_next_open(tmp_path, monkeypatch):
+    import pickle
+    import pytest
+    from encoding_store import open_encoding_store
+    pkl = str(tmp_path / "encodings.pkl")
+    with open(pkl, "wb") as f:
+        pickle.dump({"alice": vector(1.0), "bob": vector(2.0), "carol": vector(3.0)}, f)
+
+    append = EncodingStore.append
+
+    def crash_after_first(self, name, *args, **kwargs):
+        if len(self):
+            raise KeyboardInterrupt
+        return append(self, name, *args, **kwargs)
+
+    monkeypatch.setattr(EncodingStore, "append", crash_after_first)
+    with pytest.raises(KeyboardInterrupt):
+        open_encoding_store(pkl)
+    monkeypatch.setattr(EncodingStore, "append", append)
+
+    store = open_encoding_store(pkl)
+    assert sorted(store.names()) == ["alice", "bob", "carol"]
+    assert store.dead_rows == 0
+    store.close()
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("PIL")
+
+from render import mapped_rgba
+
+
+def test_mapped_rgba_sees_writes_to_the_array():
+    array, image = mapped_rgba((4, 3))
+    assert image.getpixel((1, 2)) == (255, 255, 255, 255)
+    array[2, 1] = (10, 20, 30, 255)
+    assert image.getpixel((1, 2)) == (10, 20, 30, 255)
+
+
+def test_show_buffer_reaches_the_image():
+    import cv2
+    array, image = mapped_rgba((4, 3))
+    rgb = np.zeros((3, 4, 3), np.uint8)
+    rgb[0, 0] = (1, 2, 3)
+    cv2.cvtColor(rgb, cv2.COLOR_RGB2RGBA, dst=array)
+    assert image.getpixel((0, 0)) == (1, 2, 3, 255)
@@ -0,0 +1,176 @@
+"""Fixed-size student thumbnails for the summary and detail views.
+
+    python thumbnails.py --data-dir face_data
+
+backfills face_data/thumbs/<size>/<name>.jpg for every existing <name>.jpg,
+skipping thumbnails that are already newer than their photo.
+"""
+import argparse
+import logging
+import os
+import queue
+import sys
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+THUMB_SIZES = (200, 300)
+
+log = logging.getLogger(__name__)
+
+
+def photo_path(data_dir, name):
+    return os.path.join(data_dir, f"{name}.jpg")
+
+
+def thumb_path(data_dir, name, size):
+    return os.path.join(data_dir, "thumbs", str(size), f"{name}.jpg")
+
+
+def write_thumbnails(data_dir, name, image, sizes=THUMB_SIZES):
+    """Write every thumbnail size of one BGR image, each replaced atomically."""
+    for size in sizes:
+        path = thumb_path(data_dir, name, size)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp.jpg"
+        cv2.imwrite(tmp, cv2.resize(image, (size, size), interpolation=cv2.INTER_AREA))
+        os.replace(tmp, path)
+
+
+def thumbnails_current(data_dir, name, sizes=THUMB_SIZES):
+    src = os.path.getmtime(photo_path(data_dir, name))
+    return all(os.path.exists(p) and os.path.getmtime(p) >= src
+               for p in (thumb_path(data_dir, name, s) for s in sizes))
+
+
+class PhotoWriter:
+    """Writes registration photos and their thumbnails on one background thread."""
+
+    def __init__(self, data_dir, sizes=THUMB_SIZES):
+        self.data_dir = data_dir
+        self.sizes = sizes
+        self.jobs = queue.Queue()
+        # Names queued by thumbnail(); the Tk thread adds, the writer thread removes
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="facevault-photos", daemon=True)
+        self._thread.start()
+
+    def save(self, name, frame):
+        """Queue the full photo and its thumbnails; the frame is copied, so the caller may reuse it."""
+        self.jobs.put((name, frame.copy()))
+
+    def thumbnail(self, name):
+        """Queue thumbnails for a photo that is already on disk (once per name while pending)."""
+        with self._pending_lock:
+            if name in self._pending:
+                return
+            self._pending.add(name)
+        self.jobs.put((name, None))
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                if job is None:
+                    return
+                name, frame = job
+                if frame is None:
+                    with self._pending_lock:
+                        self._pending.discard(name)
+                    frame = cv2.imread(photo_path(self.data_dir, name))
+                    if frame is None:
+                        continue
+                else:
+                    cv2.imwrite(photo_path(self.data_dir, name), frame)
+                write_thumbnails(self.data_dir, name, frame, self.sizes)
+            except Exception:
+                log.exception("photo writer: %s", job[0])
+            finally:
+                self.jobs.task_done()
+
+    def flush(self):
+        self.jobs.join()
+
+    def close(self):
+        self.jobs.put(None)
+        self._thread.join()
+
+
+class ThumbnailCache:
+    """LRU of decoded PhotoImages keyed by (name, size).
+
+    Entries remember which file and mtime they were decoded from, so a photo
+    rewritten by a new registration is picked up on the next lookup. Names
+    without a thumbnail yet fall back to resizing the full photo once, and the
+    writer (if given) is asked to generate the thumbnails for next time.
+    """
+
+    def __init__(self, data_dir, capacity=256, writer=None):
+        self.data_dir = data_dir
+        self.capacity = capacity
+        self.writer = writer
+        self.hits = 0
+        self.misses = 0
+        self._photos = OrderedDict()
+
+    def photo(self, name, size):
+        """PhotoImage of name at size x size; OSError if there is no photo. Tk thread only."""
+        from PIL import Image, ImageTk
+        path = thumb_path(self.data_dir, name, size)
+        if not os.path.exists(path):
+            path = photo_path(self.data_dir, name)
+            if self.writer is not None and os.path.exists(path):
+                self.writer.thumbnail(name)
+        stamp = (path, os.stat(path).st_mtime_ns)
+        key = (name, size)
+        entry = self._photos.get(key)
+        if entry is not None and entry[0] == stamp:
+            self._photos.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        with Image.open(path) as image:
+            if image.size != (size, size):
+                image = image.resize((size, size))
+            photo = ImageTk.PhotoImage(image)
+        self._photos[key] = (stamp, photo)
+        self._photos.move_to_end(key)
+        while len(self._photos) > self.capacity:
+            self._photos.popitem(last=False)
+        return photo
+
+
+def backfill(data_dir, sizes=THUMB_SIZES, workers=None, out=sys.stdout):
+    names = sorted(os.path.splitext(f)[0] for f in os.listdir(data_dir) if f.lower().endswith(".jpg"))
+
+    def one(name):
+        if thumbnails_current(data_dir, name, sizes):
+            return "skipped"
+        image = cv2.imread(photo_path(data_dir, name))
+        if image is None:
+            print(f"  skip {name}: unreadable photo", file=out)
+            return "failed"
+        write_thumbnails(data_dir, name, image, sizes)
+        return "written"
+
+    # cv2 releases the GIL while decoding and encoding, so threads are enough
+    with ThreadPoolExecutor(workers or os.cpu_count() or 1) as pool:
+        counts = Counter(pool.map(one, names))
+    print(f"Thumbnails: {counts['written']} written, {counts['skipped']} up to date, "
+          f"{counts['failed']} failed", file=out)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate thumbnails for existing student photos")
+    parser.add_argument("--data-dir", default="face_data", help="directory holding <name>.jpg photos")
+    parser.add_argument("--workers", type=int, default=None, help="threads (default: all cores)")
+    args = parser.parse_args(argv)
+    backfill(args.data_dir, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
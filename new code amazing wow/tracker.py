@@ -0,0 +1,125 @@
+import itertools
+import numpy as np
+
+
+class Track:
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = box
+        self.name = None
+        self.distance = float("inf")
+        self.encoding = None
+        self.last_encoded = None
+        self.misses = 0
+        self.hits = 1
+
+
+def iou_matrix(a, b):
+    # Boxes are face_recognition (top, right, bottom, left)
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    top = np.maximum(a[:, None, 0], b[None, :, 0])
+    right = np.minimum(a[:, None, 1], b[None, :, 1])
+    bottom = np.minimum(a[:, None, 2], b[None, :, 2])
+    left = np.maximum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(right - left, 0, None) * np.clip(bottom - top, 0, None)
+    area_a = (a[:, 1] - a[:, 3]) * (a[:, 2] - a[:, 0])
+    area_b = (b[:, 1] - b[:, 3]) * (b[:, 2] - b[:, 0])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def _centre(box):
+    top, right, bottom, left = box
+    return (left + right) / 2.0, (top + bottom) / 2.0, max(right - left, bottom - top)
+
+
+class FaceTracker:
+    """IoU/centroid association of face_locations boxes across frames.
+
+    Each track caches the identity it was last encoded with. needs_encoding()
+    says when a track is worth another face_encodings call: when it is new, every
+    retry_interval frames while its match is weak, and every refresh_interval
+    frames otherwise.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_misses=5, refresh_interval=30,
+                 retry_interval=3, confidence_margin=0.1, tolerance=0.6):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.confidence_margin = confidence_margin
+        self.tolerance = tolerance
+        self.tracks = []
+        self.frame = 0
+        self._ids = itertools.count(1)
+
+    def update(self, boxes):
+        """Associate this frame's boxes with existing tracks; returns the visible tracks in box order."""
+        self.frame += 1
+        boxes = [tuple(int(v) for v in b) for b in boxes]
+        assigned = [None] * len(boxes)
+        free = set(range(len(self.tracks)))
+
+        if self.tracks and boxes:
+            ious = iou_matrix([t.box for t in self.tracks], boxes)
+            # Greedy: best overlapping pairs first
+            for flat in np.argsort(-ious, axis=None):
+                ti, di = divmod(int(flat), len(boxes))
+                if ious[ti, di] < self.iou_threshold:
+                    break
+                if ti in free and assigned[di] is None:
+                    assigned[di] = self.tracks[ti]
+                    free.discard(ti)
+            # Fast movers may not overlap any more; fall back to centroid distance
+            for di, box in enumerate(boxes):
+                if assigned[di] is not None or not free:
+                    continue
+                cx, cy, size = _centre(box)
+                best, best_d = None, 0.5 * size
+                for ti in free:
+                    tx, ty, _ = _centre(self.tracks[ti].box)
+                    d = np.hypot(cx - tx, cy - ty)
+                    if d < best_d:
+                        best, best_d = ti, d
+                if best is not None:
+                    assigned[di] = self.tracks[best]
+                    free.discard(best)
+
+        for ti in free:
+            self.tracks[ti].misses += 1
+        visible = []
+        for di, box in enumerate(boxes):
+            track = assigned[di]
+            if track is None:
+                track = Track(next(self._ids), box)
+                self.tracks.append(track)
+            else:
+                track.box = box
+                track.misses = 0
+                track.hits += 1
+            visible.append(track)
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+        return visible
+
+    def needs_encoding(self, track):
+        if track.last_encoded is None:
+            return True
+        age = self.frame - track.last_encoded
+        if track.name is None or track.distance > self.tolerance - self.confidence_margin:
+            return age >= self.retry_interval
+        return age >= self.refresh_interval
+
+    def set_identity(self, track, name, distance, encoding):
+        """Store a fresh match on the track; returns True if the identity changed."""
+        changed = track.last_encoded is None or name != track.name
+        track.name = name
+        track.distance = distance
+        track.encoding = encoding
+        track.last_encoded = self.frame
+        return changed and name is not None
+
+    def reset(self):
+        self.tracks = []
+        self.frame = 0
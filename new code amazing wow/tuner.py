@@ -0,0 +1,307 @@
+"""Per-machine processing profile: calibrated once, adapted while running.
+
+    python tuner.py                 # calibrate this machine now and save the profile
+    python tuner.py --show          # print the saved profile
+
+Calibration builds frames from the bundled face_data sample photos (or, when
+those are gone, the registered students' photos) at the capture resolution.
+With no photo at all it is skipped with a warning and tried again next start. It times detection for each (model, scale) candidate
+plus one encode, and drops candidates that miss faces the full-resolution
+HOG pass finds. The rest form a ladder from most to least thorough, and the
+cheapest rung is repeated with analyze_stride 2 and 3. The chosen rung is the
+first whose detect + encode time fits tune_latency_ms. On machines with fewer
+than three cores, analysis must also leave half a core free at tune_fps for
+capture and the preview.
+
+Profiles live in face_data/profiles/<machine>.json. While a camera runs,
+RuntimeTuner moves along the same ladder when the measured capture-to-result
+time drifts over or well under budget.
+"""
+import argparse
+import datetime
+import json
+import logging
+import math
+import os
+import platform
+import time
+
+from settings import load_settings, read_user_settings
+
+SCALES = (1.0, 0.75, 0.5, 0.35, 0.25)
+PROFILE_KEYS = ("detect_model", "detect_scale", "analyze_stride", "preview_interval_ms", "server_workers")
+
+log = logging.getLogger(__name__)
+
+
+def machine_key():
+    node = "".join(c if c.isalnum() or c in "-_" else "_" for c in platform.node() or "host")
+    return f"{node}-{platform.machine() or 'cpu'}-{os.cpu_count() or 1}c"
+
+
+def profile_path(data_dir):
+    return os.path.join(data_dir, "profiles", f"{machine_key()}.json")
+
+
+def load_profile(data_dir):
+    path = profile_path(data_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_profile(data_dir, profile):
+    path = profile_path(data_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return sorted(samples)[len(samples) // 2]
+
+
+def candidates():
+    models = ["hog"]
+    try:
+        import dlib
+        if dlib.DLIB_USE_CUDA:
+            models.insert(0, "cnn")
+    except (ImportError, AttributeError):
+        pass
+    # CNN on a CPU takes seconds per frame and is never worth timing there
+    return [(model, scale) for model in models for scale in SCALES]
+
+
+def sample_photos(data_dir, limit=2):
+    from bench import SAMPLES
+    bundled = [os.path.join(data_dir, os.path.basename(p)) for p in SAMPLES]
+    found = [p for p in bundled if os.path.exists(p)]
+    if not found and os.path.isdir(data_dir):
+        found = sorted(os.path.join(data_dir, f) for f in os.listdir(data_dir) if f.lower().endswith(".jpg"))
+    return found[:limit]
+
+
+def measure(settings, data_dir, faces=2, repeat=3):
+    """Time each candidate on sample frames; returns (measurements, encode_ms), or None without photos."""
+    import cv2
+    from bench import face_crops, synthetic_frame
+    from detector import FaceDetector
+    from encoder import encode_frames
+
+    photos = sample_photos(data_dir)
+    if not photos:
+        return None
+    size = (settings["capture_width"] or 640, settings["capture_height"] or 480)
+    crops = face_crops(photos)
+    rgb = cv2.cvtColor(synthetic_frame(crops, size, faces), cv2.COLOR_BGR2RGB)
+    reference = FaceDetector(scale=1.0, model="hog").detect(rgb)
+    encode_ms = _median_ms(lambda: encode_frames([rgb], [reference]), repeat) if reference else 0.0
+    results = []
+    for model, scale in candidates():
+        detector = FaceDetector(scale=scale, model=model, upsample=settings["detect_upsample"])
+        found = detector.detect(rgb)  # also warms the model
+        detect_ms = _median_ms(lambda: detector.detect(rgb), repeat)
+        results.append({"detect_model": model, "detect_scale": scale, "detect_ms": detect_ms,
+                        "cost_ms": detect_ms + encode_ms,
+                        "faces_ok": len(found) >= len(reference)})
+    return results, encode_ms
+
+
+def build_ladder(measurements):
+    rungs = [dict(m, analyze_stride=1) for m in measurements if m["faces_ok"]]
+    if not rungs:
+        # Nothing kept every face (e.g. samples without a detectable face): fall back to cost order
+        rungs = [dict(m, analyze_stride=1) for m in sorted(measurements, key=lambda m: -m["cost_ms"])]
+    cheapest = rungs[-1]
+    rungs += [dict(cheapest, analyze_stride=s) for s in (2, 3)]
+    return rungs
+
+
+def fits(rung, latency_ms, fps, cores):
+    if rung["cost_ms"] > latency_ms:
+        return False
+    if cores < 3:
+        duty = rung["cost_ms"] * fps / 1000.0 / rung["analyze_stride"]
+        return duty <= 0.5
+    return True
+
+
+def calibrate(settings, data_dir):
+    start = time.perf_counter()
+    cores = os.cpu_count() or 1
+    latency, fps = settings["tune_latency_ms"], settings["tune_fps"]
+    measured = measure(settings, data_dir)
+    if measured is None:
+        log.warning("no photos in %s to calibrate with; keeping the configured detector settings", data_dir)
+        return None
+    measurements, encode_ms = measured
+    ladder = build_ladder(measurements)
+    level = next((i for i, r in enumerate(ladder) if fits(r, latency, fps, cores)), len(ladder) - 1)
+    profile = {
+        "machine": machine_key(),
+        "created": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "targets": {"latency_ms": latency, "fps": fps},
+        "cores": cores,
+        "encode_ms": encode_ms,
+        "ladder": ladder,
+        "level": level,
+        "calibration_s": time.perf_counter() - start,
+        "settings": {
+            "preview_interval_ms": int(min(33, max(10, 500.0 / fps))),
+            "server_workers": max(1, cores - 1),
+        },
+    }
+    save_profile(data_dir, profile)
+    return profile
+
+
+def profile_settings(profile, level=None):
+    rung = profile["ladder"][profile["level"] if level is None else level]
+    chosen = dict(profile["settings"])
+    chosen.update({key: rung[key] for key in ("detect_model", "detect_scale", "analyze_stride")})
+    return chosen
+
+
+def apply_profile(settings, profile, data_dir):
+    """Merge the profile into settings, leaving keys set in settings.json alone."""
+    explicit = read_user_settings(data_dir)
+    for key, value in profile_settings(profile).items():
+        if key in PROFILE_KEYS and key not in explicit:
+            settings[key] = value
+    return settings
+
+
+def tune_on_startup(settings, data_dir):
+    """Startup step: reuse this machine's profile or calibrate one, then apply it."""
+    mode = settings["auto_tune"]
+    if mode == "off":
+        return None
+    profile = None if mode == "always" else load_profile(data_dir)
+    if profile is None:
+        profile = calibrate(settings, data_dir)
+    if profile is not None:
+        apply_profile(settings, profile, data_dir)
+    return profile
+
+
+class RuntimeTuner:
+    """Moves a running detector and pipeline along the calibrated ladder.
+
+    check() is cheap and meant for the GUI loop. Every `interval` seconds it
+    takes the mean detect time over the detector calls since the last check,
+    plus the calibrated encode time, and compares that with the budget. Frames
+    the motion gate skipped never reach the detector, so an idle scene gives
+    no sample rather than a near-zero one. Two checks in a row over
+    budget * 1.25 step one rung cheaper. Three in a row where the next richer
+    rung, scaled by how far off the calibration the current one is, would
+    still fit in budget * 0.8 step back up.
+    """
+
+    def __init__(self, profile, detector, pipeline, budget_ms, interval=2.0, min_calls=3):
+        self.ladder = profile["ladder"]
+        self.level = profile["level"]
+        self.encode_ms = profile.get("encode_ms", 0.0)
+        self.detector = detector
+        self.pipeline = pipeline
+        self.budget = budget_ms
+        self.interval = interval
+        self.min_calls = min_calls
+        self.changes = 0
+        self._over = 0
+        self._under = 0
+        self._last = time.perf_counter()
+        self._mark = self._detector_totals()
+
+    def _detector_totals(self):
+        return self.detector.full_sweeps + self.detector.roi_sweeps, self.detector.total_ms
+
+    def measured_ms(self):
+        """Mean detect + encode cost since the last sample, or None if the detector barely ran."""
+        calls, total = self._detector_totals()
+        if calls - self._mark[0] < self.min_calls:
+            return None
+        ms = (total - self._mark[1]) / (calls - self._mark[0]) + self.encode_ms
+        self._mark = (calls, total)
+        return ms
+
+    def check(self, now=None):
+        now = time.perf_counter() if now is None else now
+        if now - self._last < self.interval:
+            return None
+        self._last = now
+        ms = self.measured_ms()
+        if ms is None:
+            return None
+        rung = self.ladder[self.level]
+        richer = self.ladder[self.level - 1] if self.level > 0 else None
+        self._over = self._over + 1 if ms > self.budget * 1.25 else 0
+        predicted = richer["cost_ms"] * ms / max(rung["cost_ms"], 1e-3) if richer else math.inf
+        self._under = self._under + 1 if predicted <= self.budget * 0.8 else 0
+        if self._over >= 2 and self.level < len(self.ladder) - 1:
+            return self.move(self.level + 1, ms)
+        if self._under >= 3:
+            return self.move(self.level - 1, ms)
+        return None
+
+    def move(self, level, measured_ms=None):
+        rung = self.ladder[level]
+        self.level = level
+        self.detector.model = rung["detect_model"]
+        self.detector.scale = rung["detect_scale"]
+        self.pipeline.stride = rung["analyze_stride"]
+        # Samples from the old rung say nothing about the new one
+        self._mark = self._detector_totals()
+        self._over = self._under = 0
+        self.changes += 1
+        log.info("%.0f ms vs budget %.0f ms -> %s scale %s stride %s", measured_ms or 0, self.budget,
+                 rung["detect_model"], rung["detect_scale"], rung["analyze_stride"])
+        return rung
+
+
+def runtime_tuner(settings, data_dir, detector, pipeline):
+    """RuntimeTuner for a freshly started camera, or None when adaptation does not apply."""
+    if not settings["tune_adapt"] or settings["auto_tune"] == "off" or settings["recognition_server"]:
+        return None
+    profile = load_profile(data_dir)
+    if profile is None:
+        return None
+    explicit = read_user_settings(data_dir)
+    if any(key in explicit for key in ("detect_model", "detect_scale", "analyze_stride")):
+        return None  # pinned by hand
+    return RuntimeTuner(profile, detector, pipeline, settings["tune_latency_ms"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate the FaceVault processing profile for this machine")
+    parser.add_argument("--data-dir", default="face_data", help="where settings.json and profiles/ live")
+    parser.add_argument("--show", action="store_true", help="print the saved profile instead of calibrating")
+    args = parser.parse_args(argv)
+
+    if args.show:
+        profile = load_profile(args.data_dir)
+        if profile is None:
+            raise SystemExit(f"no profile for {machine_key()} yet")
+    else:
+        from warmup import warm_up_models
+        warm_up_models()
+        profile = calibrate(load_settings(args.data_dir), args.data_dir)
+        if profile is None:
+            raise SystemExit(f"no photos in {args.data_dir} to calibrate with")
+    for i, rung in enumerate(profile["ladder"]):
+        mark = "->" if i == profile["level"] else "  "
+        print(f"{mark} {rung['detect_model']} scale {rung['detect_scale']:<4} stride {rung['analyze_stride']}  "
+              f"{rung['cost_ms']:7.1f} ms{'' if rung['faces_ok'] else '  (misses faces)'}")
+    print(f"Profile {profile_path(args.data_dir)}: {json.dumps(profile_settings(profile))}")
+
+
+if __name__ == "__main__":
+    main()
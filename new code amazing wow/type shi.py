@@ -1,15 +1,51 @@
-import sys, os, cv2, random, csv, datetime, pickle
-import face_recognition
+import sys, os, cv2, time, threading, logging
+from gallery import FaceGallery
+from settings import load_settings, build_gallery
+from recognizer import make_recognizer
+from pipeline import CameraPipeline
+from capture import CaptureSource
+from multicam import MultiCameraPipeline, TileScheduler, parse_source, tile_layout
+from attendance import AttendanceWriter
+from attendance_store import open_store, LogPager
+from encoding_store import open_encoding_store
+from metrics import METRICS, draw_overlay, start_exporter
+from render import QtFrameRenderer
+from animation import ParticleField
+from warmup import Startup, startup_steps
+from tuner import runtime_tuner
+from analytics import REPORTS, AttendanceStats, format_rows, table_rows, write_report
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QPushButton, QLabel, QFileDialog, QWidget,
-    QVBoxLayout, QHBoxLayout, QStackedLayout, QTextEdit, QMessageBox
+    QVBoxLayout, QHBoxLayout, QStackedLayout, QTextEdit, QMessageBox, QLineEdit, QComboBox
 )
-from PyQt5.QtCore import Qt, QTimer, QPoint
-from PyQt5.QtGui import QImage, QPixmap, QPainter, QColor, QPen
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QPainter, QColor, QPen
+
+log = logging.getLogger("facevault")
+
+class ParticleLayer(QWidget):
+    """Paints a ParticleField behind its siblings; the window's timer steps it."""
+
+    def __init__(self, field, parent):
+        super().__init__(parent)
+        self.field = field
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setGeometry(0, 0, field.width, field.height)
+        self.pen = QPen(QColor("#00f0ff"), 2)
+        self.lower()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setPen(self.pen)
+        for x, y in zip(self.field.x.tolist(), self.field.y.tolist()):
+            painter.drawPoint(x, y)
+        painter.end()
+
 
 class FaceVaultUltra(QMainWindow):
     def __init__(self):
         super().__init__()
+        self.startup = Startup()
         self.setWindowTitle("FaceVault Ultra - PyQt Edition")
         self.setGeometry(100, 100, 1180, 760)
 
@@ -18,13 +54,19 @@ class FaceVaultUltra(QMainWindow):
         self.encodings_file = os.path.join(self.data_dir, "encodings.dat")
 
         os.makedirs(self.data_dir, exist_ok=True)
-        self.known_faces = {}
-        self.load_encodings()
+        self.settings = load_settings(self.data_dir)
+        self.metrics_exporter = start_exporter(self.settings)
+        self.store = open_store(self.data_dir, self.log_file)
+        self.attendance = AttendanceWriter.from_settings(self.log_file, self.settings, self.store)
+        self.analytics = AttendanceStats()
+        self.encoding_store = None
+        self.gallery = FaceGallery()
         self.current_user = None
 
         self.theme = "dark"
         self.camera_active = False
-        self.particles = []
+        self.faces = []
+        self.particle_field = ParticleField(speed=2, colors=("#00f0ff",))
         self.scan_line_y = 0
 
         self.init_ui()
@@ -34,6 +76,24 @@ class FaceVaultUltra(QMainWindow):
         self.anim_timer.timeout.connect(self.update_particles)
         self.anim_timer.start(50)
 
+        # Encodings and the dlib models load behind the already-visible window
+        self.status_label.setText("⏳ Warming up face models...")
+        QTimer.singleShot(0, lambda: self.startup.mark("ui"))
+        self.startup.run(startup_steps(self.settings, self.load_encodings, self.data_dir))
+        self.ready_timer = QTimer()
+        self.ready_timer.timeout.connect(self.check_ready)
+        self.ready_timer.start(100)
+
+    def check_ready(self):
+        if not self.startup.ready.is_set():
+            return
+        self.ready_timer.stop()
+        if self.startup.error is not None:
+            self.status_label.setText(f"⚠️ Startup failed: {self.startup.error}")
+            return
+        self.status_label.setText("🔎 Awaiting scan...")
+        log.info("%s", self.startup.report())
+
     def init_ui(self):
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
@@ -74,7 +134,7 @@ class FaceVaultUltra(QMainWindow):
         layout.addLayout(self.stack)
 
         # Particles
-        self.particles = [QPoint(random.randint(0, 1180), random.randint(0, 760)) for _ in range(40)]
+        self.particle_layer = ParticleLayer(self.particle_field, self.central_widget)
 
     def make_button(self, text, callback):
         btn = QPushButton(text)
@@ -89,73 +149,259 @@ class FaceVaultUltra(QMainWindow):
         )
 
     def load_encodings(self):
-        if os.path.exists(self.encodings_file):
-            with open(self.encodings_file, "rb") as f:
-                self.known_faces = pickle.load(f)
+        self.encoding_store = open_encoding_store(self.encodings_file)
+        self.gallery = build_gallery(self.encoding_store, self.encodings_file, self.settings)
+        self.encoding_store.compact_async()
 
     def init_camera(self):
-        self.capture = cv2.VideoCapture(0)
+        self.pipeline = None
+        self.tuner = None
+        self.tiles = []
+        self.renderer = QtFrameRenderer(self.camera_label, (860, 480))
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_frame)
 
+    def startup_ok(self):
+        """True once models and encodings are loaded; otherwise says why on the status label."""
+        if not self.startup.ready.is_set():
+            self.status_label.setText("⏳ Still warming up, one moment...")
+            return False
+        if self.startup.error is not None:
+            self.status_label.setText(f"⚠️ Startup failed: {self.startup.error}")
+            return False
+        return True
+
     def start_camera(self):
+        if not self.startup_ok():
+            return
         if not self.camera_active:
-            self.timer.start(30)
+            sources = self.settings["camera_sources"]
+            if len(sources) > 1:
+                self.start_tiles(sources)
+                return
+            recognizer = make_recognizer(self.gallery, self.settings)
+            source = CaptureSource(parse_source(sources[0]), self.settings)
+            self.pipeline = CameraPipeline(source, recognizer.analyze, stride=self.settings["analyze_stride"])
+            if not self.pipeline.start():
+                QMessageBox.warning(self, "Camera Error", "Could not access camera.")
+                return
+            log.info("%s", source.describe())
+            self.tuner = runtime_tuner(self.settings, self.data_dir, recognizer.detector, self.pipeline)
+            self.timer.start(self.settings["preview_interval_ms"])
             self.camera_active = True
 
-    def update_frame(self):
-        ret, frame = self.capture.read()
-        if not ret: return
-        frame = cv2.flip(frame, 1)
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        face_locations = face_recognition.face_locations(rgb)
-        for top, right, bottom, left in face_locations:
-            encodings = face_recognition.face_encodings(rgb, [(top, right, bottom, left)])
+    def start_tiles(self, sources):
+        tile, positions = tile_layout(len(sources), (860, 480))
+        self.pipeline = MultiCameraPipeline(sources, self.gallery, self.settings, tile)
+        self.pipeline.start()
+        self.tile_scheduler = TileScheduler(len(sources), self.settings["tile_background_fps"])
+        self.tile_faces = [[] for _ in sources]
+        for i, (x, y) in enumerate(positions):
+            label = QLabel(self.camera_label)
+            label.setGeometry(x, y, tile[0], tile[1])
+            label.mousePressEvent = lambda event, i=i: setattr(self.tile_scheduler, "focus", i)
+            label.show()
+            self.tiles.append(QtFrameRenderer(label, tile))
+        self.timer.start(self.settings["preview_interval_ms"])
+        self.camera_active = True
+
+    def update_tiles(self):
+        frames, results = self.pipeline.poll()
+        for i, faces in results:
+            self.tile_faces[i] = faces
+            for face in faces:
+                if face.name is not None and face.fresh:
+                    # All doors share one writer, whose cooldown also dedupes across cameras
+                    self.status_label.setText(f"✅ Recognized: {face.name} (camera {i + 1})")
+                    self.log_entry(face.name)
+                    self.tile_scheduler.focus = i
+        start = time.perf_counter()
+        drawn = 0
+        for i, frame in frames.items():
+            if not self.tile_scheduler.due(i, start):
+                continue
+            renderer = self.tiles[i]
+            self.draw_faces(renderer, renderer.begin(frame), self.tile_faces[i])
+            renderer.show()
+            drawn += 1
+        if drawn:
+            METRICS.since("render", start)
+            METRICS.tick("preview")
+
+    def draw_faces(self, renderer, rgb, faces):
+        for face in faces:
+            top, right, bottom, left = renderer.scale_box(face.box)
             label = "Unknown"
             color = (255, 0, 0)
-            if encodings:
-                for name, known_enc in self.known_faces.items():
-                    if face_recognition.compare_faces([known_enc], encodings[0])[0]:
-                        label = name
-                        color = (0, 255, 0)
-                        self.status_label.setText(f"✅ Recognized: {name}")
-                        self.log_entry(name)
-                        break
+            if face.name is not None:
+                label = face.name
+                color = (0, 255, 0)
             cv2.rectangle(rgb, (left, top), (right, bottom), color, 2)
             cv2.putText(rgb, label, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
 
+    def stop_camera(self):
+        self.timer.stop()
+        if self.pipeline:
+            self.pipeline.stop()
+        for renderer in self.tiles:
+            renderer.label.deleteLater()
+        self.tiles = []
+        self.camera_active = False
+        self.attendance.flush(sync=True)
+
+    def update_frame(self):
+        # GUI side only: the pipeline threads do capture and recognition
+        if not self.pipeline.running:
+            self.stop_camera()
+            return
+        if self.tiles:
+            self.update_tiles()
+            return
+        frame, results = self.pipeline.poll()
+        if results is not None:
+            self.faces = results
+            for face in results:
+                # One log row per appearance, not one per analysed frame
+                if face.name is not None and face.fresh:
+                    self.status_label.setText(f"✅ Recognized: {face.name}")
+                    self.log_entry(face.name)
+        if self.tuner is not None:
+            self.tuner.check()
+        if frame is None: return
+        start = time.perf_counter()
+        rgb = self.renderer.begin(frame)
+        self.draw_faces(self.renderer, rgb, self.faces)
+
         self.scan_line_y = (self.scan_line_y + 10) % rgb.shape[0]
         cv2.line(rgb, (0, self.scan_line_y), (rgb.shape[1], self.scan_line_y), (0, 255, 0), 2)
+        if self.settings["metrics_overlay"]:
+            draw_overlay(rgb)
 
-        h, w, ch = rgb.shape
-        img = QImage(rgb.data, w, h, ch * w, QImage.Format_RGB888)
-        self.camera_label.setPixmap(QPixmap.fromImage(img))
+        self.renderer.show()
+        METRICS.since("render", start)
+        METRICS.since("latency", self.pipeline.frame_stamp)
+        METRICS.tick("preview")
 
     def update_particles(self):
-        painter = QPainter(self)
-        for i, pt in enumerate(self.particles):
-            pt.setY(pt.y() + 2)
-            if pt.y() > 760:
-                pt.setY(0)
-                pt.setX(random.randint(0, 1180))
-            painter.setPen(QPen(QColor("#00f0ff"), 2))
-            painter.drawPoint(pt)
+        # Paused while the preview owns the GUI thread or nobody can see the window
+        if self.camera_active or not self.isVisible() or self.isMinimized():
+            self.anim_timer.setInterval(250)
+            return
+        self.anim_timer.setInterval(50)
+        self.particle_field.step(respawn_x=True)
+        self.particle_layer.update()
 
     def log_entry(self, name):
-        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open(self.log_file, "a", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow([name, now])
+        return self.attendance.log(name)
 
     def show_dashboard(self):
-        QMessageBox.information(self, "Dashboard", "Dashboard feature under construction.")
+        self.attendance.flush()
+        pager = LogPager(self.store)
+        self.dashboard = QWidget()
+        self.dashboard.setWindowTitle("📊 Dashboard")
+        self.dashboard.resize(520, 440)
+        layout = QVBoxLayout(self.dashboard)
+
+        filters = QHBoxLayout()
+        name_edit = QLineEdit()
+        name_edit.setPlaceholderText("Name")
+        date_edit = QLineEdit()
+        date_edit.setPlaceholderText("YYYY-MM-DD")
+        filters.addWidget(name_edit)
+        filters.addWidget(date_edit)
+        layout.addLayout(filters)
+
+        view = QTextEdit()
+        view.setReadOnly(True)
+        layout.addWidget(view)
+        info = QLabel()
+        layout.addWidget(info)
+
+        # Only one page of rows is ever loaded into the view
+        state = {"page": 0}
+        def show(index):
+            state["page"], rows = pager.page(index)
+            view.setPlainText(pager.format(rows))
+            info.setText(f"Page {state['page'] + 1}/{pager.pages()} · {pager.count()} rows")
+        def apply_filter():
+            pager.set_filter(name_edit.text().strip(), None)
+            show(0)
+        def jump():
+            if date_edit.text().strip():
+                show(pager.page_for_date(date_edit.text().strip()))
+
+        nav = QHBoxLayout()
+        for text, cb in [("◀", lambda: show(state["page"] - 1)), ("▶", lambda: show(state["page"] + 1)),
+                         ("Filter", apply_filter), ("Jump to date", jump)]:
+            nav.addWidget(self.make_button(text, cb))
+        layout.addLayout(nav)
+
+        show(0)
+        self.add_report_section(layout)
+        self.dashboard.show()
+
+    def add_report_section(self, layout):
+        # Only log rows added since the last open are folded in, off the GUI thread
+        box = QComboBox()
+        box.addItems(list(REPORTS))
+        box.setCurrentText("people")
+        report_view = QTextEdit()
+        report_view.setReadOnly(True)
+        report_info = QLabel("Crunching attendance…")
+        state = {"table": {}, "done": [], "built": False}
+
+        def build():
+            with self.analytics.lock:
+                state["table"] = REPORTS[box.currentText()](self.analytics)
+            table = state["table"]
+            rows = format_rows(table, 0, min(200, table_rows(table)))
+            report_view.setPlainText("\n".join(" | ".join(map(str, row)) for row in [tuple(table)] + rows))
+            report_info.setText(f"{table_rows(table)} rows · {self.analytics.rows} log entries")
+
+        def export():
+            path, _ = QFileDialog.getSaveFileName(self.dashboard, "Export Report", f"{box.currentText()}.csv",
+                                                  "CSV (*.csv);;Parquet (*.parquet)")
+            if not path or not state["table"]:
+                return
+            table = state["table"]
+            report_info.setText(f"Exporting to {path}…")
+            def work():
+                try:
+                    state["done"].append(f"Exported {write_report(table, path)} rows to {path}")
+                except Exception as e:
+                    state["done"].append(f"Export failed: {e}")
+            threading.Thread(target=work, name="facevault-export", daemon=True).start()
+
+        ready = threading.Event()
+        def refresh():
+            self.analytics.update_from_store(self.store)
+            ready.set()
+        def poll():
+            if ready.is_set() and not state["built"]:
+                state["built"] = True
+                build()
+                box.currentTextChanged.connect(lambda _: build())
+            if state["done"]:
+                report_info.setText(state["done"].pop())
+        self.report_timer = QTimer(self.dashboard)
+        self.report_timer.timeout.connect(poll)
+        self.report_timer.start(200)
+        threading.Thread(target=refresh, name="facevault-analytics", daemon=True).start()
+
+        bar = QHBoxLayout()
+        bar.addWidget(box)
+        bar.addWidget(self.make_button("Export…", export))
+        layout.addLayout(bar)
+        layout.addWidget(report_view)
+        layout.addWidget(report_info)
 
     def closeEvent(self, event):
-        self.capture.release()
+        self.stop_camera()
+        self.attendance.close()
         event.accept()
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(name)s: %(message)s")
     app = QApplication(sys.argv)
     win = FaceVaultUltra()
     win.show()
@@ -0,0 +1,59 @@
+import threading
+import time
+
+import numpy as np
+
+
+def warm_up_models():
+    """Import face_recognition (loading the dlib models) and push one tiny frame
+    through detection and encoding, so the first real frame finds them warm."""
+    import face_recognition
+    blank = np.zeros((120, 160, 3), dtype=np.uint8)
+    face_recognition.face_locations(blank)
+    face_recognition.face_encodings(blank, [(10, 130, 110, 30)])
+
+
+def startup_steps(settings, load_encodings, data_dir="face_data"):
+    """What to load behind the window: the local gallery, models and machine
+    profile, or just a handshake with the recognition server that holds them."""
+    if settings["recognition_server"]:
+        from recognition_server import RecognitionClient
+        return [("server", RecognitionClient(settings["recognition_server"]).status)]
+    steps = [("encodings", load_encodings), ("models", warm_up_models)]
+    if settings["auto_tune"] != "off":
+        from tuner import tune_on_startup
+        steps.append(("profile", lambda: tune_on_startup(settings, data_dir)))
+    return steps
+
+
+class Startup:
+    """Startup phase times (ms since the app object was created) and the
+    background thread that does the slow loading while the window is up."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []
+        self.error = None
+        self.ready = threading.Event()
+
+    def mark(self, phase):
+        ms = (time.perf_counter() - self.started) * 1000.0
+        self.phases.append((phase, ms))
+        return ms
+
+    def run(self, steps):
+        """Run (name, fn) steps in order on a daemon thread, then set ready."""
+        def work():
+            try:
+                for name, fn in steps:
+                    fn()
+                    self.mark(name)
+            except Exception as e:
+                self.error = e
+            finally:
+                self.ready.set()
+        threading.Thread(target=work, name="facevault-startup", daemon=True).start()
+        return self
+
+    def report(self):
+        return "Startup (ms): " + ", ".join(f"{name} {ms:.0f}" for name, ms in self.phases)